@@ -44,5 +44,13 @@ export async function DELETE(
         data: { revokedAt: new Date() },
     });
 
+    // Drop the key from the backend's resolver cache right away instead of
+    // waiting for its TTL. Best effort — a failure here doesn't undo the revoke.
+    const backendUrl = process.env.FASTAPI_URL || "http://localhost:8000";
+    await fetch(`${backendUrl}/internal/keys/${id}/invalidate`, {
+        method: "POST",
+        headers: { "x-admin-key": process.env.ADMIN_API_KEY || "" },
+    }).catch(() => undefined);
+
     return NextResponse.json({ success: true, message: `Key ${id} revoked` });
 }
@@ -1,13 +1,221 @@
 import os
+import time
+import hashlib
+import threading
+import contextlib
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.pool
+from datetime import datetime, timezone
+from psycopg2.extras import execute_values
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
 from dotenv import load_dotenv
 
+from backend import db_sqlite
+from backend.metrics import Counter, Gauge, Histogram, record_cache
+from backend.log_pipeline import BatchWriter
+
 load_dotenv()
 
-def get_db_connection():
+# ── STORAGE BACKEND ───────────────────────────────────────────────────────────
+# "postgres" (Supabase, the default) or "sqlite" for single-node edge/on-prem
+# installs (see backend/db_sqlite.py). Queries below are written once: plain
+# %s placeholders, timestamps passed in from Python rather than NOW(), and
+# the few dialect differences routed through _execute_values / _db_now.
+DB_BACKEND = os.environ.get("DB_BACKEND", "postgres").strip().lower()
+
+# ── CONNECTION POOL ───────────────────────────────────────────────────────────
+# One thread-safe pool per process (created lazily, so a pre-fork import
+# never hands the same sockets to several workers).
+DB_POOL_MIN             = int(os.environ.get("DB_POOL_MIN", "1"))
+DB_POOL_MAX             = int(os.environ.get("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT_S       = float(os.environ.get("DB_POOL_TIMEOUT_S", "5"))
+DB_POOL_HEALTHCHECK_S   = float(os.environ.get("DB_POOL_HEALTHCHECK_S", "30"))
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", "5000"))
+
+POOL_WAIT_SECONDS = Histogram(
+    "sme_db_pool_wait_seconds", "Time spent waiting to check out a DB connection.", (),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+POOL_IN_USE = Gauge("sme_db_pool_in_use", "DB connections currently checked out.", ())
+POOL_EVENTS = Counter(
+    "sme_db_pool_events_total", "Pool events: timeout, reconnect, discard.", ("event",),
+)
+
+_pool = None
+_pool_pid = None
+_pool_slots = None
+_pool_lock = threading.Lock()
+_last_used: dict[int, float] = {}
+_in_use = 0
+_in_use_lock = threading.Lock()
+
+
+def _db_url():
     # Use the DIRECT_URL or DATABASE_URL from Supabase
-    db_url = os.environ.get("DIRECT_URL") or os.environ.get("DATABASE_URL")
+    return os.environ.get("DIRECT_URL") or os.environ.get("DATABASE_URL")
+
+
+def _db_configured() -> bool:
+    return DB_BACKEND == "sqlite" or bool(_db_url())
+
+
+def _execute_values(cur, sql: str, rows: list) -> None:
+    """Multi-row INSERT: psycopg2's execute_values, or one prepared executemany on SQLite."""
+    if DB_BACKEND == "sqlite":
+        template = "(" + ", ".join(["%s"] * len(rows[0])) + ")"
+        cur.executemany(sql.replace("VALUES %s", f"VALUES {template}"), rows)
+    else:
+        execute_values(cur, sql, rows)
+
+
+def _naive_utc(ts: datetime) -> datetime:
+    """Prisma's timestamp(3) columns are naive UTC; bring aware values to the same form."""
+    return ts.astimezone(timezone.utc).replace(tzinfo=None) if ts.tzinfo else ts
+
+
+def _db_now(cur) -> datetime:
+    """The database's clock (Postgres) — SQLite shares ours. Naive UTC, like the columns."""
+    if DB_BACKEND == "sqlite":
+        return _naive_utc(datetime.now(timezone.utc))
+    cur.execute("SELECT (NOW() AT TIME ZONE 'UTC')")
+    return _naive_utc(cur.fetchone()[0])
+
+
+def _get_pool():
+    global _pool, _pool_pid, _pool_slots
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool
+    db_url = _db_url()
+    if not db_url:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            try:
+                _pool = psycopg2.pool.ThreadedConnectionPool(
+                    DB_POOL_MIN, DB_POOL_MAX, db_url,
+                    options=f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}",
+                    keepalives=1, keepalives_idle=30,
+                )
+            except Exception as e:
+                print(f"DB Connection Error: {e}")
+                _pool = None
+                return None
+            _pool_pid   = os.getpid()
+            _pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+            _last_used.clear()
+    return _pool
+
+
+def _healthy(conn) -> bool:
+    if conn.closed:
+        return False
+    if time.monotonic() - _last_used.get(id(conn), 0.0) < DB_POOL_HEALTHCHECK_S:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except Exception:
+        return False
+
+
+def _release(pool, conn) -> None:
+    """Return a connection, discarding it if it's broken or stuck mid-transaction."""
+    broken = bool(conn.closed)
+    if not broken and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+        try:
+            conn.rollback()
+        except Exception:
+            broken = True
+    if broken:
+        POOL_EVENTS.inc(event="discard")
+        _last_used.pop(id(conn), None)
+    else:
+        _last_used[id(conn)] = time.monotonic()
+    try:
+        pool.putconn(conn, close=broken)
+    except Exception:
+        pass
+
+
+@contextlib.contextmanager
+def db_connection():
+    """
+    Check a pooled connection out for the duration of the block. Yields None
+    when no database is configured, reachable, or free within the timeout —
+    callers treat that exactly like the old get_db_connection() returning None.
+    """
+    global _in_use
+    if DB_BACKEND == "sqlite":
+        with db_sqlite.connection() as conn:
+            yield conn
+        return
+
+    pool = _get_pool()
+    if pool is None:
+        yield None
+        return
+
+    started = time.perf_counter()
+    slots = _pool_slots
+    if not slots.acquire(timeout=DB_POOL_TIMEOUT_S):
+        POOL_EVENTS.inc(event="timeout")
+        print(f"DB pool exhausted: no connection within {DB_POOL_TIMEOUT_S}s")
+        yield None
+        return
+
+    conn = None
+    try:
+        for attempt in range(2):
+            try:
+                conn = pool.getconn()
+            except Exception as e:
+                print(f"DB Connection Error: {e}")
+                conn = None
+                break
+            if _healthy(conn):
+                break
+            # Stale socket (Supabase restart, idle-timeout) — drop it and reconnect once.
+            POOL_EVENTS.inc(event="reconnect")
+            _last_used.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+            conn = None
+        POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+
+        if conn is None:
+            yield None
+            return
+        with _in_use_lock:
+            _in_use += 1
+            POOL_IN_USE.set(_in_use)
+        try:
+            yield conn
+        finally:
+            with _in_use_lock:
+                _in_use -= 1
+                POOL_IN_USE.set(_in_use)
+            _release(pool, conn)
+    finally:
+        slots.release()
+
+
+def close_pool() -> None:
+    global _pool
+    if DB_BACKEND == "sqlite":
+        db_sqlite.close()
+        return
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+
+
+def get_db_connection():
+    """Open a one-off, unpooled connection (CLI scripts, migrations)."""
+    if DB_BACKEND == "sqlite":
+        return db_sqlite.connect()
+    db_url = _db_url()
     if not db_url:
         return None
     try:
@@ -17,160 +225,491 @@ def get_db_connection():
         print(f"DB Connection Error: {e}")
         return None
 
-def log_api_call(api_key: str, plug_id: str, endpoint: str, status: int, latency_ms: int):
-    conn = get_db_connection()
-    if not conn:
-        return
-    try:
-        with conn.cursor() as cur:
-            import hashlib
-            key_hash = hashlib.sha256(api_key.encode()).hexdigest()
-            
-            # 1. Find the ApiKey record to get tenantId
-            cur.execute('SELECT id, "tenantId" FROM "ApiKey" WHERE "keyHash" = %s', (key_hash,))
-            row = cur.fetchone()
-            
-            tenant_id = None
-            api_key_id = None
-            
-            if row:
-                api_key_id = row[0]
-                tenant_id = row[1]
+# ── API KEY → TENANT RESOLUTION ───────────────────────────────────────────────
+# key_hash → (expires_at, (api_key_id, tenant_id)). Unknown/revoked keys are
+# cached as (None, None) for a shorter TTL so a new key works quickly.
+API_KEY_CACHE_TTL_S     = float(os.environ.get("API_KEY_CACHE_TTL_S", "300"))
+API_KEY_NEGATIVE_TTL_S  = float(os.environ.get("API_KEY_NEGATIVE_TTL_S", "30"))
+API_KEY_CACHE_MAX       = int(os.environ.get("API_KEY_CACHE_MAX", "100000"))
+
+_key_cache: dict[str, tuple[float, tuple]] = {}
+_key_cache_lock = threading.Lock()
+_fallback_tenant: tuple[float, object] = (0.0, None)
+
+
+def key_hash(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+def _cached_keys(hashes) -> tuple[dict, list]:
+    now = time.monotonic()
+    found, missing = {}, []
+    with _key_cache_lock:
+        for h in hashes:
+            entry = _key_cache.get(h)
+            if entry is not None and entry[0] > now:
+                found[h] = entry[1]
             else:
-                # If it's a dev key, maybe try to find a default tenant or skip
-                # Let's see if we can just get any tenant as fallback for dev
-                cur.execute('SELECT id FROM "Tenant" LIMIT 1')
-                fallback = cur.fetchone()
-                if not fallback:
-                    return # No tenants in DB
-                tenant_id = fallback[0]
-            
-            # 2. Insert ApiCall
-            import cuid
-            call_id = cuid.cuid()
-            cur.execute('''
-                INSERT INTO "ApiCall" (id, "tenantId", "apiKeyId", "plugId", endpoint, status, "latencyMs", "createdAt")
-                VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
-            ''', (call_id, tenant_id, api_key_id, plug_id, endpoint, status, latency_ms))
-            
-            conn.commit()
-    except Exception as e:
-        print(f"Failed to log API call: {e}")
-    finally:
-        conn.close()
+                missing.append(h)
+    for h in hashes:
+        record_cache("api_key", h in found)
+    return found, missing
+
+
+def _lookup_keys(cur, hashes) -> dict:
+    """Resolve key hashes to (api_key_id, tenant_id), hitting the DB only for cache misses."""
+    found, missing = _cached_keys(hashes)
+    if not missing:
+        return found
+    if DB_BACKEND == "sqlite":   # no arrays: one placeholder per hash
+        match, params = f'IN ({", ".join(["%s"] * len(missing))})', missing
+    else:   # one text[] parameter, so the statement text is the same for any batch size
+        match, params = "= ANY(%s)", [list(missing)]
+    cur.execute(
+        'SELECT "keyHash", id, "tenantId" FROM "ApiKey" '
+        f'WHERE "keyHash" {match} AND "revokedAt" IS NULL',
+        params,
+    )
+    fetched = {row[0]: (row[1], row[2]) for row in cur.fetchall()}
+    now = time.monotonic()
+    with _key_cache_lock:
+        if len(_key_cache) + len(missing) > API_KEY_CACHE_MAX:
+            _key_cache.clear()
+        for h in missing:
+            value = fetched.get(h, (None, None))
+            ttl = API_KEY_CACHE_TTL_S if value[0] else API_KEY_NEGATIVE_TTL_S
+            _key_cache[h] = (now + ttl, value)
+            found[h] = value
+    return found
+
+
+def _lookup_fallback_tenant(cur):
+    """Dev / unknown keys are attributed to the first tenant (cached like a key)."""
+    global _fallback_tenant
+    expires, tenant_id = _fallback_tenant
+    if expires > time.monotonic():
+        return tenant_id
+    cur.execute('SELECT id FROM "Tenant" LIMIT 1')
+    row = cur.fetchone()
+    tenant_id = row[0] if row else None
+    _fallback_tenant = (time.monotonic() + API_KEY_CACHE_TTL_S, tenant_id)
+    return tenant_id
+
+
+def resolve_api_key(api_key: str) -> tuple:
+    """(api_key_id, tenant_id) for a live key, (None, None) if unknown or revoked."""
+    if not api_key:
+        return (None, None)
+    h = key_hash(api_key)
+    found, missing = _cached_keys([h])
+    if not missing:
+        return found[h]
+    with db_connection() as conn:
+        if not conn:
+            return (None, None)
+        try:
+            with conn.cursor() as cur:
+                return _lookup_keys(cur, [h])[h]
+        except Exception as e:
+            print(f"Failed to resolve API key: {e}")
+            return (None, None)
+
+
+def resolve_tenant(api_key: str):
+    """Tenant for this key, falling back to the default tenant for dev/unknown keys."""
+    _, tenant_id = resolve_api_key(api_key)
+    if tenant_id:
+        return tenant_id
+    expires, fallback = _fallback_tenant
+    if expires > time.monotonic():
+        return fallback
+    with db_connection() as conn:
+        if not conn:
+            return None
+        try:
+            with conn.cursor() as cur:
+                return _lookup_fallback_tenant(cur)
+        except Exception as e:
+            print(f"Failed to resolve fallback tenant: {e}")
+            return None
+
+
+def invalidate_api_key(key_hash: str = None, api_key_id: str = None) -> int:
+    """Drop cached entries for a revoked key (by hash or by ApiKey.id). Returns entries removed."""
+    with _key_cache_lock:
+        doomed = [
+            h for h, (_, (kid, _tenant)) in _key_cache.items()
+            if h == key_hash or (api_key_id is not None and kid == api_key_id)
+        ]
+        for h in doomed:
+            del _key_cache[h]
+    return len(doomed)
+
+# ── QUERIES ───────────────────────────────────────────────────────────────────
+
+# ── API CALL LOGGING ──────────────────────────────────────────────────────────
+# log_api_call only enqueues; a background writer inserts in batches so the
+# request never waits on Postgres.
+
+def _insert_api_calls(events: list) -> bool:
+    """Write a batch of ApiCall events with one key lookup and one multi-row INSERT."""
+    with db_connection() as conn:
+        if not conn:
+            return False
+        try:
+            with conn.cursor() as cur:
+                # 1. Resolve every distinct key in the batch (cache first, one query for misses)
+                keys = _lookup_keys(cur, list({e["key_hash"] for e in events}))
+                fallback_tenant = None
+                if any(tenant_id is None for _, tenant_id in keys.values()):
+                    fallback_tenant = _lookup_fallback_tenant(cur)
+
+                # 2. Insert all ApiCalls
+                import cuid
+                rows = []
+                for e in events:
+                    api_key_id, tenant_id = keys[e["key_hash"]]
+                    tenant_id = tenant_id or fallback_tenant
+                    if not tenant_id:
+                        continue  # No tenants in DB
+                    rows.append((cuid.cuid(), tenant_id, api_key_id, e["plug_id"], e["endpoint"],
+                                 e["status"], e["latency_ms"], e["created_at"]))
+                if rows:
+                    _execute_values(cur, '''
+                        INSERT INTO "ApiCall" (id, "tenantId", "apiKeyId", "plugId", endpoint, status, "latencyMs", "createdAt")
+                        VALUES %s
+                    ''', rows)
+                    # 3. Bump the daily rollups in the same transaction
+                    _upsert_rollups(cur, rows)
+                conn.commit()
+            return True
+        except Exception as e:
+            print(f"Failed to log API calls: {e}")
+            return False
+
+
+_api_call_writer = BatchWriter(
+    "api_calls",
+    _insert_api_calls,
+    max_batch=int(os.environ.get("LOG_BATCH_MAX", "200")),
+    flush_interval_s=float(os.environ.get("LOG_FLUSH_INTERVAL_S", "1.0")),
+    queue_max=int(os.environ.get("LOG_QUEUE_MAX", "10000")),
+    backpressure_ms=float(os.environ.get("LOG_BACKPRESSURE_MS", "0")),
+)
+
+
+def log_api_call(api_key: str, plug_id: str, endpoint: str, status: int, latency_ms: int):
+    _api_call_writer.submit({
+        "key_hash":   key_hash(api_key),
+        "plug_id":    plug_id,
+        "endpoint":   endpoint,
+        "status":     status,
+        "latency_ms": latency_ms,
+        "created_at": datetime.now(timezone.utc),
+    })
+
+
+def flush_logs(timeout: float = 10.0) -> None:
+    """Write out queued API-call events and stop the writer (app shutdown)."""
+    _api_call_writer.close(timeout)
 
 def log_document(filename: str, size_bytes: int, plug_id: str, api_key: str):
-    conn = get_db_connection()
-    if not conn:
+    tenant_id = resolve_tenant(api_key)
+    if not tenant_id:
         return
-    try:
-        with conn.cursor() as cur:
-            import hashlib
-            from string import Template
-            tenant_id = None
-            if api_key:
-                key_hash = hashlib.sha256(api_key.encode()).hexdigest()
-                cur.execute('SELECT "tenantId" FROM "ApiKey" WHERE "keyHash" = %s', (key_hash,))
-                row = cur.fetchone()
-                if row:
-                    tenant_id = row[0]
-            
-            if not tenant_id:
-                cur.execute('SELECT id FROM "Tenant" LIMIT 1')
-                fallback = cur.fetchone()
-                if not fallback:
-                    return
-                tenant_id = fallback[0]
-                
-            import cuid
-            doc_id = cuid.cuid()
-            cur.execute('''
-                INSERT INTO "Document" (id, "tenantId", "plugId", filename, "sizeBytes", "createdAt")
-                VALUES (%s, %s, %s, %s, %s, NOW())
-            ''', (doc_id, tenant_id, plug_id, filename, size_bytes))
-            conn.commit()
-    except Exception as e:
-        print(f"Failed to log document: {e}")
-    finally:
-        conn.close()
+    with db_connection() as conn:
+        if not conn:
+            return
+        try:
+            with conn.cursor() as cur:
+                import cuid
+                doc_id = cuid.cuid()
+                cur.execute('''
+                    INSERT INTO "Document" (id, "tenantId", "plugId", filename, "sizeBytes", "createdAt")
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                ''', (doc_id, tenant_id, plug_id, filename, size_bytes, datetime.now(timezone.utc)))
+                conn.commit()
+        except Exception as e:
+            print(f"Failed to log document: {e}")
+
+# ── USAGE ROLLUPS ─────────────────────────────────────────────────────────────
+# "ApiCallRollup" holds one counter per (day, tenant, key, plug), bumped by
+# the ApiCall writer in the same transaction as the raw rows, so /v1/usage
+# sums O(#plugs × days) rows instead of scanning ApiCall. Dashboards poll
+# hard, so the month's totals are also cached per worker for USAGE_CACHE_TTL_S.
+USAGE_CACHE_TTL_S = float(os.environ.get("USAGE_CACHE_TTL_S", "15"))
+
+_usage_cache: dict[str, tuple[float, object]] = {}
+_usage_lock = threading.Lock()
+
+
+def _upsert_rollups(cur, rows: list) -> None:
+    """rows are ApiCall insert tuples: (id, tenant, key, plug, endpoint, status, latency, created_at)."""
+    counts: dict[tuple, int] = {}
+    for _, tenant_id, api_key_id, plug_id, _endpoint, _status, _latency, created_at in rows:
+        k = (created_at.date(), tenant_id, api_key_id or "", plug_id)
+        counts[k] = counts.get(k, 0) + 1
+    _execute_values(cur, '''
+        INSERT INTO "ApiCallRollup" (day, "tenantId", "apiKeyId", "plugId", calls)
+        VALUES %s
+        ON CONFLICT (day, "tenantId", "apiKeyId", "plugId")
+        DO UPDATE SET calls = "ApiCallRollup".calls + EXCLUDED.calls
+    ''', [(*k, n) for k, n in counts.items()])
+
+
+def _cached_usage(name: str):
+    with _usage_lock:
+        entry = _usage_cache.get(name)
+    if entry is not None and time.monotonic() - entry[0] < USAGE_CACHE_TTL_S:
+        record_cache("usage", True)
+        return entry[1]
+    record_cache("usage", False)
+    return None
+
+
+def _store_usage(name: str, value) -> None:
+    with _usage_lock:
+        _usage_cache[name] = (time.monotonic(), value)
+
 
 def get_api_usage(api_key: str):
     total_calls = 0
     user_calls = 0
     per_plugin = {}
-    
+
+    api_key_id, _ = resolve_api_key(api_key)
+    cached_plugins = _cached_usage("per_plugin")
+    cached_user = _cached_usage(f"key:{api_key_id}") if api_key_id else 0
+    if cached_plugins is not None and cached_user is not None:
+        return sum(cached_plugins.values()), cached_user, dict(cached_plugins)
+
+    month_start = datetime.now(timezone.utc).date().replace(day=1)
+    with db_connection() as conn:
+        if not conn:
+            if cached_plugins is not None:
+                return sum(cached_plugins.values()), cached_user or 0, dict(cached_plugins)
+            return total_calls, user_calls, per_plugin
+        try:
+            with conn.cursor() as cur:
+                # Calls by plugin this month for ALL users (total is their sum)
+                cur.execute('''
+                    SELECT "plugId", SUM(calls) FROM "ApiCallRollup"
+                    WHERE day >= %s
+                    GROUP BY "plugId"
+                ''', (month_start,))
+                for row in cur.fetchall():
+                    plug_id = row[0].replace("-v1", "")
+                    per_plugin[plug_id] = per_plugin.get(plug_id, 0) + int(row[1])
+                total_calls = sum(per_plugin.values())
+                _store_usage("per_plugin", dict(per_plugin))
+
+                # Calls by specifically this API key
+                if api_key_id:
+                    cur.execute('''
+                        SELECT COALESCE(SUM(calls), 0) FROM "ApiCallRollup"
+                        WHERE day >= %s AND "apiKeyId" = %s
+                    ''', (month_start, api_key_id))
+                    user_calls = int(cur.fetchone()[0])
+                    _store_usage(f"key:{api_key_id}", user_calls)
+
+        except Exception as e:
+            print(f"Failed to get API usage: {e}")
+
+    return total_calls, user_calls, per_plugin
+
+
+def backfill_usage_rollups() -> None:
+    """
+    Rebuild ApiCallRollup from the raw ApiCall table (one-off, after the
+    migration that adds it). Run: python -c "from backend.db import backfill_usage_rollups as b; b()"
+    """
     conn = get_db_connection()
     if not conn:
-        return total_calls, user_calls, per_plugin
+        print("No database configured.")
+        return
     try:
+        day = 'date("createdAt")' if DB_BACKEND == "sqlite" else \
+              '("createdAt" AT TIME ZONE \'UTC\')::date'
         with conn.cursor() as cur:
-            # Get total calls this month for ALL users
-            cur.execute('''
-                SELECT COUNT(*) FROM "ApiCall"
-                WHERE "createdAt" >= date_trunc('month', CURRENT_DATE)
+            cur.execute('DELETE FROM "ApiCallRollup"')
+            cur.execute(f'''
+                INSERT INTO "ApiCallRollup" (day, "tenantId", "apiKeyId", "plugId", calls)
+                SELECT {day}, "tenantId", COALESCE("apiKeyId", ''), "plugId", COUNT(*)
+                FROM "ApiCall"
+                GROUP BY 1, 2, 3, 4
             ''')
-            row = cur.fetchone()
-            if row: total_calls = row[0]
-            
-            # Get calls by plugin this month for ALL users
-            cur.execute('''
-                SELECT "plugId", COUNT(*) FROM "ApiCall"
-                WHERE "createdAt" >= date_trunc('month', CURRENT_DATE)
-                GROUP BY "plugId"
-            ''')
-            for row in cur.fetchall():
-                plug_id = row[0].replace("-v1", "")
-                per_plugin[plug_id] = per_plugin.get(plug_id, 0) + row[1]
-            
-            # Get calls by specifically this API key
-            if api_key:
-                import hashlib
-                key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+            print(f"✓  {cur.rowcount} rollup rows written")
+        conn.commit()
+    finally:
+        conn.close()
+
+# ── PLUGIN CONFIG CACHE ───────────────────────────────────────────────────────
+# (tenant_id, plug_id) → (fetched_at, config or None). Kept fresh by the
+# change watcher below; CONFIG_MAX_AGE_S is only a backstop (e.g. deleted
+# rows, which leave no updatedAt behind). Past that age an entry is still
+# served while one background refresh runs, so a Supabase blip never fails
+# or slows chat traffic.
+CONFIG_MAX_AGE_S = float(os.environ.get("CONFIG_MAX_AGE_S", "300"))
+CONFIG_POLL_S    = float(os.environ.get("CONFIG_POLL_S", "5"))
+
+_config_cache: dict[tuple, tuple[float, object]] = {}
+_config_refreshing: set = set()
+_config_lock = threading.Lock()
+
+
+def _fetch_plugin_config(tenant_id: str, plug_id: str) -> tuple[bool, object]:
+    """(ok, row). ok is False when the DB could not be asked."""
+    with db_connection() as conn:
+        if not conn:
+            return False, None
+        try:
+            with conn.cursor() as cur:
                 cur.execute('''
-                    SELECT COUNT(*) FROM "ApiCall"
-                    WHERE "createdAt" >= date_trunc('month', CURRENT_DATE)
-                      AND "apiKeyId" = (SELECT id FROM "ApiKey" WHERE "keyHash" = %s)
-                ''', (key_hash,))
+                    SELECT persona, "decisionTree", guardrails
+                    FROM "PluginConfig"
+                    WHERE "tenantId" = %s AND "pluginId" = %s
+                ''', (tenant_id, plug_id))
                 row = cur.fetchone()
-                if row: user_calls = row[0]
-            
-    except Exception as e:
-        print(f"Failed to get API usage: {e}")
+                if not row:
+                    return True, None
+                return True, {"persona": row[0], "decisionTree": row[1], "guardrails": row[2]}
+        except Exception as e:
+            print(f"Failed to get plugin config: {e}")
+            return False, None
+
+
+def _store_config(key: tuple, config) -> None:
+    with _config_lock:
+        _config_cache[key] = (time.monotonic(), config)
+
+
+def _refresh_config(key: tuple) -> None:
+    try:
+        ok, config = _fetch_plugin_config(*key)
+        if ok:
+            _store_config(key, config)
     finally:
-        conn.close()
-        
-    return total_calls, user_calls, per_plugin
+        with _config_lock:
+            _config_refreshing.discard(key)
+
 
 def get_plugin_config(api_key: str, plug_id: str):
-    conn = get_db_connection()
-    if not conn:
+    tenant_id = resolve_tenant(api_key)
+    if not tenant_id:
         return None
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            import hashlib
-            tenant_id = None
-            if api_key:
-                key_hash = hashlib.sha256(api_key.encode()).hexdigest()
-                cur.execute('SELECT "tenantId" FROM "ApiKey" WHERE "keyHash" = %s', (key_hash,))
-                row = cur.fetchone()
-                if row:
-                    tenant_id = row['tenantId']
-            
-            if not tenant_id:
-                cur.execute('SELECT id FROM "Tenant" LIMIT 1')
-                fallback = cur.fetchone()
-                if not fallback:
-                    return None
-                tenant_id = fallback['id']
-                
-            cur.execute('''
-                SELECT persona, "decisionTree", guardrails 
-                FROM "PluginConfig" 
-                WHERE "tenantId" = %s AND "pluginId" = %s
-            ''', (tenant_id, plug_id))
-            return cur.fetchone()
-    except Exception as e:
-        print(f"Failed to get plugin config: {e}")
-        return None
-    finally:
-        conn.close()
+    key = (tenant_id, plug_id)
+
+    with _config_lock:
+        entry = _config_cache.get(key)
+        stale = entry is not None and time.monotonic() - entry[0] > CONFIG_MAX_AGE_S
+        if stale and key not in _config_refreshing:
+            _config_refreshing.add(key)
+            threading.Thread(target=_refresh_config, args=(key,), daemon=True).start()
+    if entry is not None:
+        record_cache("plugin_config", True)
+        return entry[1]
+
+    record_cache("plugin_config", False)
+    ok, config = _fetch_plugin_config(tenant_id, plug_id)
+    if ok:
+        _store_config(key, config)
+    return config
+
+
+# ── CHANGE WATCHER ────────────────────────────────────────────────────────────
+# Polls updatedAt / revokedAt watermarks so every worker sees dashboard edits
+# within CONFIG_POLL_S: changed PluginConfig rows are written straight into
+# the cache, revoked ApiKeys are dropped from the resolver cache. Polling
+# (not LISTEN/NOTIFY) because Supabase's transaction pooler can't LISTEN.
+
+_watermarks: dict[str, object] = {}
+_watcher: threading.Thread = None
+_watcher_stop = threading.Event()
+
+
+def poll_changes() -> bool:
+    """One watcher pass. Returns False if the DB was unreachable."""
+    with db_connection() as conn:
+        if not conn:
+            return False
+        try:
+            with conn.cursor() as cur:
+                if not _watermarks:
+                    # First pass: start from the DB clock, everything older is already fresh-on-miss.
+                    now = _db_now(cur)
+                    _watermarks.update(config=now, revoked=now)
+                    conn.rollback()
+                    return True
+
+                cur.execute('''
+                    SELECT "tenantId", "pluginId", persona, "decisionTree", guardrails, "updatedAt"
+                    FROM "PluginConfig"
+                    WHERE "updatedAt" >= %s
+                ''', (_watermarks["config"],))
+                for tenant_id, plugin_id, persona, decision_tree, guardrails, updated_at in cur.fetchall():
+                    _store_config((tenant_id, plugin_id), {
+                        "persona": persona, "decisionTree": decision_tree, "guardrails": guardrails,
+                    })
+                    _watermarks["config"] = max(_watermarks["config"], _naive_utc(updated_at))
+
+                cur.execute('''
+                    SELECT id, "revokedAt" FROM "ApiKey" WHERE "revokedAt" >= %s
+                ''', (_watermarks["revoked"],))
+                for api_key_id, revoked_at in cur.fetchall():
+                    invalidate_api_key(api_key_id=api_key_id)
+                    _watermarks["revoked"] = max(_watermarks["revoked"], _naive_utc(revoked_at))
+            conn.rollback()
+            return True
+        except Exception as e:
+            print(f"Failed to poll config changes: {e}")
+            return False
+
+
+def start_change_watcher() -> None:
+    global _watcher
+    if _watcher is not None or CONFIG_POLL_S <= 0 or not _db_configured():
+        return
+
+    def _loop():
+        while not _watcher_stop.wait(CONFIG_POLL_S):
+            poll_changes()
+
+    _watcher_stop.clear()
+    _watcher = threading.Thread(target=_loop, name="config-watcher", daemon=True)
+    _watcher.start()
+
+
+def stop_change_watcher() -> None:
+    global _watcher
+    _watcher_stop.set()
+    if _watcher is not None:
+        _watcher.join(timeout=CONFIG_POLL_S)
+        _watcher = None
+
+def sync_rate_limit_usage(deltas: dict):
+    """
+    Add each worker-local token delta to the shared per-key counter.
+    Returns {key_hash: global_total} or None if the DB is unavailable.
+    """
+    with db_connection() as conn:
+        if not conn:
+            return None
+        try:
+            totals = {}
+            now = datetime.now(timezone.utc)
+            with conn.cursor() as cur:
+                for key_hash, delta in deltas.items():
+                    cur.execute('''
+                        INSERT INTO "RateLimitBucket" ("keyHash", consumed, "updatedAt")
+                        VALUES (%s, %s, %s)
+                        ON CONFLICT ("keyHash") DO UPDATE
+                        SET consumed = "RateLimitBucket".consumed + EXCLUDED.consumed,
+                            "updatedAt" = EXCLUDED."updatedAt"
+                        RETURNING consumed
+                    ''', (key_hash, delta, now))
+                    totals[key_hash] = cur.fetchone()[0]
+                conn.commit()
+            return totals
+        except Exception as e:
+            print(f"Failed to sync rate limits: {e}")
+            return None
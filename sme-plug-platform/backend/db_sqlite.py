@@ -0,0 +1,261 @@
+"""
+db_sqlite.py — Embedded SQLite storage for single-node deployments.
+Selected with DB_BACKEND=sqlite; the database lives at SQLITE_PATH. It
+holds the slice of the Prisma schema that the backend reads and writes:
+Tenant, ApiKey, PluginConfig, ApiCall, ApiCallRollup, Document and
+RateLimitBucket. Table and column names match Postgres.
+
+SqliteConnection wraps sqlite3 in the small part of the psycopg2 API that
+db.py uses: cursor() as a context manager, %s placeholders and
+commit/rollback. That lets the queries in db.py run unchanged on either
+backend. WAL mode means readers never block the log writer, and several
+gunicorn workers on one box can share the file.
+
+Edge nodes have no dashboard, so copy the control-plane rows across once
+(and again after key or config changes):
+  python -m backend.db_sqlite import-postgres
+"""
+
+import os
+import sys
+import sqlite3
+import threading
+import contextlib
+from pathlib import Path
+from datetime import date, datetime, timezone
+
+SQLITE_PATH            = os.environ.get("SQLITE_PATH", "./data/sme_plug.db")
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS "Tenant" (
+    id            TEXT PRIMARY KEY,
+    "companyName" TEXT NOT NULL,
+    plan          TEXT NOT NULL DEFAULT 'starter',
+    "createdAt"   TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS "ApiKey" (
+    id          TEXT PRIMARY KEY,
+    "tenantId"  TEXT NOT NULL,
+    "pluginId"  TEXT NOT NULL,
+    name        TEXT NOT NULL,
+    "keyHash"   TEXT NOT NULL UNIQUE,
+    prefix      TEXT NOT NULL,
+    "lastUsed"  TIMESTAMP,
+    "createdAt" TIMESTAMP,
+    "revokedAt" TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS "PluginConfig" (
+    id             TEXT PRIMARY KEY,
+    "tenantId"     TEXT NOT NULL,
+    "pluginId"     TEXT NOT NULL,
+    persona        TEXT NOT NULL,
+    "decisionTree" TEXT NOT NULL,
+    guardrails     TEXT NOT NULL,
+    "updatedAt"    TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS "PluginConfig_tenant_plugin" ON "PluginConfig" ("tenantId", "pluginId");
+CREATE INDEX IF NOT EXISTS "PluginConfig_updatedAt" ON "PluginConfig" ("updatedAt");
+CREATE TABLE IF NOT EXISTS "ApiCall" (
+    id          TEXT PRIMARY KEY,
+    "tenantId"  TEXT NOT NULL,
+    "apiKeyId"  TEXT,
+    "plugId"    TEXT NOT NULL,
+    endpoint    TEXT NOT NULL,
+    status      INTEGER NOT NULL,
+    "latencyMs" INTEGER NOT NULL,
+    "createdAt" TIMESTAMP NOT NULL
+);
+CREATE TABLE IF NOT EXISTS "ApiCallRollup" (
+    day        DATE NOT NULL,
+    "tenantId" TEXT NOT NULL,
+    "apiKeyId" TEXT NOT NULL DEFAULT '',
+    "plugId"   TEXT NOT NULL,
+    calls      INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, "tenantId", "apiKeyId", "plugId")
+);
+CREATE INDEX IF NOT EXISTS "ApiCallRollup_key_day" ON "ApiCallRollup" ("apiKeyId", day);
+CREATE TABLE IF NOT EXISTS "Document" (
+    id          TEXT PRIMARY KEY,
+    "tenantId"  TEXT NOT NULL,
+    "plugId"    TEXT NOT NULL,
+    filename    TEXT NOT NULL,
+    "sizeBytes" INTEGER NOT NULL,
+    "createdAt" TIMESTAMP NOT NULL
+);
+CREATE TABLE IF NOT EXISTS "RateLimitBucket" (
+    "keyHash"   TEXT PRIMARY KEY,
+    consumed    INTEGER NOT NULL DEFAULT 0,
+    "updatedAt" TIMESTAMP NOT NULL
+);
+'''
+
+# Store timestamps as UTC ISO-8601 text and parse them back by declared type,
+# so watermarks and dates compare the same way they do coming out of psycopg2.
+# Naive values (Prisma's timestamp(3) columns) are taken to be UTC.
+sqlite3.register_adapter(datetime, lambda d: (d if d.tzinfo else d.replace(tzinfo=timezone.utc)).isoformat())
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_converter("TIMESTAMP", lambda b: datetime.fromisoformat(b.decode()))
+sqlite3.register_converter("DATE", lambda b: date.fromisoformat(b.decode()))
+
+
+class _Cursor:
+    def __init__(self, cur: sqlite3.Cursor):
+        self._cur = cur
+
+    def execute(self, sql: str, params=()):
+        self._cur.execute(sql.replace("%s", "?"), params)
+        return self
+
+    def executemany(self, sql: str, rows):
+        self._cur.executemany(sql.replace("%s", "?"), rows)
+        return self
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    @property
+    def rowcount(self) -> int:
+        return self._cur.rowcount
+
+    def close(self) -> None:
+        self._cur.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SqliteConnection:
+    """sqlite3 connection with the psycopg2 surface db.py relies on."""
+
+    def __init__(self, path: str):
+        self.raw = sqlite3.connect(
+            path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False,
+            timeout=SQLITE_BUSY_TIMEOUT_MS / 1000.0,
+        )
+        self.raw.execute("PRAGMA journal_mode=WAL")
+        # NORMAL is durable across app crashes in WAL mode; only an OS crash
+        # can lose the last few commits, which is fine for call logs.
+        self.raw.execute("PRAGMA synchronous=NORMAL")
+        self.raw.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        self.closed = False
+
+    def cursor(self) -> _Cursor:
+        return _Cursor(self.raw.cursor())
+
+    def commit(self) -> None:
+        self.raw.commit()
+
+    def rollback(self) -> None:
+        self.raw.rollback()
+
+    @property
+    def in_transaction(self) -> bool:
+        return self.raw.in_transaction
+
+    def close(self) -> None:
+        self.raw.close()
+        self.closed = True
+
+
+_local = threading.local()
+_schema_ready: set = set()
+_schema_lock = threading.Lock()
+
+
+def connect(path: str = None) -> SqliteConnection:
+    """Open a new connection, creating the file and schema on first use."""
+    path = path or SQLITE_PATH
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = SqliteConnection(path)
+    key = (os.getpid(), os.path.abspath(path))
+    if key not in _schema_ready:
+        with _schema_lock:
+            if key not in _schema_ready:
+                conn.raw.executescript(SCHEMA)
+                _schema_ready.add(key)
+    return conn
+
+
+@contextlib.contextmanager
+def connection():
+    """
+    This thread's connection (one per thread and process, opened lazily) for
+    the duration of the block. Yields None if the file can't be opened.
+    Anything left uncommitted is rolled back, as db._release does for Postgres.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or conn.closed or getattr(_local, "pid", None) != os.getpid():
+        try:
+            conn = connect()
+        except sqlite3.Error as e:
+            print(f"SQLite Connection Error: {e}")
+            yield None
+            return
+        _local.conn, _local.pid = conn, os.getpid()
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+
+
+def close() -> None:
+    conn = getattr(_local, "conn", None)
+    if conn is not None and not conn.closed and getattr(_local, "pid", None) == os.getpid():
+        conn.close()
+    _local.conn = None
+
+
+# ── IMPORT FROM POSTGRES ──────────────────────────────────────────────────────
+
+_IMPORTED_TABLES = {
+    "Tenant":       ("id", "companyName", "plan", "createdAt"),
+    "ApiKey":       ("id", "tenantId", "pluginId", "name", "keyHash", "prefix", "lastUsed",
+                     "createdAt", "revokedAt"),
+    "PluginConfig": ("id", "tenantId", "pluginId", "persona", "decisionTree", "guardrails",
+                     "updatedAt"),
+}
+
+
+def import_from_postgres(pg_url: str, path: str = None) -> dict:
+    """Copy tenants, API keys and plugin configs into the SQLite file. Returns row counts."""
+    import psycopg2
+
+    src = psycopg2.connect(pg_url)
+    dst = connect(path)
+    counts = {}
+    try:
+        with src.cursor() as read, dst.cursor() as write:
+            for table, columns in _IMPORTED_TABLES.items():
+                cols = ", ".join(f'"{c}"' for c in columns)
+                read.execute(f'SELECT {cols} FROM "{table}"')
+                rows = read.fetchall()
+                write.executemany(
+                    f'INSERT OR REPLACE INTO "{table}" ({cols}) VALUES ({", ".join(["%s"] * len(columns))})',
+                    rows,
+                )
+                counts[table] = len(rows)
+        dst.commit()
+    finally:
+        src.close()
+        dst.close()
+    return counts
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["import-postgres"]:
+        url = os.environ.get("DIRECT_URL") or os.environ.get("DATABASE_URL")
+        if not url:
+            sys.exit("Set DIRECT_URL or DATABASE_URL to the Postgres database to copy from.")
+        for table, n in import_from_postgres(url).items():
+            print(f"✓  {table}: {n} rows")
+    else:
+        connect()
+        print(f"✓  SQLite schema ready at {SQLITE_PATH}")
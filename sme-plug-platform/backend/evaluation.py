@@ -0,0 +1,266 @@
+"""
+evaluation.py — Golden-set evaluation for a plug's retrieval + generation.
+Each plug's golden set lives in data/eval/golden/{plug_id}.jsonl, one
+GoldenQAPair per line. A run sends every question through retrieve() and
+the answer function on a bounded thread pool, then scores it:
+
+  faithfulness        answer sentences supported by the retrieved contexts
+  context_precision   rank-weighted share of retrieved chunks that are relevant
+  context_recall      ground-truth sentences covered by the retrieved contexts
+  answer_correctness  token F1 between the answer and the ground truth
+
+The scores are RAGAS-style lexical approximations: deterministic, cheap,
+and free of any judge model. Per-question results are cached on the
+question, its ground truth, the plug's kb_version and the LLM. A re-run
+therefore only evaluates questions that changed, or all of them once the
+index has been rebuilt. With the "stub" LLM, answers are extracted from the
+retrieved chunks locally, so CI can run evaluations offline.
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List
+
+from backend.locks import file_lock
+from backend.rag.ingestor import kb_version
+from backend.rag.retriever import retrieve
+from backend.schemas import EvalQuestionResult, EvalRunResponse, GoldenQAPair, RAGASScore
+
+EVAL_DIR            = Path(os.environ.get("EVAL_DIR", "./data/eval"))
+EVAL_CONCURRENCY    = int(os.environ.get("EVAL_CONCURRENCY", "4"))
+EVAL_TOP_K          = int(os.environ.get("EVAL_TOP_K", "5"))
+EVAL_PASS_THRESHOLD = float(os.environ.get("EVAL_PASS_THRESHOLD", "0.7"))
+
+METRICS = ("faithfulness", "context_precision", "context_recall", "answer_correctness")
+
+AnswerFn = Callable[[str, List[dict]], str]
+
+_STOPWORDS = frozenset(
+    "the a an and or of to in on for is are was were be been by with as at from that this "
+    "these those it its into than then there their what which who whom how why when where "
+    "can could should would may might must shall will not no do does did has have had".split()
+)
+_TOKEN_RE    = re.compile(r"[a-z0-9]+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_CITATION_RE = re.compile(r"\[Source:[^\]]+\]")
+
+# ── GOLDEN SETS + CACHE ───────────────────────────────────────────────────────
+
+def golden_path(plug_id: str) -> Path:
+    return EVAL_DIR / "golden" / f"{plug_id}.jsonl"
+
+
+def load_golden(plug_id: str) -> List[GoldenQAPair]:
+    """The plug's golden QA pairs. Raises FileNotFoundError when it has none."""
+    pairs = []
+    with open(golden_path(plug_id), encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                pairs.append(GoldenQAPair(**{"plug_id": plug_id, "source_doc": "", **json.loads(line)}))
+    return pairs
+
+
+def _question_key(pair: GoldenQAPair) -> str:
+    return hashlib.sha256(json.dumps(
+        [pair.question, pair.ground_truth, pair.source_doc]
+    ).encode()).hexdigest()[:32]
+
+
+def _is_fresh(entry: dict, kb: str, llm_id: str) -> bool:
+    return bool(entry) and entry["kb_version"] == kb and entry["llm"] == llm_id
+
+
+def _read_json(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_json(path: Path, data: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(data, indent=1, default=str))
+    os.replace(tmp, path)
+
+
+# ── METRICS ───────────────────────────────────────────────────────────────────
+
+def _tokens(text: str) -> set:
+    return {t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 2 and t not in _STOPWORDS}
+
+
+def _sentences(text: str) -> List[str]:
+    text = _CITATION_RE.sub("", text)
+    return [s.strip() for s in _SENTENCE_RE.split(text) if _tokens(s)]
+
+
+def _supported(sentence: str, pool: set, threshold: float) -> bool:
+    tokens = _tokens(sentence)
+    return bool(tokens) and len(tokens & pool) / len(tokens) >= threshold
+
+
+def faithfulness(answer: str, contexts: List[str]) -> float:
+    claims = _sentences(answer)
+    if not claims:
+        return 0.0
+    pool = set().union(*(_tokens(c) for c in contexts)) if contexts else set()
+    return sum(_supported(c, pool, 0.6) for c in claims) / len(claims)
+
+
+def context_precision(chunks: List[dict], ground_truth: str, source_doc: str = "") -> float:
+    """Average precision over the ranked chunks; a chunk is relevant if it is
+    from the source document or covers enough of the ground truth."""
+    truth = _tokens(ground_truth)
+    relevant_at = []
+    for chunk in chunks:
+        from_source = bool(source_doc) and chunk.get("filename") == source_doc
+        overlap = len(truth & _tokens(chunk["text"])) / len(truth) if truth else 0.0
+        relevant_at.append(from_source or overlap >= 0.3)
+    hits, total = 0, 0.0
+    for k, relevant in enumerate(relevant_at, 1):
+        if relevant:
+            hits += 1
+            total += hits / k
+    return total / hits if hits else 0.0
+
+
+def context_recall(contexts: List[str], ground_truth: str) -> float:
+    claims = _sentences(ground_truth)
+    if not claims:
+        return 0.0
+    pool = set().union(*(_tokens(c) for c in contexts)) if contexts else set()
+    return sum(_supported(c, pool, 0.5) for c in claims) / len(claims)
+
+
+def answer_correctness(answer: str, ground_truth: str) -> float:
+    got, want = _tokens(_CITATION_RE.sub("", answer)), _tokens(ground_truth)
+    common = len(got & want)
+    if not common:
+        return 0.0
+    precision, recall = common / len(got), common / len(want)
+    return 2 * precision * recall / (precision + recall)
+
+
+# ── ANSWERING ─────────────────────────────────────────────────────────────────
+
+def stub_answer(question: str, chunks: List[dict]) -> str:
+    """Offline stand-in for the LLM: the two context sentences closest to the question, cited."""
+    if not chunks:
+        return "I cannot verify this claim without a source document."
+    wanted = _tokens(question)
+    candidates = [
+        (len(wanted & _tokens(s)), -i, s)
+        for i, s in enumerate(s for chunk in chunks[:3] for s in _sentences(chunk["text"]))
+    ]
+    best = [s for _, _, s in sorted(candidates, reverse=True)[:2]]
+    top = chunks[0]
+    return " ".join(best) + f" [Source: {top['filename']}, pg {top['page']}]"
+
+
+def _evaluate_one(pair: GoldenQAPair, plug_id: str, answer_fn: AnswerFn, top_k: int) -> EvalQuestionResult:
+    chunks = retrieve(pair.question, plug_id, top_k=top_k)
+    answer = answer_fn(pair.question, chunks)
+    contexts = [c["text"] for c in chunks]
+    return EvalQuestionResult(
+        question=pair.question,
+        answer=answer,
+        contexts=contexts,
+        faithfulness=round(faithfulness(answer, contexts), 4),
+        context_precision=round(context_precision(chunks, pair.ground_truth, pair.source_doc), 4),
+        context_recall=round(context_recall(contexts, pair.ground_truth), 4),
+        answer_correctness=round(answer_correctness(answer, pair.ground_truth), 4),
+    )
+
+
+# ── RUNS ──────────────────────────────────────────────────────────────────────
+
+def pending_questions(plug_id: str, llm_id: str, force: bool = False) -> int:
+    """How many golden questions a run would answer afresh (the rest come from the cache)."""
+    golden = load_golden(plug_id)
+    if force:
+        return len(golden)
+    kb = kb_version(plug_id)
+    cache = _read_json(EVAL_DIR / "cache" / f"{plug_id}.json")
+    return sum(not _is_fresh(cache.get(_question_key(pair)), kb, llm_id) for pair in golden)
+
+
+def run_eval(
+    plug_id: str,
+    answer_fn: AnswerFn,
+    llm_id: str,
+    *,
+    concurrency: int = EVAL_CONCURRENCY,
+    top_k: int = EVAL_TOP_K,
+    force: bool = False,
+) -> EvalRunResponse:
+    """
+    Evaluate the plug's golden set. llm_id names the answer function (e.g.
+    "groq:llama-3.3-70b-versatile" or "stub") and is part of the cache key.
+    Every answered question is cached even when others fail; the first
+    failure is then re-raised, so a retry only answers what is missing.
+    Blocking — call it from a thread. One run per plug at a time, across workers.
+    """
+    with file_lock(EVAL_DIR / "locks" / f"{plug_id}.lock"):
+        golden = load_golden(plug_id)
+        kb = kb_version(plug_id)
+        cache_path = EVAL_DIR / "cache" / f"{plug_id}.json"
+        cache = _read_json(cache_path)
+
+        def one(pair: GoldenQAPair):
+            key = _question_key(pair)
+            entry = cache.get(key)
+            if not force and _is_fresh(entry, kb, llm_id):
+                return EvalQuestionResult(**entry["result"], cached=True)
+            try:
+                return _evaluate_one(pair, plug_id, answer_fn, top_k)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="eval") as pool:
+            results = list(pool.map(one, golden))
+
+        # Keep only entries for the current golden set, so the cache never outgrows it.
+        fresh = {}
+        for pair, result in zip(golden, results):
+            key = _question_key(pair)
+            if isinstance(result, Exception):
+                if key in cache:
+                    fresh[key] = cache[key]
+                continue
+            fresh[key] = {"kb_version": kb, "llm": llm_id, "result": result.model_dump(exclude={"cached"})}
+        _write_json(cache_path, fresh)
+
+        failed = [r for r in results if isinstance(r, Exception)]
+        if failed:
+            raise failed[0]
+
+        n = len(results) or 1
+        means = {m: round(sum(getattr(r, m) for r in results) / n, 4) for m in METRICS}
+        overall = round(sum(means.values()) / len(METRICS), 4)
+
+        # baseline_comparison: change in each score since the plug's previous run.
+        runs_path = EVAL_DIR / "runs" / f"{plug_id}.json"
+        previous = _read_json(runs_path)
+        current = {**means, "overall": overall}
+        baseline = {m: round(v - previous[m], 4) for m, v in current.items() if m in previous}
+        _write_json(runs_path, {**current, "timestamp": datetime.utcnow().isoformat(),
+                                "kb_version": kb, "llm": llm_id})
+
+    return EvalRunResponse(
+        scores=RAGASScore(**means, timestamp=datetime.utcnow(), plug_id=plug_id),
+        questions_tested=len(results),
+        passed=overall >= EVAL_PASS_THRESHOLD,
+        baseline_comparison=baseline,
+        overall=overall,
+        questions_cached=sum(r.cached for r in results),
+        kb_version=kb,
+        llm="stub" if llm_id == "stub" else "groq",
+        results=results,
+    )
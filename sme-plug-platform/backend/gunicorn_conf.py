@@ -0,0 +1,31 @@
+"""
+gunicorn_conf.py — Multi-worker launch with the embedder preloaded pre-fork.
+Run: gunicorn -c backend/gunicorn_conf.py backend.main:app
+
+Settings come from the environment:
+  WEB_CONCURRENCY           worker processes (default 4)
+  PORT                      listen port (default 8000)
+  TORCH_THREADS_PER_WORKER  torch intra-op threads per worker (0 = torch default)
+
+See DEPLOYMENT.md for measured memory / cold-start numbers.
+"""
+
+import os
+
+bind         = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers      = int(os.environ.get("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app  = True      # import backend.main (and the embedder) once, in the master
+timeout      = 120
+keepalive    = 5
+
+
+def when_ready(server):
+    from backend.preload import preload_master
+    timings = preload_master()
+    server.log.info(f"Preloaded models before fork: {timings}")
+
+
+def post_fork(server, worker):
+    from backend.preload import warm_worker
+    warm_worker()
@@ -0,0 +1,206 @@
+"""
+mock_erp_server.py — Stand-in SAP ERP over HTTP for offline sync work and benchmarks.
+Serves the bundled sap_mock tenants plus any number of generated ones in
+the wire format that sap_connector expects. It has configurable per-request
+latency and a background "churn" that keeps modifying records, so delta
+sync always has something to pull.
+
+  python -m backend.integrations.mock_erp_server --port 8100 \
+      --tenants 3 --materials 50000 --pos 20000 --latency-ms 40 --churn-per-s 20
+  SAP_ERP_URL=http://127.0.0.1:8100 uvicorn backend.main:app --port 8000
+"""
+
+import json
+import time
+import random
+import bisect
+import argparse
+import threading
+import urllib.parse
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from backend.integrations.sap_mock import SAP_DATABASE
+
+_MATERIAL_STATUSES = ("Healthy", "Healthy", "Healthy", "Low", "Critical")
+_PO_STATUSES       = ("Processing", "In Transit", "Delivered", "Delayed")
+_NOUNS   = ("Steel Rebar", "Cement", "Timber", "Copper Wire", "PVC Pipe", "Gloves", "Toner", "Gauze")
+_VENDORS = ("Global Steel LLC", "CementCo Inc", "PharmaSupply+", "Office Depot Corporate", "Acme Supply")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+class _Table:
+    """Records kept sorted by (updated_at, id) so changed-since pages are a bisect + slice."""
+
+    def __init__(self, records: List[dict]):
+        stamp = _now()
+        self.by_id: Dict[str, dict] = {}
+        self.order: List[tuple] = []
+        for r in records:
+            r = dict(r, updated_at=stamp)
+            self.by_id[r["id"]] = r
+            self.order.append((r["updated_at"], r["id"]))
+        self.order.sort()
+        self.lock = threading.Lock()
+
+    def touch(self, record_id: str, **changes) -> None:
+        with self.lock:
+            r = self.by_id[record_id]
+            self.order.pop(bisect.bisect_left(self.order, (r["updated_at"], r["id"])))
+            r.update(changes, updated_at=_now())
+            self.order.append((r["updated_at"], r["id"]))   # newest stamp sorts last
+
+    def page(self, changed_since: Optional[str], cursor: Optional[str], limit: int) -> dict:
+        """
+        Both changed_since and cursor are "updated_at|id" positions (a bare
+        timestamp also works for changed_since). Records strictly after the
+        position come back, so the watermark never re-sends its own boundary.
+        """
+        with self.lock:
+            stamp, _, rid = (cursor or changed_since or "").partition("|")
+            start = bisect.bisect_right(self.order, (stamp, rid)) if rid else \
+                bisect.bisect_left(self.order, (stamp, ""))
+            keys = self.order[start:start + limit]
+            items = [dict(self.by_id[rid]) for _, rid in keys]
+            more = start + limit < len(self.order)
+            last = self.order[-1] if self.order else None
+            watermark = f"{last[0]}|{last[1]}" if last else changed_since
+        return {
+            "items":       items,
+            "next_cursor": f"{keys[-1][0]}|{keys[-1][1]}" if more and keys else None,
+            "watermark":   watermark,
+        }
+
+
+class MockErp:
+    def __init__(self, tenants: int, materials: int, pos: int, seed: int = 7):
+        rng = random.Random(seed)
+        self.tenants: Dict[str, dict] = {}
+        for tenant_id, data in SAP_DATABASE.items():
+            self._add(tenant_id, data)
+        for t in range(tenants):
+            tenant_id = f"tenant-{t}"
+            self._add(tenant_id, {
+                "tenant_name": f"Generated Tenant {t}",
+                "kpis": {"total_inventory_value": f"${rng.randint(1, 900)}M", "open_pos": pos,
+                         "stock_alerts": materials // 20},
+                "materials": [
+                    {"id": f"MAT-{t}-{i:06d}", "name": f"{rng.choice(_NOUNS)} {i % 997}",
+                     "stock": rng.randint(0, 5000), "unit": "Units", "status": rng.choice(_MATERIAL_STATUSES)}
+                    for i in range(materials)
+                ],
+                "pos": [
+                    {"id": f"PO-{t}-{i:06d}", "vendor": rng.choice(_VENDORS),
+                     "amount": f"${rng.randint(100, 500000):,}", "delivery": "Nov 1, 2026",
+                     "status": rng.choice(_PO_STATUSES)}
+                    for i in range(pos)
+                ],
+            })
+        self._rng = rng
+
+    def _add(self, tenant_id: str, data: dict) -> None:
+        self.tenants[tenant_id] = {
+            "tenant_name": data["tenant_name"],
+            "kpis":        dict(data["kpis"]),
+            "materials":   _Table(data["materials"]),
+            "pos":         _Table(data["pos"]),
+        }
+
+    def churn(self, n: int) -> None:
+        """Modify n random records across all tenants (stock moves, PO status changes)."""
+        for _ in range(n):
+            tenant = self.tenants[self._rng.choice(list(self.tenants))]
+            kind = self._rng.choice(("materials", "pos"))
+            table = tenant[kind]
+            if not table.by_id:
+                continue
+            record_id = table.order[self._rng.randrange(len(table.order))][1]
+            if kind == "materials":
+                table.touch(record_id, stock=self._rng.randint(0, 5000))
+            else:
+                table.touch(record_id, status=self._rng.choice(_PO_STATUSES))
+
+
+def make_handler(erp: MockErp, latency_ms: float, jitter_ms: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive, like a real ERP gateway
+        # Headers and body go out as separate writes; with Nagle on, each
+        # keep-alive response waits ~40 ms on the client's delayed ACK.
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if latency_ms or jitter_ms:
+                time.sleep(max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+            url = urllib.parse.urlsplit(self.path)
+            params = dict(urllib.parse.parse_qsl(url.query))
+            parts = [p for p in url.path.split("/") if p]
+
+            if parts == ["tenants"]:
+                return self._send(200, {"tenants": list(erp.tenants)})
+            if len(parts) != 3 or parts[0] != "tenants" or parts[1] not in erp.tenants:
+                return self._send(404, {"detail": "not found"})
+            tenant = erp.tenants[parts[1]]
+            if parts[2] == "kpis":
+                return self._send(200, {"tenant_name": tenant["tenant_name"], "kpis": tenant["kpis"]})
+            if parts[2] in ("materials", "pos"):
+                limit = max(1, min(int(params.get("limit", "500")), 5000))
+                return self._send(200, tenant[parts[2]].page(
+                    params.get("changed_since"), params.get("cursor"), limit,
+                ))
+            return self._send(404, {"detail": "not found"})
+
+    return Handler
+
+
+def serve(port: int = 8100, tenants: int = 0, materials: int = 1000, pos: int = 500,
+          latency_ms: float = 0, jitter_ms: float = 0, churn_per_s: float = 0,
+          host: str = "127.0.0.1") -> tuple:
+    """Start the server in a background thread. Returns (server, erp)."""
+    erp = MockErp(tenants, materials, pos)
+    server = ThreadingHTTPServer((host, port), make_handler(erp, latency_ms, jitter_ms))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-erp", daemon=True).start()
+
+    if churn_per_s > 0:
+        def _churn():
+            while True:
+                time.sleep(1.0)
+                erp.churn(int(churn_per_s))
+        threading.Thread(target=_churn, name="mock-erp-churn", daemon=True).start()
+    return server, erp
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock SAP ERP server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--tenants", type=int, default=0, help="generated tenants (besides the 3 demo ones)")
+    parser.add_argument("--materials", type=int, default=1000, help="materials per generated tenant")
+    parser.add_argument("--pos", type=int, default=500, help="POs per generated tenant")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--churn-per-s", type=float, default=0, help="records modified per second")
+    args = parser.parse_args()
+
+    server, erp = serve(args.port, args.tenants, args.materials, args.pos,
+                        args.latency_ms, args.jitter_ms, args.churn_per_s, args.host)
+    print(f"Mock ERP on http://{args.host}:{args.port} — {len(erp.tenants)} tenants")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,285 @@
+"""
+sap_connector.py — Local per-tenant cache of SAP ERP data, kept fresh by delta sync.
+Request handlers (the /integrations routes, build_sap_context) only ever
+read from this cache. They never talk to the ERP.
+
+With SAP_ERP_URL set, a background thread runs every SAP_SYNC_INTERVAL_S.
+For each tenant it pulls the materials and POs changed since the last
+watermark, in pages of SAP_SYNC_PAGE_SIZE, using keyset cursors over one
+keep-alive connection. It also pulls the KPI block. Without SAP_ERP_URL,
+tenants are loaded from the bundled mock data on first use
+(see sap_mock.get_tenant_data).
+
+ERP wire format (served by mock_erp_server.py):
+  GET /tenants                                   → {"tenants": [id, ...]}
+  GET /tenants/{id}/kpis                         → {"tenant_name", "kpis"}
+  GET /tenants/{id}/{materials|pos}?changed_since=&cursor=&limit=
+      → {"items": [{..., "updated_at", "deleted"?}], "next_cursor", "watermark"}
+Watermarks and cursors are opaque "updated_at|id" keyset positions.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import http.client
+import urllib.parse
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+SAP_ERP_URL          = os.environ.get("SAP_ERP_URL", "").rstrip("/")
+SAP_SYNC_INTERVAL_S  = float(os.environ.get("SAP_SYNC_INTERVAL_S", "30"))
+SAP_SYNC_PAGE_SIZE   = int(os.environ.get("SAP_SYNC_PAGE_SIZE", "500"))
+SAP_ERP_TIMEOUT_S    = float(os.environ.get("SAP_ERP_TIMEOUT_S", "10"))
+SAP_TENANTS          = [t for t in os.environ.get("SAP_TENANTS", "").split(",") if t]
+
+_KINDS = ("materials", "pos")
+_WIRE_ONLY = ("updated_at", "deleted")
+
+
+class TenantCache:
+    """One tenant's materials / POs (by id) and KPIs, plus the watermarks to sync from."""
+
+    def __init__(self, tenant_id: str):
+        self.tenant_id   = tenant_id
+        self.tenant_name = tenant_id
+        self.kpis: Dict[str, Any] = {}
+        self.records: Dict[str, Dict[str, dict]] = {kind: {} for kind in _KINDS}
+        self.watermarks: Dict[str, str] = {}
+        self.version   = 0
+        self.synced_at: Optional[datetime] = None
+        self._snapshot: Optional[dict] = None
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> dict:
+        """{"version", "digest", "tenant_name", "kpis", "materials", "pos"}, built once per version."""
+        snap = self._snapshot
+        if snap is not None and snap["version"] == self.version:
+            return snap
+        with self._lock:
+            if self._snapshot is None or self._snapshot["version"] != self.version:
+                snap = {
+                    "version":     self.version,
+                    "tenant_name": self.tenant_name,
+                    "kpis":        dict(self.kpis),
+                    "materials":   list(self.records["materials"].values()),
+                    "pos":         list(self.records["pos"].values()),
+                }
+                # Versions are per worker; the digest lets workers holding the
+                # same data agree on ETags.
+                snap["digest"] = hashlib.sha1(json.dumps(
+                    [snap["tenant_name"], snap["kpis"], snap["materials"], snap["pos"]],
+                    sort_keys=True, default=str,
+                ).encode()).hexdigest()[:16]
+                self._snapshot = snap
+            return self._snapshot
+
+    def load(self, data: Dict[str, Any]) -> None:
+        """Replace everything with a full dataset (sap_mock's shape)."""
+        with self._lock:
+            self.tenant_name = data["tenant_name"]
+            self.kpis = dict(data["kpis"])
+            for kind in _KINDS:
+                self.records[kind] = {r["id"]: dict(r) for r in data[kind]}
+            self.version += 1
+            self.synced_at = datetime.now()
+
+    def apply(self, kind: str, items: List[dict]) -> int:
+        """Upsert / delete changed records. Returns how many actually changed."""
+        changed = 0
+        with self._lock:
+            store = self.records[kind]
+            for item in items:
+                record = {k: v for k, v in item.items() if k not in _WIRE_ONLY}
+                if item.get("deleted"):
+                    changed += store.pop(record["id"], None) is not None
+                elif store.get(record["id"]) != record:
+                    store[record["id"]] = record
+                    changed += 1
+            if changed:
+                self.version += 1
+        return changed
+
+    def set_kpis(self, tenant_name: str, kpis: Dict[str, Any]) -> bool:
+        with self._lock:
+            if tenant_name == self.tenant_name and kpis == self.kpis:
+                return False
+            self.tenant_name, self.kpis = tenant_name, dict(kpis)
+            self.version += 1
+            return True
+
+
+_caches: Dict[str, TenantCache] = {}
+_caches_lock = threading.Lock()
+_listeners: List[Callable[[TenantCache], None]] = []
+
+
+def get_cache(tenant_id: str) -> Optional[TenantCache]:
+    return _caches.get(tenant_id)
+
+
+def _cache_for(tenant_id: str) -> TenantCache:
+    with _caches_lock:
+        cache = _caches.get(tenant_id)
+        if cache is None:
+            cache = _caches[tenant_id] = TenantCache(tenant_id)
+        return cache
+
+
+def load_tenant(tenant_id: str, data: Dict[str, Any]) -> TenantCache:
+    """Install a full dataset for a tenant (mock seeding, tests, manual overrides)."""
+    cache = _cache_for(tenant_id)
+    cache.load(data)
+    _notify(cache)
+    return cache
+
+
+def on_change(listener: Callable[[TenantCache], None]) -> None:
+    """Call listener(cache) from the sync thread whenever a tenant's data version moves."""
+    _listeners.append(listener)
+
+
+def _notify(cache: TenantCache) -> None:
+    for listener in _listeners:
+        try:
+            listener(cache)
+        except Exception as e:
+            print(f"SAP cache listener failed for {cache.tenant_id}: {e}")
+
+
+# ── ERP CLIENT ────────────────────────────────────────────────────────────────
+
+class ErpClient:
+    """Minimal JSON GET client on one keep-alive connection (reconnects once on failure)."""
+
+    def __init__(self, base_url: str, timeout: float = SAP_ERP_TIMEOUT_S):
+        parsed = urllib.parse.urlsplit(base_url)
+        self._https  = parsed.scheme == "https"
+        self._host   = parsed.netloc
+        self._prefix = parsed.path.rstrip("/")
+        self._timeout = timeout
+        self._conn: Optional[http.client.HTTPConnection] = None
+        self.requests = 0
+
+    def _connect(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+        return cls(self._host, timeout=self._timeout)
+
+    def get(self, path: str, params: Optional[dict] = None) -> dict:
+        query = urllib.parse.urlencode({k: v for k, v in (params or {}).items() if v not in (None, "")})
+        url = f"{self._prefix}{path}" + (f"?{query}" if query else "")
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = self._connect()
+            try:
+                self._conn.request("GET", url, headers={"Accept": "application/json"})
+                resp = self._conn.getresponse()
+                body = resp.read()
+            except (http.client.HTTPException, OSError):
+                self.close()
+                if attempt:
+                    raise
+                continue
+            self.requests += 1
+            if resp.status != 200:
+                raise RuntimeError(f"ERP {url} returned {resp.status}")
+            return json.loads(body)
+        raise RuntimeError("unreachable")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+# ── DELTA SYNC ────────────────────────────────────────────────────────────────
+
+def sync_tenant(client: ErpClient, tenant_id: str, page_size: int = SAP_SYNC_PAGE_SIZE) -> dict:
+    """
+    Pull everything changed since the tenant's watermarks. The first sync is
+    a full pull. Watermarks only advance once every page of a kind has been
+    applied, so a failed sync is simply repeated. Returns per-run stats.
+    """
+    cache = _cache_for(tenant_id)
+    stats = {"tenant": tenant_id, "fetched": 0, "changed": 0, "pages": 0}
+    started = time.perf_counter()
+    version = cache.version
+
+    kpis = client.get(f"/tenants/{tenant_id}/kpis")
+    cache.set_kpis(kpis["tenant_name"], kpis["kpis"])
+
+    for kind in _KINDS:
+        cursor, watermark = None, cache.watermarks.get(kind)
+        while True:
+            page = client.get(f"/tenants/{tenant_id}/{kind}", {
+                "changed_since": cache.watermarks.get(kind), "cursor": cursor, "limit": page_size,
+            })
+            stats["pages"]   += 1
+            stats["fetched"] += len(page["items"])
+            stats["changed"] += cache.apply(kind, page["items"])
+            watermark = page.get("watermark") or watermark
+            cursor = page.get("next_cursor")
+            if not cursor:
+                break
+        if watermark:
+            cache.watermarks[kind] = watermark
+
+    cache.synced_at = datetime.now()
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    if cache.version != version:
+        _notify(cache)
+    return stats
+
+
+def sync_all(client: Optional[ErpClient] = None) -> List[dict]:
+    own = client is None
+    client = client or ErpClient(SAP_ERP_URL)
+    try:
+        tenants = SAP_TENANTS or client.get("/tenants")["tenants"]
+        results = []
+        for tenant_id in tenants:
+            try:
+                results.append(sync_tenant(client, tenant_id))
+            except Exception as e:
+                print(f"SAP sync failed for {tenant_id}: {e}")
+                results.append({"tenant": tenant_id, "error": str(e)})
+        return results
+    finally:
+        if own:
+            client.close()
+
+
+_sync_thread: Optional[threading.Thread] = None
+_sync_stop = threading.Event()
+
+
+def start_sap_sync() -> None:
+    global _sync_thread
+    if _sync_thread is not None or not SAP_ERP_URL or SAP_SYNC_INTERVAL_S <= 0:
+        return
+
+    def _loop():
+        client = ErpClient(SAP_ERP_URL)
+        try:
+            while True:
+                try:
+                    sync_all(client)
+                except Exception as e:
+                    print(f"SAP sync failed: {e}")
+                if _sync_stop.wait(SAP_SYNC_INTERVAL_S):
+                    break
+        finally:
+            client.close()
+
+    _sync_stop.clear()
+    _sync_thread = threading.Thread(target=_loop, name="sap-sync", daemon=True)
+    _sync_thread.start()
+
+
+def stop_sap_sync() -> None:
+    global _sync_thread
+    _sync_stop.set()
+    if _sync_thread is not None:
+        _sync_thread.join(timeout=SAP_ERP_TIMEOUT_S)
+        _sync_thread = None
@@ -1,5 +1,12 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
+import os
+import re
+import math
 import datetime
+import threading
+
+from backend.metrics import record_cache
+from backend.integrations import sap_connector
 
 # Mock SAP ERP Data for 3 separate tenants to demonstrate isolation
 SAP_DATABASE: Dict[str, Dict[str, Any]] = {
@@ -55,32 +62,242 @@ SAP_DATABASE: Dict[str, Dict[str, Any]] = {
     }
 }
 
-def get_tenant_data(tenant_id: str) -> Dict[str, Any]:
-    """Return raw mock data for a specified tenant, defaulting to buildco if unknown."""
-    return SAP_DATABASE.get(tenant_id, SAP_DATABASE["buildco"])
+# ── TENANT DATA (via the local cache) ─────────────────────────────────────────
+# Everything below reads from sap_connector's per-tenant cache. With no
+# SAP_ERP_URL configured the cache is seeded from SAP_DATABASE above on first
+# use, so the demo works offline, and unknown tenants see buildco. With one,
+# the sync thread fills it and unknown tenants see nothing: another
+# customer's ERP data is never a fallback.
+
+def _tenant_cache(tenant_id: str) -> Optional[sap_connector.TenantCache]:
+    cache = sap_connector.get_cache(tenant_id)
+    if cache is None and not sap_connector.SAP_ERP_URL:
+        if tenant_id in SAP_DATABASE:
+            cache = sap_connector.load_tenant(tenant_id, SAP_DATABASE[tenant_id])
+        elif tenant_id != "buildco":
+            return _tenant_cache("buildco")
+    return cache
+
+
+def _empty(tenant_id: str) -> Dict[str, Any]:
+    return {"version": 0, "digest": "empty", "tenant_name": tenant_id, "kpis": {}, "materials": [], "pos": []}
+
+
+def get_tenant_data(tenant_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Cached ERP data for a tenant. A tenant named in SAP_TENANTS is empty until
+    its first sync; with SAP_ERP_URL set, any other unknown tenant is None.
+    """
+    cache = _tenant_cache(tenant_id)
+    if cache is not None:
+        return cache.snapshot()
+    if sap_connector.SAP_ERP_URL and tenant_id not in sap_connector.SAP_TENANTS:
+        return None
+    return _empty(tenant_id)
+
+
+def data_version(tenant_id: str) -> int:
+    cache = _tenant_cache(tenant_id)
+    return cache.version if cache else 0
+
+
+def set_tenant_data(tenant_id: str, data: Dict[str, Any]) -> int:
+    """Replace a tenant's ERP snapshot and bump its data version. Returns the new version."""
+    return sap_connector.load_tenant(tenant_id, data).version
+
+
+# ── CONTEXT INDEX ─────────────────────────────────────────────────────────────
+# build_sap_context used to paste every material and PO into the system
+# prompt. With a real tenant (tens of thousands of SKUs) that blows the
+# context window, so each record is rendered once per data version into an
+# index of lines, and a request only gets the lines relevant to its message,
+# up to SAP_CONTEXT_TOKEN_BUDGET tokens.
+SAP_CONTEXT_TOKEN_BUDGET = int(os.environ.get("SAP_CONTEXT_TOKEN_BUDGET", "800"))
+
+# Statuses that deserve a mention even when the question names nothing
+# specific. Those up to _URGENT also top up answers to specific questions.
+_ATTENTION = {"critical": 0, "delayed": 0, "low": 1, "in transit": 2, "processing": 3}
+_URGENT = 1
+_STOPWORDS = {
+    "a", "an", "and", "are", "any", "do", "for", "from", "have", "how", "i", "in", "is",
+    "it", "many", "me", "much", "my", "of", "on", "or", "our", "the", "to", "we", "what",
+    "when", "which", "with", "where", "will", "show", "list", "tell", "about",
+}
+_WORD = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+_FOOTER = (
+    "---------------------------------------\n"
+    "When answering the user, refer to these exact IDs and quantities if relevant to their question.\n"
+)
+
+
+def _tokens(text: str) -> int:
+    """Rough LLM token count (~4 characters per token for English/IDs)."""
+    return len(text) // 4 + 1
+
+
+def _terms(text: str) -> List[str]:
+    """Lower-cased words; hyphenated IDs also yield their parts (MAT-8993 → mat-8993, mat, 8993)."""
+    out = []
+    for word in _WORD.findall(text.lower()):
+        if word in _STOPWORDS:
+            continue
+        out.append(word)
+        if "-" in word:
+            out.extend(p for p in word.split("-") if p not in _STOPWORDS)
+    return out
+
+
+class _Record:
+    __slots__ = ("section", "order", "line", "tokens", "priority")
+
+    def __init__(self, section: str, order: int, line: str, status: str):
+        self.section  = section
+        self.order    = order
+        self.line     = line
+        self.tokens   = _tokens(line)
+        self.priority = _ATTENTION.get(status.lower(), len(_ATTENTION))
+
+
+class SapContextIndex:
+    """Rendered lines + an inverted index over ids, names, vendors and statuses for one tenant version."""
+
+    def __init__(self, data: Dict[str, Any], version: int, synced_at: datetime.datetime):
+        self.version = version
+        self.header = (
+            f"--- LIVE SAP ERP DATA (Synced: {synced_at.strftime('%Y-%m-%d %H:%M:%S')}) ---\n"
+            f"Tenant: {data['tenant_name']}\n"
+            f"Total Inventory Value: {data['kpis'].get('total_inventory_value', 'n/a')}\n"
+            f"Open Purchase Orders: {data['kpis'].get('open_pos', 'n/a')}\n"
+        )
+        self.records: List[_Record] = []
+        self.postings: Dict[str, List[Tuple[int, float]]] = {}
+        self.totals = {"materials": len(data["materials"]), "pos": len(data["pos"])}
+
+        for i, m in enumerate(data["materials"]):
+            line = f"- {m['id']}: {m['name']} | {m['stock']} {m['unit']} ({m['status']})\n"
+            self._add(_Record("materials", i, line, m["status"]),
+                      ids=[m["id"]], text=[m["name"], m["unit"]], status=m["status"])
+        for i, p in enumerate(data["pos"]):
+            line = f"- {p['id']} to {p['vendor']} | {p['amount']} | Expected: {p['delivery']} ({p['status']})\n"
+            self._add(_Record("pos", i, line, p["status"]),
+                      ids=[p["id"]], text=[p["vendor"]], status=p["status"])
+
+        # IDF: a word shared by half the catalogue ("steel") counts for little.
+        n = max(1, len(self.records))
+        for term, hits in self.postings.items():
+            idf = math.log(1 + n / len(hits))
+            self.postings[term] = [(idx, weight * idf) for idx, weight in hits]
+
+        self.attention = sorted(range(len(self.records)),
+                                key=lambda i: (self.records[i].priority, self.records[i].order))
+        self.urgent = [i for i in self.attention if self.records[i].priority <= _URGENT]
+        self._default: Optional[str] = None
+
+    def _add(self, record: _Record, ids: List[str], text: List[str], status: str) -> None:
+        idx = len(self.records)
+        self.records.append(record)
+        weights: Dict[str, float] = {}
+        for value in ids:
+            full = value.lower()
+            weights[full] = 10.0
+            for part in _terms(value):
+                weights.setdefault(part, 3.0)
+        for value in text:
+            for term in _terms(value):
+                weights.setdefault(term, 1.0)
+        for term in _terms(status):
+            weights.setdefault(term, 1.5)
+        for term, weight in weights.items():
+            self.postings.setdefault(term, []).append((idx, weight))
+
+    def select(self, query: str) -> List[int]:
+        """Record indexes matching the query, best first; empty if nothing matches."""
+        scores: Dict[int, float] = {}
+        too_common = max(50, len(self.records) // 2)
+        for term in set(_terms(query or "")):
+            hits = self.postings.get(term, ())
+            if len(hits) > too_common:
+                continue   # an ID prefix like "sku" says nothing about which record
+            for idx, weight in hits:
+                scores[idx] = scores.get(idx, 0.0) + weight
+        return sorted(scores, key=lambda i: (-scores[i], self.records[i].priority, self.records[i].order))
+
+    def render(self, chosen: List[int], budget: int) -> str:
+        remaining = budget - _tokens(self.header) - _tokens(_FOOTER)
+        picked = {"materials": [], "pos": []}
+        for idx in chosen:
+            if remaining < 8:
+                break
+            record = self.records[idx]
+            if record.tokens > remaining:
+                continue
+            picked[record.section].append(record)
+            remaining -= record.tokens
+
+        ctx = self.header + "\n"
+        for section, title in (("materials", "MATERIALS INVENTORY"), ("pos", "OPEN PURCHASE ORDERS")):
+            records = picked[section]
+            if not records and self.totals[section]:
+                ctx += f"{title}: none relevant to this question ({self.totals[section]} on file).\n\n"
+                continue
+            shown = f" (showing {len(records)} of {self.totals[section]})" if len(records) < self.totals[section] else ""
+            ctx += f"{title}{shown}:\n" + "".join(r.line for r in records) + "\n"
+        return ctx.rstrip("\n") + "\n" + _FOOTER
+
+    def context(self, query: str, budget: int) -> str:
+        chosen = self.select(query)
+        if chosen:
+            # Leave room for anything urgent the question didn't name.
+            seen = set(chosen)
+            chosen += [i for i in self.urgent if i not in seen]
+            return self.render(chosen, budget)
+        if budget == SAP_CONTEXT_TOKEN_BUDGET:
+            if self._default is None:
+                self._default = self.render(self.attention, budget)
+            return self._default
+        return self.render(self.attention, budget)
+
+
+_indexes: Dict[str, SapContextIndex] = {}
+_index_lock = threading.Lock()
+
+
+def get_context_index(tenant_id: str) -> SapContextIndex:
+    """The tenant's index for its current data version, built on first use after a change."""
+    cache = _tenant_cache(tenant_id)
+    if cache is None and get_tenant_data(tenant_id) is None:
+        # Unknown tenant: an empty index, not kept, so arbitrary ids can't pile up.
+        return SapContextIndex(_empty(tenant_id), 0, datetime.datetime.now())
+    key = cache.tenant_id if cache else tenant_id
+    index = _indexes.get(key)
+    if index is not None and index.version == (cache.version if cache else 0):
+        record_cache("sap_context", True)
+        return index
+    record_cache("sap_context", False)
+    return _build_index(key, cache)
+
+
+def _build_index(key: str, cache: Optional[sap_connector.TenantCache]) -> SapContextIndex:
+    with _index_lock:
+        data = cache.snapshot() if cache else _empty(key)
+        index = _indexes.get(key)
+        if index is None or index.version != data["version"]:
+            synced_at = (cache.synced_at if cache else None) or datetime.datetime.now()
+            index = SapContextIndex(data, data["version"], synced_at)
+            _indexes[key] = index
+    return index
+
+
+# Rebuild in the sync thread as soon as new data lands, not on the next chat.
+sap_connector.on_change(lambda cache: _build_index(cache.tenant_id, cache))
+
 
-def build_sap_context(tenant_id: str) -> str:
+def build_sap_context(tenant_id: str, query: str = "", token_budget: Optional[int] = None) -> str:
     """
-    Format the raw ERP data into a text string that can be injected
-    directly into the LLM system prompt for context grounding.
+    Format the tenant's ERP data for the LLM system prompt: the KPI header
+    plus the materials and POs relevant to `query` (by ID, name, vendor or
+    status), topped up with urgent records, within `token_budget` tokens.
     """
-    data = get_tenant_data(tenant_id)
-    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    ctx = f"--- LIVE SAP ERP DATA (Synced: {now}) ---\n"
-    ctx += f"Tenant: {data['tenant_name']}\n"
-    ctx += f"Total Inventory Value: {data['kpis']['total_inventory_value']}\n"
-    ctx += f"Open Purchase Orders: {data['kpis']['open_pos']}\n\n"
-    
-    ctx += "MATERIALS INVENTORY:\n"
-    for m in data["materials"]:
-        ctx += f"- {m['id']}: {m['name']} | {m['stock']} {m['unit']} ({m['status']})\n"
-        
-    ctx += "\nOPEN PURCHASE ORDERS:\n"
-    for p in data["pos"]:
-        ctx += f"- {p['id']} to {p['vendor']} | {p['amount']} | Expected: {p['delivery']} ({p['status']})\n"
-        
-    ctx += "---------------------------------------\n"
-    ctx += "When answering the user, refer to these exact IDs and quantities if relevant to their question.\n"
-    
-    return ctx
+    budget = token_budget or SAP_CONTEXT_TOKEN_BUDGET
+    return get_context_index(tenant_id).context(query, budget)
@@ -1,22 +1,154 @@
-from fastapi import APIRouter, Query
+"""
+sap_routes.py — Read-only /integrations/* views over the local SAP cache.
+List routes filter on the server (status, vendor, id prefix) and can project
+fields. Paging is opt-in: with `limit` they return pages of that size and a
+cursor (the last id seen, in id order); without it, every matching record. Every
+response has an ETag built from the tenant's data version (its content
+digest, so every worker agrees) and the query.
+A poll that sends it back in If-None-Match gets a bare 304 while the data
+is unchanged, and nothing is filtered or serialized.
+"""
+
+import bisect
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
+
 from backend.integrations.sap_mock import get_tenant_data
 
 sap_router = APIRouter(tags=["integrations_sap"])
 
-@sap_router.get("/materials")
-async def get_materials(tenant_id: str = Query("buildco")):
+MAX_PAGE = 1000
+
+_FIELDS = {
+    "materials": ("id", "name", "stock", "unit", "status"),
+    "pos":       ("id", "vendor", "amount", "delivery", "status"),
+}
+
+# (tenant, kind) → (version, records sorted by id, their ids). Re-sorted only
+# when the data version moves.
+_sorted: Dict[Tuple[str, str], tuple] = {}
+_sorted_lock = threading.Lock()
+
+
+def _etag(tenant_id: str, data: dict, *parts) -> str:
+    query = hashlib.sha1(repr(parts).encode()).hexdigest()[:12]
+    return f'W/"{tenant_id}.{data["digest"]}.{query}"'
+
+
+def _not_modified(etag: str, if_none_match: Optional[str]) -> bool:
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]
+
+
+def _by_id(tenant_id: str, kind: str, data: dict) -> Tuple[List[dict], List[str]]:
+    key = (tenant_id, kind)
+    entry = _sorted.get(key)
+    if entry is None or entry[0] != data["version"]:
+        records = sorted(data[kind], key=lambda r: r["id"])
+        entry = (data["version"], records, [r["id"] for r in records])
+        with _sorted_lock:
+            _sorted[key] = entry
+    return entry[1], entry[2]
+
+
+def _tenant_data(tenant_id: str) -> dict:
     data = get_tenant_data(tenant_id)
-    return {"materials": data["materials"]}
+    if data is None:
+        raise HTTPException(404, f"Unknown tenant '{tenant_id}'.")
+    return data
+
+
+def _page(
+    tenant_id: str, kind: str, data: dict, *, cursor: Optional[str], limit: Optional[int],
+    status: Optional[str], vendor: Optional[str], id_prefix: Optional[str],
+    fields: Optional[str],
+) -> dict:
+    records, ids = _by_id(tenant_id, kind, data)
+
+    wanted = None
+    if fields:
+        wanted = ["id"] + [f.strip() for f in fields.split(",") if f.strip() and f.strip() != "id"]
+        unknown = [f for f in wanted if f not in _FIELDS[kind]]
+        if unknown:
+            raise HTTPException(400, f"Unknown field(s) {unknown}; choose from {list(_FIELDS[kind])}.")
+    statuses = {s.strip().lower() for s in status.split(",")} if status else None
+    vendor = vendor.lower() if vendor else None
+
+    start = 0
+    if id_prefix:
+        start = bisect.bisect_left(ids, id_prefix)
+    if cursor:
+        start = max(start, bisect.bisect_right(ids, cursor))
+
+    items, next_cursor = [], None
+    for i in range(start, len(records)):
+        r = records[i]
+        if id_prefix and not r["id"].startswith(id_prefix):
+            break   # sorted by id: past the prefix range
+        if statuses and r.get("status", "").lower() not in statuses:
+            continue
+        if vendor and vendor not in r.get("vendor", "").lower():
+            continue
+        if limit is not None and len(items) == limit:
+            next_cursor = items[-1]["id"]
+            break
+        items.append({f: r.get(f) for f in wanted} if wanted else r)
+    return {kind: items, "next_cursor": next_cursor}
+
+
+def _list_route(
+    kind: str, tenant_id: str, if_none_match: Optional[str], **query
+) -> Response:
+    data = _tenant_data(tenant_id)
+    etag = _etag(tenant_id, data, kind, sorted(query.items()))
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _not_modified(etag, if_none_match):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(_page(tenant_id, kind, data, **query), headers=headers)
+
+
+@sap_router.get("/materials")
+async def get_materials(
+    tenant_id: str = Query("buildco"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE, description="page size; omit for every record"),
+    status: Optional[str] = Query(None, description="comma-separated, e.g. Critical,Low"),
+    id_prefix: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description="comma-separated subset of fields"),
+    if_none_match: Optional[str] = Header(None),
+):
+    return _list_route("materials", tenant_id, if_none_match, cursor=cursor, limit=limit,
+                       status=status, vendor=None, id_prefix=id_prefix, fields=fields)
+
 
 @sap_router.get("/pos")
-async def get_pos(tenant_id: str = Query("buildco")):
-    data = get_tenant_data(tenant_id)
-    return {"pos": data["pos"]}
+async def get_pos(
+    tenant_id: str = Query("buildco"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE, description="page size; omit for every record"),
+    status: Optional[str] = Query(None, description="comma-separated, e.g. Delayed,In Transit"),
+    vendor: Optional[str] = Query(None, description="case-insensitive substring"),
+    id_prefix: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description="comma-separated subset of fields"),
+    if_none_match: Optional[str] = Header(None),
+):
+    return _list_route("pos", tenant_id, if_none_match, cursor=cursor, limit=limit,
+                       status=status, vendor=vendor, id_prefix=id_prefix, fields=fields)
+
 
 @sap_router.get("/kpis")
-async def get_kpis(tenant_id: str = Query("buildco")):
-    data = get_tenant_data(tenant_id)
-    return {
+async def get_kpis(tenant_id: str = Query("buildco"), if_none_match: Optional[str] = Header(None)):
+    data = _tenant_data(tenant_id)
+    etag = _etag(tenant_id, data, "kpis")
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _not_modified(etag, if_none_match):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse({
         "tenant_name": data["tenant_name"],
         "kpis": data["kpis"]
-    }
+    }, headers=headers)
@@ -0,0 +1,204 @@
+"""
+jobs.py — Registry for long-running background work.
+Batch uploads (and anything else too slow for a request) hand back a job
+id straight away and do the work in the threadpool; clients poll
+GET /v1/jobs/{job_id}. Each job is a JSON file in JOBS_DIR, rewritten on
+every status change, so any worker can answer the poll — not just the one
+running the job. The most recent MAX_JOBS are retained.
+
+A job records the hash of the API key that created it (only that key may
+read it) and the pid of the worker running it. An active job whose worker
+has exited is reported as failed instead of running forever.
+"""
+
+import os
+import json
+import socket
+import hashlib
+import secrets
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from backend.locks import file_lock
+from backend.schemas import JobStatus
+
+JOBS_DIR = Path(os.environ.get("JOBS_DIR", "./data/jobs"))
+MAX_JOBS = 500
+
+_HOST = socket.gethostname()
+_ACTIVE = (JobStatus.PENDING, JobStatus.RUNNING)
+
+
+def _owner_hash(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+class Job:
+    __slots__ = ("id", "kind", "plug_id", "status", "created_at", "started_at",
+                 "finished_at", "result", "error", "owner", "readers", "host", "pid")
+
+    def __init__(self, kind: str, plug_id: str, owner: str = ""):
+        self.id          = f"job_{secrets.token_hex(8)}"
+        self.kind        = kind
+        self.plug_id     = plug_id
+        self.status      = JobStatus.PENDING
+        self.created_at  = datetime.utcnow()
+        self.started_at: Optional[datetime]  = None
+        self.finished_at: Optional[datetime] = None
+        self.result: dict = {}
+        self.error: Optional[str] = None
+        self.owner       = owner
+        self.readers: set = set()   # other keys handed this job by claim_job
+        self.host        = _HOST
+        self.pid         = os.getpid()
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id":      self.id,
+            "kind":        self.kind,
+            "plug_id":     self.plug_id,
+            "status":      self.status.value,
+            "created_at":  self.created_at.isoformat(),
+            "started_at":  self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "result":      self.result,
+            "error":       self.error,
+        }
+
+    def owned_by(self, api_key: Optional[str]) -> bool:
+        if not api_key:
+            return False
+        h = _owner_hash(api_key)
+        return secrets.compare_digest(self.owner, h) or h in self.readers
+
+    def save(self) -> None:
+        JOBS_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = JOBS_DIR / f".{self.id}.{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp.write_text(json.dumps({**self.to_dict(), "owner": self.owner, "host": self.host, "pid": self.pid}))
+        os.replace(tmp, JOBS_DIR / f"{self.id}.json")
+
+    @classmethod
+    def load(cls, data: dict) -> "Job":
+        job = cls.__new__(cls)
+        job.id          = data["job_id"]
+        job.kind        = data["kind"]
+        job.plug_id     = data["plug_id"]
+        job.status      = JobStatus(data["status"])
+        job.created_at  = _parse_time(data["created_at"])
+        job.started_at  = _parse_time(data["started_at"])
+        job.finished_at = _parse_time(data["finished_at"])
+        job.result      = data["result"]
+        job.error       = data["error"]
+        job.owner       = data.get("owner", "")
+        try:
+            job.readers = set((JOBS_DIR / f"{job.id}.readers").read_text().split())
+        except FileNotFoundError:
+            job.readers = set()
+        job.host        = data.get("host", "")
+        job.pid         = data.get("pid", 0)
+        if job.status in _ACTIVE and job.host == _HOST and not _alive(job.pid):
+            job.status, job.error = JobStatus.FAILED, "Worker exited before the job finished."
+        return job
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read(path: Path) -> Optional[Job]:
+    try:
+        return Job.load(json.loads(path.read_text()))
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, ValueError):
+        return None
+
+
+def _prune() -> None:
+    files = sorted(JOBS_DIR.glob("job_*.json"), key=lambda p: p.stat().st_mtime)
+    for path in files[:max(0, len(files) - MAX_JOBS)]:
+        path.unlink(missing_ok=True)
+        path.with_suffix(".readers").unlink(missing_ok=True)
+
+
+def _new_job(kind: str, plug_id: str, api_key: str, result: dict) -> Job:
+    # Caller holds the store lock.
+    job = Job(kind, plug_id, _owner_hash(api_key) if api_key else "")
+    job.result.update(result)
+    job.save()
+    _prune()
+    return job
+
+
+def create_job(kind: str, plug_id: str, api_key: str = "", **result: Any) -> Job:
+    with file_lock(JOBS_DIR / ".lock"):
+        return _new_job(kind, plug_id, api_key, result)
+
+
+def claim_job(
+    kind: str, plug_id: str, api_key: str = "", admit: Optional[Callable[[], None]] = None, **result: Any,
+) -> tuple[Job, bool]:
+    """
+    The plug's active job of this kind, or a new one: (job, created). The
+    check and the create happen under one cross-process lock, so concurrent
+    requests on different workers still get a single job, which every key
+    that asked for it may poll. `admit` runs just before a job is created
+    and may raise to refuse it (e.g. a rate limit).
+    Blocking — call it from the threadpool.
+    """
+    with file_lock(JOBS_DIR / ".lock"):
+        running = find_active(kind, plug_id)
+        if running is not None:
+            if api_key and not running.owned_by(api_key):
+                # Appended beside the job file, so run_job's rewrites can't drop it.
+                with open(JOBS_DIR / f"{running.id}.readers", "a") as f:
+                    f.write(_owner_hash(api_key) + "\n")
+            return running, False
+        if admit is not None:
+            admit()
+        return _new_job(kind, plug_id, api_key, result), True
+
+
+def get_job(job_id: str) -> Optional[Job]:
+    if not job_id.startswith("job_") or not job_id[4:].isalnum():
+        return None
+    return _read(JOBS_DIR / f"{job_id}.json")
+
+
+def find_active(kind: str, plug_id: str) -> Optional[Job]:
+    """A pending or running job of this kind for the plug, if there is one."""
+    for path in sorted(JOBS_DIR.glob("job_*.json"), key=lambda p: p.stat().st_mtime, reverse=True):
+        job = _read(path)
+        if job is not None and job.kind == kind and job.plug_id == plug_id and job.status in _ACTIVE:
+            return job
+    return None
+
+
+def run_job(job: Job, fn: Callable[..., Optional[dict]], *args, **kwargs) -> None:
+    """Run fn synchronously, recording status; fn's returned dict is merged into job.result."""
+    job.status     = JobStatus.RUNNING
+    job.started_at = datetime.utcnow()
+    job.pid        = os.getpid()
+    job.save()
+    try:
+        out = fn(*args, **kwargs)
+        if out:
+            job.result.update(out)
+        job.status = JobStatus.COMPLETE
+    except Exception as e:
+        job.error  = str(e)
+        job.status = JobStatus.FAILED
+        print(f"Job {job.id} ({job.kind}) failed: {e}")
+    finally:
+        job.finished_at = datetime.utcnow()
+        job.save()
@@ -0,0 +1,31 @@
+"""
+locks.py — Exclusive locks for on-disk state that every worker shares.
+Under gunicorn each worker is its own process, so a threading.Lock only
+serialises one of them. file_lock() also holds an fcntl.flock on a lock
+file, which every process on the host respects.
+"""
+
+import fcntl
+import threading
+import contextlib
+from pathlib import Path
+
+# One thread lock per lock file, so threads of a worker queue here rather
+# than each holding an open descriptor while blocked in flock().
+_thread_locks: dict[str, threading.Lock] = {}
+_guard = threading.Lock()
+
+
+@contextlib.contextmanager
+def file_lock(path: Path):
+    """Hold an exclusive lock on `path` (created if missing) across threads and processes. Not reentrant."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _guard:
+        local = _thread_locks.setdefault(str(path.resolve()), threading.Lock())
+    with local, open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,129 @@
+"""
+log_pipeline.py — Bounded queue + background batch writer.
+Request handlers enqueue events (a non-blocking put); one daemon thread
+drains the queue and hands batches to a flush function whenever
+`max_batch` events are waiting or `flush_interval_s` has passed.
+
+When the queue is full the event is dropped and counted, unless
+backpressure_ms > 0, in which case the producer waits up to that long
+first. Nothing here knows about SQL — see db.log_api_call for the user.
+"""
+
+import time
+import queue
+import threading
+from typing import Any, Callable, Optional
+
+from backend.metrics import Counter, Gauge, Histogram
+
+LOG_QUEUE_DEPTH = Gauge("sme_log_queue_depth", "Events waiting in a log pipeline.", ("pipeline",))
+LOG_DROPPED = Counter(
+    "sme_log_dropped_total", "Events dropped by a log pipeline.", ("pipeline", "reason"),
+)
+LOG_FLUSH_SECONDS = Histogram(
+    "sme_log_flush_seconds", "Time to write one batch.", ("pipeline",),
+)
+LOG_FLUSH_SIZE = Histogram(
+    "sme_log_flush_size", "Events per flushed batch.", ("pipeline",),
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+
+
+class BatchWriter:
+    def __init__(
+        self,
+        name: str,
+        flush: Callable[[list], bool],
+        max_batch: int = 200,
+        flush_interval_s: float = 1.0,
+        queue_max: int = 10_000,
+        backpressure_ms: float = 0,
+    ):
+        """flush(batch) writes the batch and returns False if it could not."""
+        self.name             = name
+        self._flush           = flush
+        self.max_batch        = max(1, max_batch)
+        self.flush_interval_s = flush_interval_s
+        self.backpressure_s   = backpressure_ms / 1000.0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_max)
+        self._stop   = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock   = threading.Lock()
+
+    # ── producer side ────────────────────────────────────────────────────────
+
+    def submit(self, event: Any) -> bool:
+        self._ensure_worker()
+        try:
+            if self.backpressure_s > 0:
+                self._queue.put(event, timeout=self.backpressure_s)
+            else:
+                self._queue.put_nowait(event)
+        except queue.Full:
+            LOG_DROPPED.inc(pipeline=self.name, reason="queue_full")
+            return False
+        return True
+
+    def _ensure_worker(self) -> None:
+        # Started on first submit, so pre-fork imports never own the thread.
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stop.clear()
+                    self._thread = threading.Thread(target=self._run, name=f"{self.name}-writer", daemon=True)
+                    self._thread.start()
+
+    # ── consumer side ────────────────────────────────────────────────────────
+
+    def _drain(self, first_timeout: float) -> list:
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=first_timeout))
+        except queue.Empty:
+            return batch
+        deadline = time.monotonic() + self.flush_interval_s
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: list) -> None:
+        LOG_QUEUE_DEPTH.set(self._queue.qsize(), pipeline=self.name)
+        started = time.perf_counter()
+        try:
+            ok = self._flush(batch)
+        except Exception as e:
+            print(f"{self.name}: flush failed: {e}")
+            ok = False
+        LOG_FLUSH_SECONDS.observe(time.perf_counter() - started, pipeline=self.name)
+        LOG_FLUSH_SIZE.observe(len(batch), pipeline=self.name)
+        if not ok:
+            LOG_DROPPED.inc(len(batch), pipeline=self.name, reason="write_failed")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._drain(first_timeout=self.flush_interval_s)
+            if batch:
+                self._write(batch)
+        # Shutdown: write out whatever is still queued.
+        while True:
+            batch = self._drain(first_timeout=0.0001)
+            if not batch:
+                break
+            self._write(batch)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop the writer after flushing everything already queued."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
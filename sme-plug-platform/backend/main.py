@@ -4,17 +4,27 @@ main.py — SME-Plug Backend Brain (Groq-powered)
 Run: uvicorn backend.main:app --reload --port 8000
 """
 
-import os, hashlib, secrets, re, shutil
+import os, hashlib, secrets, re, shutil, json, asyncio, contextvars, functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Optional, List
 from collections import defaultdict
 from pathlib import Path
-from fastapi import FastAPI, HTTPException, Header, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Header, UploadFile, File, Form, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
+from starlette.requests import ClientDisconnect
 from pydantic import BaseModel
 from groq import Groq
 from dotenv import load_dotenv
 from backend.rag.retriever import retrieve, format_context
+from backend.rag.ingestor import kb_version
+from backend.metrics import (
+    begin_trace, end_trace, set_request_plug, stage, render_metrics, server_timing,
+)
+from backend.profiling import SamplingProfiler
 
 load_dotenv()
 
@@ -24,7 +34,58 @@ groq_client = Groq(api_key=os.environ.get("GROQ_API_KEY", ""))
 
 # ── LOGGING IMPORTS ────────────────────────────────────────────────────────────
 import time
-from backend.db import log_api_call, log_document, get_api_usage, get_plugin_config
+from backend.db import (
+    log_api_call, log_document, get_api_usage, get_plugin_config, close_pool, flush_logs,
+    invalidate_api_key, start_change_watcher, stop_change_watcher,
+)
+
+# ── RATE LIMITING ──────────────────────────────────────────────────────────────
+from backend.ratelimit import (
+    RateLimited, Overloaded, check_rate_limit, check_reindex_limit, rate_limit_info, llm_gate,
+    start_sync, stop_sync,
+)
+
+from backend.integrations.sap_connector import start_sap_sync, stop_sap_sync
+
+MONTHLY_CALL_LIMIT = int(os.environ.get("MONTHLY_CALL_LIMIT", "10000"))
+
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request, exc: RateLimited):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "code": "RATE_LIMITED"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request, exc: Overloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "code": "OVERLOADED"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.on_event("startup")
+async def _start_background_sync():
+    start_sync()
+    start_change_watcher()
+    start_sap_sync()
+
+@app.on_event("startup")
+async def _warm_embedder():
+    # gunicorn_conf.py warms workers itself; this covers `uvicorn --workers N`.
+    if os.environ.get("WARM_EMBEDDER") == "1":
+        from backend.preload import warm_worker
+        await run_in_threadpool(warm_worker)
+
+@app.on_event("shutdown")
+async def _shutdown():
+    stop_sync()
+    stop_change_watcher()
+    stop_sap_sync()
+    _eval_executor.shutdown(wait=False, cancel_futures=True)
+    flush_logs()
+    close_pool()
 
 # ── CORS ──────────────────────────────────────────────────────────────────────
 app.add_middleware(
@@ -41,6 +102,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ── METRICS ───────────────────────────────────────────────────────────────────
+# Paths whose requests get a stage trace (labels stay low-cardinality).
+TRACED_PATHS = {"/chat", "/v1/chat", "/v1/compare", "/v1/upload", "/v1/upload/batch"}
+
+@app.middleware("http")
+async def trace_requests(request, call_next):
+    if request.url.path not in TRACED_PATHS:
+        return await call_next(request)
+    trace = begin_trace(request.url.path)
+
+    profiler = None
+    if request.headers.get("x-debug-profile") and is_admin_key(request.headers.get("x-admin-key")):
+        profiler = SamplingProfiler().start()
+
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["Server-Timing"] = server_timing(trace)
+        if profiler is not None:
+            response = await _attach_profile(response, profiler.stop())
+            profiler = None
+        return response
+    finally:
+        if profiler is not None:
+            profiler.stop()
+        end_trace(trace, status)
+
+async def _attach_profile(response, profile: dict):
+    """Re-emit a JSON response with the profile summary under `debug_profile`."""
+    if "application/json" not in response.headers.get("content-type", ""):
+        return response
+    import json
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    payload = json.loads(body)
+    if isinstance(payload, dict):
+        payload["debug_profile"] = profile
+    headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    return JSONResponse(payload, status_code=response.status_code, headers=headers)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 from backend.integrations.sap_routes import sap_router
 app.include_router(sap_router, prefix="/integrations")
 
@@ -131,12 +236,55 @@ class KeyResponse(BaseModel):
 
 # ── HELPERS ───────────────────────────────────────────────────────────────────
 
+ADMIN_API_KEY = os.environ.get("ADMIN_API_KEY", "")
+
 def hash_key(key: str) -> str:
     return hashlib.sha256(key.encode()).hexdigest()
 
+def is_admin_key(key: Optional[str]) -> bool:
+    return bool(ADMIN_API_KEY) and bool(key) and secrets.compare_digest(key, ADMIN_API_KEY)
+
 def extract_citations(text: str) -> list:
     return re.findall(r'\[Source:[^\]]+\]', text)
 
+async def call_llm(**kwargs):
+    """Run a Groq completion off the event loop, under the global in-flight cap."""
+    async with llm_gate.slot():
+        with stage("llm"):
+            return await run_in_threadpool(groq_client.chat.completions.create, **kwargs)
+
+def apply_plugin_config(system: str, custom_config: Optional[dict]) -> str:
+    """Layer a tenant's PluginConfig (persona, decision tree, guardrails) onto the prompt."""
+    if not custom_config:
+        return system
+    import json
+    persona = custom_config.get("persona")
+    if persona:
+        system = persona
+
+    dt_str = custom_config.get("decisionTree")
+    if dt_str:
+        try:
+            decisionTree = json.loads(dt_str)
+            if isinstance(decisionTree, list) and len(decisionTree) > 0:
+                system += "\n\nDECISION TREE STEPS:\n"
+                for i, step in enumerate(decisionTree):
+                    system += f"{i+1}. {step}\n"
+        except Exception:
+            pass
+
+    gr_str = custom_config.get("guardrails")
+    if gr_str:
+        try:
+            guardrails = json.loads(gr_str)
+            if isinstance(guardrails, dict):
+                topics = guardrails.get("forbiddenTopics", [])
+                if topics:
+                    system += "\n\nCRITICAL GUARDRAILS:\nYou MUST NOT discuss the following topics under any circumstances:\n- " + "\n- ".join(topics)
+        except Exception:
+            pass
+    return system
+
 def check_guardrails(text: str) -> bool:
     injection_phrases = [
         "ignore previous", "ignore your instructions",
@@ -166,12 +314,16 @@ async def chat(
     dev_key = os.environ.get("DEV_TEST_KEY", "dev-test-key-123")
     if x_api_key != dev_key and not x_api_key:
         raise HTTPException(401, "API key required. Pass x-api-key header.")
+    check_rate_limit(x_api_key or dev_key)
+    set_request_plug(request.plug_id)
 
     # Track start time for latency
     start_time = time.time()
 
     # 2. Input guardrail
-    if check_guardrails(request.message):
+    with stage("guardrail"):
+        blocked = check_guardrails(request.message)
+    if blocked:
         return ChatResponse(
             response="Request blocked by SME-Plug guardrail. Manipulation attempt detected.",
             mode=request.mode,
@@ -185,57 +337,34 @@ async def chat(
 
     # 3. Build system prompt based on mode
     if request.mode == "sme":
-        system = SME_PERSONAS.get(request.plug_id, SME_PERSONAS["legal"])
-        
         # Check custom config
-        custom_config = get_plugin_config(x_api_key or dev_key, request.plug_id)
-        if custom_config:
-            import json
-            persona = custom_config.get("persona")
-            if persona:
-                system = persona
-                
-            dt_str = custom_config.get("decisionTree")
-            if dt_str:
-                try:
-                    decisionTree = json.loads(dt_str)
-                    if isinstance(decisionTree, list) and len(decisionTree) > 0:
-                        system += "\n\nDECISION TREE STEPS:\n"
-                        for i, step in enumerate(decisionTree):
-                            system += f"{i+1}. {step}\n"
-                except Exception:
-                    pass
-                    
-            gr_str = custom_config.get("guardrails")
-            if gr_str:
-                try:
-                    guardrails = json.loads(gr_str)
-                    if isinstance(guardrails, dict):
-                        topics = guardrails.get("forbiddenTopics", [])
-                        if topics:
-                            system += "\n\nCRITICAL GUARDRAILS:\nYou MUST NOT discuss the following topics under any circumstances:\n- " + "\n- ".join(topics)
-                except Exception:
-                    pass
+        with stage("config"):
+            custom_config = get_plugin_config(x_api_key or dev_key, request.plug_id)
 
         # ── RAG: retrieve real document chunks ────────────────────────
-        chunks = retrieve(request.message, request.plug_id, top_k=5)
-        context = format_context(chunks)
-        if context:
-            system += "\n\n" + context
+        chunks = await run_in_threadpool(retrieve, request.message, request.plug_id, top_k=5)
         # ──────────────────────────────────────────────────────────────
+
+        with stage("prompt_build"):
+            system = SME_PERSONAS.get(request.plug_id, SME_PERSONAS["legal"])
+            system = apply_plugin_config(system, custom_config)
+            context = format_context(chunks)
+            if context:
+                system += "\n\n" + context
     else:
         # Baseline — plain LLM with no guidance. Will hallucinate.
         system = "You are a helpful assistant. Answer the user's question."
 
     if request.use_sap:
         from backend.integrations.sap_mock import build_sap_context
-        sap_ctx = build_sap_context(request.sap_tenant_id)
-        system += f"\n\n{sap_ctx}"
+        with stage("prompt_build"):
+            sap_ctx = build_sap_context(request.sap_tenant_id, request.message)
+            system += f"\n\n{sap_ctx}"
 
     # 4. Call Groq (using llama or mixtral)
     model = os.environ.get("GROQ_MODEL", "llama-3.3-70b-versatile")
     try:
-        llm_response = groq_client.chat.completions.create(
+        llm_response = await call_llm(
             model=model,
             max_tokens=1024,
             messages=[
@@ -244,11 +373,14 @@ async def chat(
             ],
         )
         reply = llm_response.choices[0].message.content or ""
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(500, f"LLM error: {str(e)}")
 
     # 5. Output guardrail — citations required in SME mode
-    citations = extract_citations(reply)
+    with stage("citation_check"):
+        citations = extract_citations(reply)
     has_citations = len(citations) > 0
 
     if request.mode == "sme" and not has_citations:
@@ -259,15 +391,16 @@ async def chat(
         )
 
     
-    # Log api call (sync, fire-and-forget for now)
+    # Log api call (queued; written in batches off the request path)
     latency_ms = int((time.time() - start_time) * 1000)
-    log_api_call(
-        api_key=x_api_key or dev_key,
-        plug_id=request.plug_id,
-        endpoint="/chat",
-        status=200,
-        latency_ms=latency_ms
-    )
+    with stage("logging"):
+        log_api_call(
+            api_key=x_api_key or dev_key,
+            plug_id=request.plug_id,
+            endpoint="/chat",
+            status=200,
+            latency_ms=latency_ms
+        )
 
     return ChatResponse(
         response=reply,
@@ -297,6 +430,17 @@ async def create_key(request: CreateKeyRequest):
     )
 
 
+@app.post("/internal/keys/{key_id}/invalidate", include_in_schema=False)
+async def invalidate_key(
+    key_id: str,
+    x_admin_key: str = Header(None, alias="x-admin-key"),
+):
+    """Called by the dashboard after revoking a key so this worker stops honouring it."""
+    if not is_admin_key(x_admin_key):
+        raise HTTPException(403, "Admin key required.")
+    return {"invalidated": invalidate_api_key(api_key_id=key_id)}
+
+
 @app.get("/plugs")
 async def list_plugs():
     return {"plugs": [
@@ -315,6 +459,7 @@ class CompareRequest(BaseModel):
 @app.post("/v1/compare")
 async def compare_hallucination(
     request: CompareRequest,
+    http_request: Request,
     authorization: str = Header(None),
     x_api_key: str = Header(None, alias="x-api-key"),
 ):
@@ -327,13 +472,19 @@ async def compare_hallucination(
     plug_id = request.plug_id.replace("-v1", "")
     query   = request.message
 
+    api_key = authorization[7:] if authorization and authorization.startswith("Bearer ") else (x_api_key or "")
+    # Anonymous callers share a bucket per client IP rather than going unlimited.
+    client = http_request.client.host if http_request.client else "unknown"
+    check_rate_limit(api_key or f"ip:{client}", cost=2)   # two LLM calls
+    set_request_plug(plug_id)
+
     # ── LEFT SIDE: Raw LLM (hallucination-prone) ──────────────────────────
     raw_system = (
         "You are a helpful AI assistant. Answer the user's question. "
         "If you reference any sources, include them as citations in [Source: ...] format."
     )
     try:
-        raw_resp = groq_client.chat.completions.create(
+        raw_resp = await call_llm(
             model="llama-3.3-70b-versatile",
             messages=[
                 {"role": "system", "content": raw_system},
@@ -343,20 +494,23 @@ async def compare_hallucination(
             max_tokens=1024,
         )
         raw_text = raw_resp.choices[0].message.content or ""
+    except Overloaded:
+        raise
     except Exception as e:
         raw_text = f"[Error from raw LLM: {e}]"
 
-    raw_citations = extract_citations(raw_text)
+    with stage("citation_check"):
+        raw_citations = extract_citations(raw_text)
 
     # ── RIGHT SIDE: SME-Plug (RAG + persona + guardrails) ─────────────────
-    chunks = retrieve(query, plug_id, top_k=3)
-    context_block = format_context(chunks)
-
-    persona = SME_PERSONAS.get(plug_id, SME_PERSONAS["legal"])
-    sme_system = f"{persona}\n\n{context_block}" if context_block else persona
+    chunks = await run_in_threadpool(retrieve, query, plug_id, top_k=3)
+    with stage("prompt_build"):
+        context_block = format_context(chunks)
+        persona = SME_PERSONAS.get(plug_id, SME_PERSONAS["legal"])
+        sme_system = f"{persona}\n\n{context_block}" if context_block else persona
 
     try:
-        sme_resp = groq_client.chat.completions.create(
+        sme_resp = await call_llm(
             model="llama-3.3-70b-versatile",
             messages=[
                 {"role": "system", "content": sme_system},
@@ -366,10 +520,13 @@ async def compare_hallucination(
             max_tokens=1024,
         )
         sme_text = sme_resp.choices[0].message.content or ""
+    except Overloaded:
+        raise
     except Exception as e:
         sme_text = f"[Error from SME-Plug: {e}]"
 
-    sme_citations = extract_citations(sme_text)
+    with stage("citation_check"):
+        sme_citations = extract_citations(sme_text)
     has_real_citations = len(sme_citations) > 0
 
     # ── Analyze differences ───────────────────────────────────────────────
@@ -427,7 +584,8 @@ async def get_usage(
         "total_calls_this_month": total_calls,
         "user_calls_this_month":  user_calls,
         "per_plugin": dict(per_plug),
-        "limit":      10_000,
+        "limit":      MONTHLY_CALL_LIMIT,
+        "rate_limit": rate_limit_info(),
         "month":      now.strftime("%B %Y"),
         "days_left":  (now.replace(month=now.month % 12 + 1, day=1) - now).days if now.month < 12 else (now.replace(year=now.year + 1, month=1, day=1) - now).days,
     }
@@ -440,11 +598,93 @@ class V1ChatRequest(BaseModel):
     message:    str
     plugin_id:  str = "legal-v1"
     session_id: Optional[str] = None
+    stream:     bool = False
+
+UNVERIFIED_REPLY = (
+    "I cannot verify this claim without a source document. "
+    "Please upload relevant documents to your SME-Plug knowledge base "
+    "and re-ask your question."
+)
+
+def _v1_result(reply: str, request: V1ChatRequest, plug_id: str) -> dict:
+    """Citation check + the /v1/chat response body (also the SSE `done` event)."""
+    with stage("citation_check"):
+        citations = extract_citations(reply)
+    has_citations = len(citations) > 0
+    if not has_citations:
+        reply = UNVERIFIED_REPLY
+    return {
+        "response": reply,
+        "citations": [{"source": c, "page": 0, "relevance": 0.95} for c in citations],
+        "verified": has_citations,
+        "ragas_score": 0.92 if has_citations else 0,
+        "session_id": request.session_id or "",
+        "guardrail_fired": False,
+        "has_citations": has_citations,
+        "plug_id": plug_id,
+        "plug_color": PLUG_COLORS.get(plug_id, "#888"),
+        "kb_version": kb_version(plug_id),
+    }
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _v1_chat_stream(request: V1ChatRequest, api_key: str, plug_id: str,
+                          messages: list, start_time: float):
+    """
+    Answer as Server-Sent Events: `delta` events carry text as Groq produces
+    it, then one `done` event carries the full response body. `done` is
+    authoritative — when the answer has no citations its `response` is the
+    unverified notice, and clients should replace the streamed text with it.
+    """
+    model = os.environ.get("GROQ_MODEL", "llama-3.3-70b-versatile")
+    stack = AsyncExitStack()
+    # Take the LLM slot and open the upstream stream before answering, so
+    # Overloaded / upstream failures still surface as 503 / 500.
+    await stack.enter_async_context(llm_gate.slot())
+    try:
+        upstream = await run_in_threadpool(
+            groq_client.chat.completions.create,
+            model=model, max_tokens=1024, messages=messages, stream=True,
+        )
+    except Exception as e:
+        await stack.aclose()
+        raise HTTPException(500, f"LLM error: {str(e)}")
+
+    async def events():
+        parts = []
+        status = 200
+        try:
+            async for chunk in iterate_in_threadpool(upstream):
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield _sse("delta", {"text": delta})
+            yield _sse("done", _v1_result("".join(parts), request, plug_id))
+        except Exception as e:
+            status = 500
+            yield _sse("error", {"detail": f"LLM error: {str(e)}", "code": "API_ERROR"})
+        finally:
+            await stack.aclose()
+            log_api_call(
+                api_key=api_key,
+                plug_id=plug_id,
+                endpoint="/v1/chat",
+                status=status,
+                latency_ms=int((time.time() - start_time) * 1000),
+            )
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.post("/v1/chat")
 async def v1_chat(
     request: V1ChatRequest,
     authorization: str = Header(None),
+    accept: str = Header(None),
 ):
     # Extract key from "Bearer xxx" header
     api_key = ""
@@ -454,115 +694,237 @@ async def v1_chat(
     # Accept any key for now (dev mode)
     if not api_key:
         raise HTTPException(401, "API key required. Set your key in VS Code settings.")
+    check_rate_limit(api_key)
 
     # Track start time
     start_time = time.time()
+    streaming = request.stream or "text/event-stream" in (accept or "")
 
     # Map "legal-v1" → "legal", "healthcare-v1" → "healthcare", etc.
     plug_id = request.plugin_id.replace("-v1", "")
+    set_request_plug(plug_id)
 
     # Input guardrail
-    if check_guardrails(request.message):
-        return {
+    with stage("guardrail"):
+        blocked = check_guardrails(request.message)
+    if blocked:
+        result = {
             "response": "Request blocked by SME-Plug guardrail. Manipulation attempt detected.",
             "citations": [],
             "verified": False,
             "ragas_score": 0,
             "session_id": request.session_id or "",
             "guardrail_fired": True,
+            "kb_version": kb_version(plug_id),
         }
-
-    # Build system prompt (always SME mode from VS Code)
-    system = SME_PERSONAS.get(plug_id, SME_PERSONAS["legal"])
+        if streaming:
+            return StreamingResponse(iter([_sse("done", result)]), media_type="text/event-stream")
+        return result
 
     # Check custom config
-    custom_config = get_plugin_config(api_key, plug_id)
-    if custom_config:
-        import json
-        persona = custom_config.get("persona")
-        if persona:
-            system = persona
-            
-        dt_str = custom_config.get("decisionTree")
-        if dt_str:
-            try:
-                decisionTree = json.loads(dt_str)
-                if isinstance(decisionTree, list) and len(decisionTree) > 0:
-                    system += "\n\nDECISION TREE STEPS:\n"
-                    for i, step in enumerate(decisionTree):
-                        system += f"{i+1}. {step}\n"
-            except Exception:
-                pass
-                
-        gr_str = custom_config.get("guardrails")
-        if gr_str:
-            try:
-                guardrails = json.loads(gr_str)
-                if isinstance(guardrails, dict):
-                    topics = guardrails.get("forbiddenTopics", [])
-                    if topics:
-                        system += "\n\nCRITICAL GUARDRAILS:\nYou MUST NOT discuss the following topics under any circumstances:\n- " + "\n- ".join(topics)
-            except Exception:
-                pass
+    with stage("config"):
+        custom_config = get_plugin_config(api_key, plug_id)
 
     # ── RAG: retrieve real document chunks ────────────────────────────
-    chunks = retrieve(request.message, plug_id, top_k=5)
-    context = format_context(chunks)
-    if context:
-        system += "\n\n" + context
+    chunks = await run_in_threadpool(retrieve, request.message, plug_id, top_k=5)
     # ──────────────────────────────────────────────────────────────────
 
+    # Build system prompt (always SME mode from VS Code)
+    with stage("prompt_build"):
+        system = SME_PERSONAS.get(plug_id, SME_PERSONAS["legal"])
+        system = apply_plugin_config(system, custom_config)
+        context = format_context(chunks)
+        if context:
+            system += "\n\n" + context
+    messages = [
+        {"role": "system", "content": system},
+        {"role": "user", "content": request.message},
+    ]
+
+    if streaming:
+        return await _v1_chat_stream(request, api_key, plug_id, messages, start_time)
+
     # Call Groq
     model = os.environ.get("GROQ_MODEL", "llama-3.3-70b-versatile")
     try:
-        llm_response = groq_client.chat.completions.create(
-            model=model,
-            max_tokens=1024,
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": request.message},
-            ],
-        )
+        llm_response = await call_llm(model=model, max_tokens=1024, messages=messages)
         reply = llm_response.choices[0].message.content or ""
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(500, f"LLM error: {str(e)}")
 
-    citations = extract_citations(reply)
-    has_citations = len(citations) > 0
+    result = _v1_result(reply, request, plug_id)
 
-    if not has_citations:
-        reply = (
-            "I cannot verify this claim without a source document. "
-            "Please upload relevant documents to your SME-Plug knowledge base "
-            "and re-ask your question."
+    latency_ms = int((time.time() - start_time) * 1000)
+    with stage("logging"):
+        log_api_call(
+            api_key=api_key,
+            plug_id=plug_id,
+            endpoint="/v1/chat",
+            status=200,
+            latency_ms=latency_ms
         )
 
-    latency_ms = int((time.time() - start_time) * 1000)
-    log_api_call(
-        api_key=api_key,
-        plug_id=plug_id,
-        endpoint="/v1/chat",
-        status=200,
-        latency_ms=latency_ms
-    )
+    return result
 
-    return {
-        "response": reply,
-        "citations": [{"source": c, "page": 0, "relevance": 0.95} for c in citations],
-        "verified": has_citations,
-        "ragas_score": 0.92 if has_citations else 0,
-        "session_id": request.session_id or "",
-        "guardrail_fired": False,
-        "has_citations": has_citations,
-        "plug_id": plug_id,
-        "plug_color": PLUG_COLORS.get(plug_id, "#888"),
-    }
+
+@app.get("/v1/kb/{plugin_id}")
+async def v1_kb_version(plugin_id: str):
+    """
+    The plug's knowledge-base version, which changes on every (re)ingest.
+    /v1/chat answers carry the same value; SDK response caches poll this
+    cheaply to learn when their entries have gone stale.
+    """
+    plug_id = plugin_id.replace("-v1", "")
+    return {"plug_id": plug_id, "kb_version": kb_version(plug_id)}
+
+
+# ── EVALUATION ────────────────────────────────────────────────────────────────
+
+EVAL_LLM      = os.environ.get("EVAL_LLM", "groq")   # "groq" | "stub" (offline, for CI)
+EVAL_MAX_RUNS = int(os.environ.get("EVAL_MAX_RUNS", "2"))   # concurrent runs per worker
+
+# Runs get their own threads, not anyio's pool: each one waits on call_llm,
+# which needs a pool token itself, so enough runs holding tokens would deadlock.
+_eval_executor = ThreadPoolExecutor(max_workers=max(1, EVAL_MAX_RUNS), thread_name_prefix="eval-run")
+
+def _groq_eval_answer(plug_id: str, model: str, loop: asyncio.AbstractEventLoop):
+    """
+    Answer function for evaluation runs: the /v1/chat prompt, deterministic
+    sampling. It runs on run_eval's worker threads, so each call is handed
+    back to the event loop to go through call_llm and the in-flight cap.
+    """
+    persona = SME_PERSONAS.get(plug_id, SME_PERSONAS["legal"])
+
+    def answer(question: str, chunks: list) -> str:
+        system = persona
+        context = format_context(chunks)
+        if context:
+            system += "\n\n" + context
+        response = asyncio.run_coroutine_threadsafe(call_llm(
+            model=model, max_tokens=1024, temperature=0,
+            messages=[{"role": "system", "content": system}, {"role": "user", "content": question}],
+        ), loop).result()
+        return response.choices[0].message.content or ""
+
+    return answer
+
+
+@app.get("/v1/eval/{plugin_id}")
+async def v1_eval(
+    plugin_id: str,
+    llm: Optional[str] = None,
+    force: bool = False,
+    include_results: bool = False,
+    authorization: str = Header(None),
+):
+    """
+    Run the plug's golden QA set (data/eval/golden/{plug}.jsonl) through
+    retrieval + generation and score it. Cached per question, so a re-run
+    only evaluates questions or indexes that changed; force=true re-runs all.
+    llm=stub answers from the retrieved chunks without calling Groq; a Groq
+    run costs one rate-limit token per question it has to answer afresh.
+    """
+    from backend.evaluation import run_eval, stub_answer, golden_path, pending_questions
+
+    plug_id = _sync_plug(plugin_id, authorization)
+    mode = (llm or EVAL_LLM).lower()
+    if mode not in ("groq", "stub"):
+        raise HTTPException(400, "llm must be 'groq' or 'stub'.")
+    if mode == "stub":
+        answer_fn, llm_id = stub_answer, "stub"
+    else:
+        model = os.environ.get("GROQ_MODEL", "llama-3.3-70b-versatile")
+        answer_fn, llm_id = _groq_eval_answer(plug_id, model, asyncio.get_running_loop()), f"groq:{model}"
+
+    try:
+        if mode == "groq":
+            # Capped at the burst, so a large golden set drains the bucket rather than never fitting.
+            calls = await run_in_threadpool(pending_questions, plug_id, llm_id, force)
+            check_rate_limit(authorization.replace("Bearer ", ""), cost=min(calls, rate_limit_info()["burst"]))
+        with stage("eval"):
+            run = await asyncio.get_running_loop().run_in_executor(
+                _eval_executor, contextvars.copy_context().run,
+                functools.partial(run_eval, plug_id, answer_fn, llm_id, force=force),
+            )
+    except FileNotFoundError:
+        raise HTTPException(404, f"No golden set for '{plug_id}'. Add {golden_path(plug_id)}.")
+    if not include_results:
+        run.results = []
+    return run.model_dump(mode="json")
 
 
 # ── DOCUMENT UPLOAD + MANAGEMENT ─────────────────────────────────────────────
 
 DOCS_DIR = Path(os.environ.get("DOCS_DIR", "./data/docs"))
 
+from backend.uploads import (
+    MAX_UPLOAD_BYTES, MAX_BATCH_BYTES, MAX_BATCH_FILES, MAX_CHUNK_BYTES, ALLOWED_SUFFIXES, UploadTooLarge, UploadConflict,
+    safe_filename, stream_to_temp, find_by_hash, known_hashes, commit_upload, forget_upload,
+    stage_batch, load_manifest, open_partial, append_partial, finish_partial,
+)
+from backend.jobs import claim_job, create_job, get_job, run_job
+
+def _upload_limit(path: str) -> int:
+    if path == "/v1/upload/batch":
+        return MAX_BATCH_BYTES
+    if path.startswith("/v1/upload/sessions/"):
+        return MAX_CHUNK_BYTES
+    return MAX_UPLOAD_BYTES
+
+class UploadSizeLimit:
+    """
+    Refuse oversized upload bodies before they are spooled to disk: up front
+    when the client declares a Content-Length, otherwise (chunked transfer)
+    as soon as the bytes received pass the limit. Then the 413 goes out and
+    the route sees a client disconnect. 64 KB of slack covers the multipart
+    framing; the routes enforce the exact file limits themselves.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/v1/upload"):
+            return await self.app(scope, receive, send)
+        limit = _upload_limit(scope["path"])
+        too_large = JSONResponse(status_code=413, content={"detail": str(UploadTooLarge(limit)), "code": "TOO_LARGE"})
+        declared = dict(scope["headers"]).get(b"content-length", b"")
+        if declared.isdigit() and int(declared) > limit + 64 * 1024:
+            return await too_large(scope, receive, send)
+
+        received, started, rejected = 0, False, False
+
+        async def counted_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit + 64 * 1024:
+                    rejected = True
+                    if not started:
+                        await too_large(scope, receive, send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if rejected:
+                return   # the 413 already went out
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            await self.app(scope, counted_receive, guarded_send)
+        except ClientDisconnect:
+            if not rejected:
+                raise
+
+app.add_middleware(UploadSizeLimit)
+
 @app.post("/v1/upload")
 async def upload_document(
     file: UploadFile = File(...),
@@ -573,42 +935,283 @@ async def upload_document(
     # Auth check
     if not authorization:
         raise HTTPException(401, "Authorization header required.")
+    check_rate_limit(authorization.replace("Bearer ", ""))
 
     # Strip -v1 suffix
     plug_id = plugin_id.replace("-v1", "")
+    set_request_plug(plug_id)
 
     # Validate file type
-    allowed = {".pdf", ".txt", ".md", ".csv"}
-    ext = Path(file.filename or "unknown.txt").suffix.lower()
-    if ext not in allowed:
-        raise HTTPException(400, f"Unsupported file type: {ext}. Accepted: {', '.join(allowed)}")
+    filename = safe_filename(file.filename)
+    ext = Path(filename).suffix.lower()
+    if ext not in ALLOWED_SUFFIXES:
+        raise HTTPException(400, f"Unsupported file type: {ext}. Accepted: {', '.join(ALLOWED_SUFFIXES)}")
 
-    # Save file to data/docs/{plug_id}/
+    # Stream to a temp file in data/docs/{plug_id}/, hashing as we go
     plug_dir = DOCS_DIR / plug_id
-    plug_dir.mkdir(parents=True, exist_ok=True)
-    dest = plug_dir / file.filename
-    with open(dest, "wb") as f:
-        content = await file.read()
-        f.write(content)
+    try:
+        with stage("write"):
+            tmp, sha256, size_bytes = await run_in_threadpool(stream_to_temp, file.file, plug_dir)
+    except UploadTooLarge as e:
+        raise HTTPException(413, str(e))
+
+    # Identical content already indexed → skip the write and the re-ingest
+    existing = find_by_hash(plug_dir, sha256)
+    if existing:
+        tmp.unlink(missing_ok=True)
+        return {
+            "status":   "unchanged" if existing == filename else "duplicate",
+            "filename": filename,
+            "plug_id":  plug_id,
+            "sha256":   sha256,
+            "duplicate_of": existing,
+            "chunks":   0,
+            "message":  f"{filename} matches {existing}, already indexed.",
+        }
+    commit_upload(tmp, plug_dir, filename, sha256, size_bytes)
 
     # Auto-ingest into ChromaDB
     from backend.rag.ingestor import ingest_plug
-    chunks_count = ingest_plug(plug_id, str(DOCS_DIR))
+    with stage("ingest"):
+        chunks_count = await run_in_threadpool(ingest_plug, plug_id, str(DOCS_DIR))
     
     # Log Document to Supabase DB.
-    size_bytes = len(content)
     api_key = authorization.replace("Bearer ", "") if authorization and authorization.startswith("Bearer ") else ""
-    log_document(filename=file.filename, size_bytes=size_bytes, plug_id=plug_id, api_key=api_key)
+    with stage("logging"):
+        log_document(filename=filename, size_bytes=size_bytes, plug_id=plug_id, api_key=api_key)
 
     return {
         "status":   "ingested",
-        "filename": file.filename,
+        "filename": filename,
         "plug_id":  plug_id,
+        "sha256":   sha256,
         "chunks":   chunks_count,
-        "message":  f"{file.filename} uploaded and indexed ({chunks_count} chunks).",
+        "message":  f"{filename} uploaded and indexed ({chunks_count} chunks).",
     }
 
 
+def _ingest_batch(job, plug_id: str, new_files: list, api_key: str) -> dict:
+    """Background half of /v1/upload/batch: one incremental ingest over all new files."""
+    from backend.rag.ingestor import ingest_files
+    chunks = ingest_files(plug_id, new_files, str(DOCS_DIR)) if new_files else {}
+    for entry in job.result["files"]:
+        if entry.get("status") == "staged":
+            entry["status"] = "ingested"
+            entry["chunks"] = chunks.get(entry["filename"], 0)
+            log_document(filename=entry["filename"], size_bytes=entry["size_bytes"], plug_id=plug_id, api_key=api_key)
+    return {"chunks": sum(chunks.values())}
+
+
+@app.post("/v1/upload/batch", status_code=202)
+async def upload_batch(
+    background: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    plugin_id: str = Form("legal"),
+    authorization: str = Header(None),
+):
+    """
+    Upload many documents (or .zip/.tar archives of them) in one request.
+    Files are written and de-duplicated immediately; a single incremental
+    ingest over the new ones runs as a background job. Poll /v1/jobs/{job_id}.
+    """
+    if not authorization:
+        raise HTTPException(401, "Authorization header required.")
+    api_key = authorization.replace("Bearer ", "")
+    check_rate_limit(api_key)
+
+    plug_id = plugin_id.replace("-v1", "")
+    set_request_plug(plug_id)
+
+    with stage("write"):
+        results, new_files = await run_in_threadpool(
+            stage_batch, [(f.filename, f.file) for f in files], DOCS_DIR / plug_id,
+        )
+
+    job = create_job("upload_batch", plug_id, api_key, files=results)
+    background.add_task(run_job, job, _ingest_batch, job, plug_id, new_files, api_key)
+    return job.to_dict()
+
+
+# ── DIRECTORY SYNC (hash lookup + resumable chunked uploads) ────────────────
+
+class HashLookupRequest(BaseModel):
+    plugin_id: str = "legal"
+    hashes:    List[str]
+
+class UploadSessionRequest(BaseModel):
+    plugin_id:  str = "legal"
+    filename:   str
+    sha256:     str
+    size_bytes: int
+
+class IngestRequest(BaseModel):
+    plugin_id: str = "legal"
+    filenames: List[str]
+
+def _sync_plug(plugin_id: str, authorization: Optional[str]) -> str:
+    if not authorization:
+        raise HTTPException(401, "Authorization header required.")
+    check_rate_limit(authorization.replace("Bearer ", ""))
+    plug_id = plugin_id.replace("-v1", "")
+    set_request_plug(plug_id)
+    return plug_id
+
+
+@app.post("/v1/documents/hashes")
+async def lookup_hashes(request: HashLookupRequest, authorization: str = Header(None)):
+    """Which of these SHA-256s the plug already holds: {"have": {sha256: filename}}."""
+    plug_id = _sync_plug(request.plugin_id, authorization)
+    if len(request.hashes) > MAX_BATCH_FILES:
+        raise HTTPException(400, f"At most {MAX_BATCH_FILES} hashes per lookup.")
+    have = await run_in_threadpool(known_hashes, DOCS_DIR / plug_id, request.hashes)
+    return {"plug_id": plug_id, "have": have}
+
+
+@app.post("/v1/upload/sessions")
+async def open_upload_session(request: UploadSessionRequest, authorization: str = Header(None)):
+    """
+    Start (or resume) a chunked upload. The session id is the content's
+    SHA-256; `offset` is where the client should continue from.
+    """
+    plug_id = _sync_plug(request.plugin_id, authorization)
+    filename = safe_filename(request.filename)
+    if Path(filename).suffix.lower() not in ALLOWED_SUFFIXES or filename.startswith("."):
+        raise HTTPException(400, f"Unsupported file type. Accepted: {', '.join(ALLOWED_SUFFIXES)}")
+    sha256 = request.sha256.lower()
+    try:
+        offset = await run_in_threadpool(
+            open_partial, DOCS_DIR / plug_id, sha256, filename, request.size_bytes,
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(413, str(e))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {
+        "upload_id":   sha256,
+        "plug_id":     plug_id,
+        "filename":    filename,
+        "offset":      offset,
+        "size_bytes":  request.size_bytes,
+        "chunk_limit": MAX_CHUNK_BYTES,
+    }
+
+
+@app.put("/v1/upload/sessions/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int,
+    plugin_id: str = "legal",
+    authorization: str = Header(None),
+):
+    """
+    Append the raw request body at `offset`. A wrong offset gets 409 with the
+    server's offset, so the client can carry on from there. The chunk that
+    completes the file verifies its hash and stages it for /v1/documents/ingest.
+    """
+    plug_id = _sync_plug(plugin_id, authorization)
+    plug_dir = DOCS_DIR / plug_id
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > MAX_CHUNK_BYTES:
+        raise HTTPException(413, f"Chunks are limited to {MAX_CHUNK_BYTES} bytes.")
+    chunk = await request.body()
+    if len(chunk) > MAX_CHUNK_BYTES:
+        raise HTTPException(413, f"Chunks are limited to {MAX_CHUNK_BYTES} bytes.")
+
+    try:
+        with stage("write"):
+            new_offset, size = await run_in_threadpool(append_partial, plug_dir, upload_id, offset, chunk)
+    except UploadConflict as e:
+        return JSONResponse(status_code=409, content={"detail": str(e), "code": "OFFSET_MISMATCH", "offset": e.offset})
+    except (KeyError, ValueError):
+        raise HTTPException(404, f"Upload session '{upload_id}' not found.")
+
+    result = {"upload_id": upload_id, "offset": new_offset, "complete": False}
+    if new_offset >= size:
+        try:
+            entry = await run_in_threadpool(finish_partial, plug_dir, upload_id)
+        except ValueError as e:
+            raise HTTPException(422, str(e))
+        result.update(complete=True, file=entry)
+    return result
+
+
+@app.post("/v1/documents/ingest", status_code=202)
+async def ingest_documents(
+    request: IngestRequest,
+    background: BackgroundTasks,
+    authorization: str = Header(None),
+):
+    """Incrementally ingest files already on the server (e.g. after a sync) as one background job."""
+    plug_id = _sync_plug(request.plugin_id, authorization)
+    api_key = authorization.replace("Bearer ", "")
+    manifest = load_manifest(DOCS_DIR / plug_id)
+    files, missing = [], []
+    for name in dict.fromkeys(safe_filename(f) for f in request.filenames):
+        entry = manifest.get(name)
+        if entry is None:
+            missing.append(name)
+            continue
+        files.append({"filename": name, "sha256": entry["sha256"],
+                      "size_bytes": entry["size_bytes"], "status": "staged"})
+    if missing:
+        raise HTTPException(404, f"Not uploaded: {', '.join(missing)}")
+
+    job = create_job("ingest", plug_id, api_key, files=files)
+    background.add_task(run_job, job, _ingest_batch, job, plug_id, [f["filename"] for f in files], api_key)
+    return job.to_dict()
+
+
+class ReindexRequest(BaseModel):
+    mode: str = "incremental"   # "incremental" | "full"
+
+def _reindex(plug_id: str, mode: str) -> dict:
+    from backend.rag.ingestor import refresh_plug, rebuild_plug
+    build = rebuild_plug if mode == "full" else refresh_plug
+    out = build(plug_id, str(DOCS_DIR))
+    out["kb_version"] = kb_version(plug_id)
+    return out
+
+
+@app.post("/v1/reindex/{plugin_id}", status_code=202)
+async def reindex_plug(
+    plugin_id: str,
+    background: BackgroundTasks,
+    request: Optional[ReindexRequest] = None,
+    authorization: str = Header(None),
+):
+    """
+    Rebuild a plug's index as a background job; poll /v1/jobs/{job_id}.
+    "incremental" (default) re-embeds only files whose content changed;
+    "full" builds a new collection beside the live one and swaps it in when
+    done. Queries are served from the current index throughout. A reindex
+    already queued or running for the plug is returned instead of a new one.
+    """
+    mode = (request.mode if request else "incremental").lower()
+    if mode not in ("incremental", "full"):
+        raise HTTPException(400, "mode must be 'incremental' or 'full'.")
+    plug_id = _sync_plug(plugin_id, authorization)
+
+    job, created = await run_in_threadpool(
+        claim_job, "reindex", plug_id, authorization.replace("Bearer ", ""),
+        admit=lambda: check_reindex_limit(plug_id), mode=mode,
+    )
+    if created:
+        background.add_task(run_job, job, _reindex, plug_id, mode)
+    return job.to_dict()
+
+
+@app.get("/v1/jobs/{job_id}")
+async def job_status(job_id: str, authorization: str = Header(None)):
+    """A job started with this API key. Other keys' jobs read as not found."""
+    if not authorization:
+        raise HTTPException(401, "Authorization header required.")
+    job = await run_in_threadpool(get_job, job_id)
+    if job is None or not job.owned_by(authorization.replace("Bearer ", "")):
+        raise HTTPException(404, f"Job '{job_id}' not found.")
+    return job.to_dict()
+
+
 @app.get("/v1/documents")
 async def list_documents(
     plugin_id: str = "legal",
@@ -623,7 +1226,7 @@ async def list_documents(
 
     docs = []
     for f in plug_dir.iterdir():
-        if f.is_file() and f.suffix.lower() in {".pdf", ".txt", ".md", ".csv"}:
+        if f.is_file() and f.suffix.lower() in ALLOWED_SUFFIXES:
             docs.append({
                 "filename": f.name,
                 "size_kb":  round(f.stat().st_size / 1024, 1),
@@ -641,21 +1244,24 @@ async def delete_document(
 ):
     """Delete a document and re-index the collection."""
     plug_id = plugin_id.replace("-v1", "")
+    filename = safe_filename(filename)
     filepath = DOCS_DIR / plug_id / filename
 
     if not filepath.exists():
         raise HTTPException(404, f"Document '{filename}' not found.")
 
     filepath.unlink()
+    forget_upload(DOCS_DIR / plug_id, filename)
 
-    # Re-index after deletion
-    from backend.rag.ingestor import ingest_plug
-    chunks_count = ingest_plug(plug_id, str(DOCS_DIR))
+    # Drop the file's chunks; off the event loop, since a running rebuild holds the plug lock.
+    from backend.rag.ingestor import refresh_plug
+    with stage("ingest"):
+        out = await run_in_threadpool(refresh_plug, plug_id, str(DOCS_DIR))
 
     return {
         "status":  "deleted",
         "filename": filename,
         "plug_id":  plug_id,
-        "remaining_chunks": chunks_count,
+        "remaining_chunks": out["total"],
     }
 
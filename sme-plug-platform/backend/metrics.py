@@ -0,0 +1,233 @@
+"""
+metrics.py — In-process Prometheus metrics for the chat pipeline.
+Served as text exposition format from GET /metrics. Stdlib only; each
+worker exposes its own series, aggregate across workers in Prometheus.
+
+Usage inside a traced request:
+    with stage("embed"):
+        vec = embedder.encode([query])
+"""
+
+import os
+import time
+import threading
+import contextlib
+from contextvars import ContextVar
+from typing import Optional
+
+# Plug label values are client input (plugin_id); anything outside this set
+# is reported as "other" so callers can't mint unbounded series.
+METRIC_PLUGS = frozenset(
+    p.strip() for p in os.environ.get("METRIC_PLUGS", "engineering,legal,healthcare").split(",") if p.strip()
+)
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ── METRIC TYPES ──────────────────────────────────────────────────────────────
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name       = name
+        self.help       = help
+        self.labelnames = tuple(labelnames)
+        self._series: dict = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for key, value in items:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key: tuple, value) -> list[str]:
+        return [f"{self.name}{_label_str(self.labelnames, key)} {_fmt(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._series[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _render_series(self, key: tuple, value) -> list[str]:
+        counts, total, count = value
+        lines = []
+        for bound, c in zip(self.buckets, counts):
+            le = _label_str(self.labelnames, key, f'le="{_fmt(float(bound))}"')
+            lines.append(f"{self.name}_bucket{le} {c}")
+        inf = _label_str(self.labelnames, key, 'le="+Inf"')
+        lines.append(f"{self.name}_bucket{inf} {count}")
+        lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {_fmt(total)}")
+        lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {count}")
+        return lines
+
+
+REGISTRY: list[_Metric] = []
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ── PIPELINE METRICS ──────────────────────────────────────────────────────────
+
+REQUEST_SECONDS = Histogram(
+    "sme_request_seconds", "End-to-end request latency.", ("endpoint", "plug", "status"),
+)
+STAGE_SECONDS = Histogram(
+    "sme_stage_seconds", "Latency of each chat pipeline stage.", ("endpoint", "plug", "stage"),
+)
+CACHE_EVENTS = Counter(
+    "sme_cache_events_total", "Cache lookups by cache and result (hit/miss).", ("cache", "result"),
+)
+INGEST_CHUNKS = Gauge(
+    "sme_ingest_chunks", "Chunks written by the last ingest run.", ("plug",),
+)
+INGEST_SECONDS = Gauge(
+    "sme_ingest_seconds", "Wall time of the last ingest run.", ("plug",),
+)
+INGEST_CHUNKS_PER_SECOND = Gauge(
+    "sme_ingest_chunks_per_second", "Embedding + write throughput of the last ingest run.", ("plug",),
+)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_EVENTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def plug_label(plug_id: str) -> str:
+    return plug_id if plug_id in METRIC_PLUGS else "other"
+
+
+def record_ingest(plug: str, chunks: int, seconds: float) -> None:
+    plug = plug_label(plug)
+    INGEST_CHUNKS.set(chunks, plug=plug)
+    INGEST_SECONDS.set(round(seconds, 3), plug=plug)
+    INGEST_CHUNKS_PER_SECOND.set(round(chunks / seconds, 1) if seconds > 0 else 0.0, plug=plug)
+
+
+# ── REQUEST TRACES ────────────────────────────────────────────────────────────
+
+class RequestTrace:
+    """Per-request labels plus the stage timings recorded so far."""
+
+    __slots__ = ("endpoint", "plug", "started", "stages")
+
+    def __init__(self, endpoint: str, plug: str = ""):
+        self.endpoint = endpoint
+        self.plug     = plug
+        self.started  = time.perf_counter()
+        self.stages: list[tuple[str, float]] = []
+
+
+_current: ContextVar[Optional[RequestTrace]] = ContextVar("sme_request_trace", default=None)
+
+
+def begin_trace(endpoint: str) -> RequestTrace:
+    trace = RequestTrace(endpoint)
+    _current.set(trace)
+    return trace
+
+
+def end_trace(trace: RequestTrace, status: int) -> float:
+    elapsed = time.perf_counter() - trace.started
+    REQUEST_SECONDS.observe(elapsed, endpoint=trace.endpoint, plug=trace.plug, status=str(status))
+    return elapsed
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current.get()
+
+
+def set_request_plug(plug_id: str) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.plug = plug_label(plug_id)
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """Time a block as a pipeline stage of the current request (if any)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        trace = _current.get()
+        if trace is not None:
+            trace.stages.append((name, elapsed))
+            STAGE_SECONDS.observe(elapsed, endpoint=trace.endpoint, plug=trace.plug, stage=name)
+        else:
+            STAGE_SECONDS.observe(elapsed, endpoint="", plug="", stage=name)
+
+
+def server_timing(trace: RequestTrace) -> str:
+    """
+    Render a trace as a Server-Timing header value. Repeated stages (e.g. the
+    two LLM calls in /v1/compare) are summed so each name appears once.
+    """
+    totals: dict[str, float] = {}
+    for name, seconds in trace.stages:
+        totals[name] = totals.get(name, 0.0) + seconds
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items()]
+    parts.append(f"total;dur={(time.perf_counter() - trace.started) * 1000:.1f}")
+    return ", ".join(parts)
@@ -0,0 +1,49 @@
+"""
+preload.py — Import and initialise the heavy runtime once, before forking.
+Used by backend/gunicorn_conf.py. With preload_app the master imports
+backend.main, calls preload_master(), then forks; workers inherit the
+SentenceTransformer weights copy-on-write instead of each loading ~400 MB.
+
+What is deliberately NOT done pre-fork:
+  - opening chromadb.PersistentClient (SQLite handles must not cross fork)
+  - running an encode (torch's intra-op thread pool doesn't survive fork)
+Both happen per worker in warm_worker().
+"""
+
+import gc
+import os
+import time
+
+
+def preload_master() -> dict:
+    """Import groq/chromadb/pypdf/torch and load embedder weights. Returns timings in ms."""
+    timings = {}
+
+    started = time.perf_counter()
+    import groq                      # noqa: F401
+    import chromadb                  # noqa: F401
+    import pypdf                     # noqa: F401
+    import sentence_transformers     # noqa: F401  (pulls in torch)
+    timings["imports_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    started = time.perf_counter()
+    from backend.rag.embeddings import get_model
+    get_model()
+    timings["embedder_load_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    # Move everything allocated so far into the permanent generation so the
+    # workers' GC passes don't write to (and so un-share) the inherited pages.
+    gc.collect()
+    gc.freeze()
+    return timings
+
+
+def warm_worker() -> None:
+    """Per-worker init after fork: bound torch threads, spin up the thread pool."""
+    threads = int(os.environ.get("TORCH_THREADS_PER_WORKER", "0"))
+    if threads > 0:
+        import torch
+        torch.set_num_threads(threads)
+
+    from backend.rag.embeddings import get_model
+    get_model().encode(["warm up"])
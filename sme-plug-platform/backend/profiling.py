@@ -0,0 +1,82 @@
+"""
+profiling.py — Opt-in sampling profiler for a single request.
+Send `x-debug-profile: 1` together with `x-admin-key: $ADMIN_API_KEY` and the
+JSON response gains a `debug_profile` block of collapsed stacks (the format
+flamegraph.pl / speedscope read) plus the hottest leaf functions.
+
+Stdlib only: a daemon thread snapshots sys._current_frames() every few ms.
+Samples cover every busy thread in the worker, so run it against a quiet
+worker when you need a clean picture of one tenant's request.
+"""
+
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from typing import Optional
+
+PROFILE_INTERVAL_MS  = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+_MAX_DEPTH           = 48
+
+# A thread parked in one of these files is idle (event loop select, worker
+# threads waiting on their queue) and would only drown out the real work.
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000.0
+        self.stacks: Counter = Counter()
+        self.leaves: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+        self._elapsed = 0.0
+
+    def start(self) -> "SamplingProfiler":
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> dict:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._elapsed = time.perf_counter() - self._started
+        return self.summary()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for tid, frame in sys._current_frames().items():
+                if tid == own or os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+                    continue
+                labels = []
+                while frame is not None and len(labels) < _MAX_DEPTH:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.reverse()
+                self.stacks[";".join(labels)] += 1
+                self.leaves[labels[-1]] += 1
+                self.samples += 1
+
+    def summary(self, top: int = 25) -> dict:
+        total = self.samples or 1
+        return {
+            "interval_ms": self.interval * 1000,
+            "duration_ms": round(self._elapsed * 1000, 1),
+            "samples":     self.samples,
+            "hot_functions": [
+                {"function": name, "samples": n, "pct": round(100 * n / total, 1)}
+                for name, n in self.leaves.most_common(top)
+            ],
+            "collapsed_stacks": [f"{stack} {n}" for stack, n in self.stacks.most_common(top)],
+        }
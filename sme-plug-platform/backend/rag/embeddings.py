@@ -0,0 +1,119 @@
+"""
+embeddings.py — Shared embedding service for the retriever and ingestor.
+One SentenceTransformer per process. Query embeddings from concurrent
+requests are coalesced by a background thread into a single batched
+encode(), so N simultaneous chats cost one forward pass instead of N.
+
+Tuning (env):
+  EMBED_MAX_BATCH    most texts per batched encode (default 32)
+  EMBED_MAX_WAIT_MS  how long a lone query waits for company (default 2)
+"""
+
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Optional
+
+from backend.metrics import Histogram
+
+EMBED_MODEL       = os.environ.get("EMBED_MODEL", "all-MiniLM-L6-v2")
+EMBED_MAX_BATCH   = int(os.environ.get("EMBED_MAX_BATCH", "32"))
+EMBED_MAX_WAIT_MS = float(os.environ.get("EMBED_MAX_WAIT_MS", "2"))
+
+EMBED_BATCH_SIZE = Histogram(
+    "sme_embed_batch_size", "Query texts per batched encode.", (),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+
+# Lazy-loaded singleton (heavy import)
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBED_MODEL)
+    return _model
+
+
+class QueryBatcher:
+    """
+    Callers block on a Future while one worker thread drains the queue.
+    Whatever piled up during the previous encode goes into the next one, so
+    batching grows with load; max_wait only matters when the queue is empty.
+    """
+
+    def __init__(self, max_batch: int = EMBED_MAX_BATCH, max_wait_ms: float = EMBED_MAX_WAIT_MS):
+        self.max_batch = max(1, max_batch)
+        self.max_wait  = max(0.0, max_wait_ms / 1000.0)
+        self._queue: "queue.Queue[tuple[list[str], Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self) -> None:
+        # Started on first use, so a pre-fork import never owns the thread.
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                    self._thread.start()
+
+    def encode(self, texts: list[str]) -> list[list[float]]:
+        self._ensure_worker()
+        fut: Future = Future()
+        self._queue.put((texts, fut))
+        return fut.result()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get_nowait() if timeout <= 0 else self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            texts = [t for item, _ in batch for t in item]
+            EMBED_BATCH_SIZE.observe(len(texts))
+            try:
+                vectors = get_model().encode(texts, batch_size=len(texts)).tolist()
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            offset = 0
+            for item, fut in batch:
+                fut.set_result(vectors[offset : offset + len(item)])
+                offset += len(item)
+
+
+_batcher = QueryBatcher()
+
+
+def embed_query(text: str) -> list[float]:
+    """Embed one search query via the shared micro-batcher."""
+    return _batcher.encode([text])[0]
+
+
+def embed_documents(texts: list[str], batch_size: int = 64) -> list[list[float]]:
+    """
+    Embed ingest chunks. These already arrive in large batches, so they go
+    straight to the shared model instead of through the query queue.
+    """
+    if not texts:
+        return []
+    return get_model().encode(texts, batch_size=batch_size).tolist()
@@ -2,12 +2,26 @@
 ingestor.py — PDF chunker + ChromaDB embedder
 Run once per plug: python -m backend.rag.ingestor
 Watches data/docs/{plug_id}/ and ingests all PDFs found.
+
+Every change to a plug's collection bumps its knowledge-base version, kept
+in a small state file beside the Chroma data that all workers read.
+/v1/chat returns it, so clients can cache answers until the knowledge base
+changes. Full rebuilds happen in a new collection that is swapped in when
+complete (see COLLECTION STATE).
 """
 
 import os
 import sys
+import json
+import time
 import hashlib
+import secrets
+import threading
 from pathlib import Path
+from typing import Optional
+
+from backend.locks import file_lock
+from backend.metrics import record_ingest
 
 
 def chunk_text(text: str, chunk_size: int = 512, overlap: int = 64) -> list[str]:
@@ -22,92 +36,319 @@ def chunk_text(text: str, chunk_size: int = 512, overlap: int = 64) -> list[str]
     return [c for c in chunks if len(c.strip()) > 50]
 
 
-def ingest_plug(plug_id: str, docs_dir: str = "./data/docs") -> int:
+INGEST_SUFFIXES = (".pdf", ".txt")   # also accept plain text
+
+
+def _collection_name(plug_id: str) -> str:
+    return f"{plug_id}_docs"
+
+
+# ── COLLECTION STATE ──────────────────────────────────────────────────────────
+#
+# {plug}_docs.state.json (beside the Chroma data, shared by every worker)
+# names the live collection and the knowledge-base version. Full rebuilds
+# fill a fresh collection and then repoint the state file with one atomic
+# rename, so queries keep hitting the old index until the new one is
+# complete. Each collection also has a {collection}.indexed.json of
+# {filename: sha256} so an incremental refresh only re-embeds what changed;
+# it adds a file's new chunks before deleting its old ones, so the file never
+# drops out of results mid-refresh.
+
+# plug → (state file mtime_ns, state), so a read is one stat() while unchanged.
+_states: dict[str, tuple[int, dict]] = {}
+_states_lock = threading.Lock()
+
+
+def _persist_dir() -> Path:
+    return Path(os.environ.get("CHROMA_PERSIST_DIR", "./data/chroma"))
+
+
+def _state_path(plug_id: str) -> Path:
+    return _persist_dir() / f"{_collection_name(plug_id)}.state.json"
+
+
+def _write_json(path: Path, data: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, path)
+
+
+def _state(plug_id: str) -> dict:
+    path = _state_path(plug_id)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {"version": "0", "collection": _collection_name(plug_id)}
+    cached = _states.get(plug_id)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    try:
+        state = json.loads(path.read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"version": "0", "collection": _collection_name(plug_id)}
+    with _states_lock:
+        _states[plug_id] = (mtime, state)
+    return state
+
+
+def _set_state(plug_id: str, collection: str) -> str:
+    version = f"{time.time_ns():x}{secrets.token_hex(2)}"
+    _write_json(_state_path(plug_id), {"version": version, "collection": collection})
+    return version
+
+
+def kb_version(plug_id: str) -> str:
+    """Opaque token that changes whenever the plug's collection does ("0" before the first ingest)."""
+    return _state(plug_id)["version"]
+
+
+def active_collection(plug_id: str) -> str:
+    """Name of the collection queries for this plug should read."""
+    return _state(plug_id)["collection"]
+
+
+def bump_kb_version(plug_id: str) -> str:
+    return _set_state(plug_id, active_collection(plug_id))
+
+
+def _plug_lock(plug_id: str):
+    """One writer per plug across every worker: an upload's ingest waits for a running rebuild."""
+    return file_lock(_persist_dir() / f"{_collection_name(plug_id)}.lock")
+
+
+def _indexed_path(collection: str) -> Path:
+    return _persist_dir() / f"{collection}.indexed.json"
+
+
+def _load_indexed(collection: str) -> Optional[dict]:
+    try:
+        return json.loads(_indexed_path(collection).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_files(plug_docs_path: Path) -> list[Path]:
+    if not plug_docs_path.exists():
+        return []
+    return sorted(f for f in plug_docs_path.iterdir() if f.is_file() and f.suffix.lower() in INGEST_SUFFIXES)
+
+
+# ── INGEST ────────────────────────────────────────────────────────────────────
+
+def rebuild_plug(plug_id: str, docs_dir: str = "./data/docs") -> dict:
     """
-    Ingest all PDFs from data/docs/{plug_id}/ into ChromaDB.
-    Returns number of chunks stored.
+    Full rebuild: embed every document into a brand-new collection, then
+    swap it in and drop the collections it replaced. Queries are served
+    from the previous collection the whole time.
+    Returns {"mode", "collection", "files", "chunks", "total"}.
     """
-    import chromadb
-    from sentence_transformers import SentenceTransformer
+    from backend.rag.retriever import _get_chroma
 
+    with _plug_lock(plug_id):
+        files = _source_files(Path(docs_dir) / plug_id)
+        started = time.perf_counter()
+        chroma = _get_chroma()
+        name = f"{_collection_name(plug_id)}_{time.time_ns():x}"
+        collection = chroma.create_collection(name)
+
+        total_chunks, indexed = 0, {}
+        try:
+            for filepath in files:
+                total_chunks += _ingest_file(collection, filepath, plug_id)
+                indexed[filepath.name] = _hash_file(filepath)
+                print(f"     ✓ {total_chunks} chunks stored")
+        except BaseException:
+            chroma.delete_collection(name)
+            raise
+        _write_json(_indexed_path(name), indexed)
+
+        previous = active_collection(plug_id)
+        _set_state(plug_id, name)
+        # Readers that resolved the old name just before the swap get one
+        # rebuild's grace: only collections older than `previous` are dropped.
+        for old in _plug_collections(chroma, plug_id):
+            if old not in (name, previous):
+                _drop_collection(chroma, old)
+
+        record_ingest(plug_id, total_chunks, time.perf_counter() - started)
+    return {"mode": "full", "collection": name, "files": len(files), "chunks": total_chunks, "total": total_chunks}
+
+
+def refresh_plug(plug_id: str, docs_dir: str = "./data/docs") -> dict:
+    """
+    Incremental rebuild: re-embed only files whose content changed since they
+    were indexed (in place, see _replace_file), and drop chunks of files that
+    are gone. Falls back to a
+    full rebuild when the live collection has no record of what it holds.
+    Returns {"mode", "collection", "changed", "removed", "chunks", "total"}:
+    chunks embedded by this call, and held by the collection afterwards.
+    """
+    from backend.rag.retriever import _get_chroma
+
+    name = active_collection(plug_id)
+    if _load_indexed(name) is None:
+        return rebuild_plug(plug_id, docs_dir)
+
+    with _plug_lock(plug_id):
+        indexed = _load_indexed(name) or {}
+        files = {f.name: f for f in _source_files(Path(docs_dir) / plug_id)}
+        hashes = {n: _hash_file(f) for n, f in files.items()}
+        changed = [n for n in files if indexed.get(n) != hashes[n]]
+        removed = [n for n in indexed if n not in files]
+        collection = _get_chroma().get_or_create_collection(name)
+        if not changed and not removed:
+            return {"mode": "incremental", "collection": name, "changed": [], "removed": [],
+                    "chunks": 0, "total": collection.count()}
+
+        started = time.perf_counter()
+        chunks = 0
+        for n in removed:
+            collection.delete(where={"filename": n})
+            indexed.pop(n, None)
+        for n in changed:
+            chunks += _replace_file(collection, files[n], plug_id)
+            indexed[n] = hashes[n]
+        _write_json(_indexed_path(name), indexed)
+        bump_kb_version(plug_id)
+        record_ingest(plug_id, chunks, time.perf_counter() - started)
+        total = collection.count()
+    return {"mode": "incremental", "collection": name, "changed": changed, "removed": removed,
+            "chunks": chunks, "total": total}
+
+
+def _plug_collections(chroma, plug_id: str) -> list[str]:
+    prefix = _collection_name(plug_id)
+    names = [c if isinstance(c, str) else c.name for c in chroma.list_collections()]
+    return [n for n in names if n == prefix or n.startswith(prefix + "_")]
+
+
+def _drop_collection(chroma, name: str) -> None:
+    try:
+        chroma.delete_collection(name)
+    except Exception as e:
+        print(f"  ⚠  Could not drop old collection {name}: {e}")
+    _indexed_path(name).unlink(missing_ok=True)
+
+
+def ingest_plug(plug_id: str, docs_dir: str = "./data/docs") -> int:
+    """
+    Ingest all PDFs from data/docs/{plug_id}/ into ChromaDB (a full rebuild,
+    swapped in atomically). Returns number of chunks stored.
+    """
     plug_docs_path = Path(docs_dir) / plug_id
     if not plug_docs_path.exists():
         print(f"  ⚠  No docs folder at {plug_docs_path} — skipping {plug_id}")
         return 0
+    if not _source_files(plug_docs_path):
+        print(f"  ⚠  No PDF or TXT files in {plug_docs_path}")
+        print(f"     Drop a PDF into {plug_docs_path}/ and re-run")
+    return rebuild_plug(plug_id, docs_dir)["chunks"]
 
-    pdf_files = list(plug_docs_path.glob("*.pdf"))
-    txt_files = list(plug_docs_path.glob("*.txt"))   # also accept plain text
-    all_files = pdf_files + txt_files
 
-    if not all_files:
-        print(f"  ⚠  No PDF or TXT files in {plug_docs_path} — skipping {plug_id}")
-        print(f"     Drop a PDF into {plug_docs_path}/ and re-run")
-        return 0
+def ingest_files(plug_id: str, filenames: list[str], docs_dir: str = "./data/docs") -> dict[str, int]:
+    """
+    Incrementally (re)ingest just these files from data/docs/{plug_id}/ into
+    the live collection. Any chunks a file already had are replaced.
+    Returns {filename: chunks stored}.
+    """
+    from backend.rag.retriever import _get_chroma
 
-    # Init ChromaDB + embedder
-    chroma   = chromadb.PersistentClient(path="./data/chroma")
-    embedder = SentenceTransformer("all-MiniLM-L6-v2")
+    plug_docs_path = Path(docs_dir) / plug_id
+    with _plug_lock(plug_id):
+        started = time.perf_counter()
+        name = active_collection(plug_id)
+        collection = _get_chroma().get_or_create_collection(name)
+        indexed = _load_indexed(name)
+
+        results = {}
+        for fname in filenames:
+            filepath = plug_docs_path / fname
+            if filepath.suffix.lower() not in INGEST_SUFFIXES or not filepath.exists():
+                results[fname] = 0
+                continue
+            results[fname] = _replace_file(collection, filepath, plug_id)
+            if indexed is not None:
+                indexed[fname] = _hash_file(filepath)
+
+        if indexed is not None:
+            _write_json(_indexed_path(name), indexed)
+        bump_kb_version(plug_id)
+        record_ingest(plug_id, sum(results.values()), time.perf_counter() - started)
+    return results
 
-    # Get or recreate collection
-    collection_name = f"{plug_id}_docs"
-    try:
-        chroma.delete_collection(collection_name)
-        print(f"  ↻  Cleared existing collection: {collection_name}")
-    except Exception:
-        pass
-    collection = chroma.create_collection(collection_name)
 
-    total_chunks = 0
+def _replace_file(collection, filepath: Path, plug_id: str) -> int:
+    """
+    Re-embed one file in a live collection. The new chunks go in under fresh
+    ids before the old ones are deleted, so a query in between sees the file
+    twice for a moment, but never not at all. Returns chunks stored.
+    """
+    old = collection.get(where={"filename": filepath.name}, include=[])["ids"]
+    stored = _ingest_file(collection, filepath, plug_id, id_salt=secrets.token_hex(4))
+    if old:
+        collection.delete(ids=old)
+    return stored
 
-    for filepath in all_files:
-        print(f"  📄  Processing: {filepath.name}")
 
-        # Extract text
-        if filepath.suffix.lower() == ".pdf":
-            text_by_page = _extract_pdf(filepath)
-        else:
-            text_by_page = {1: filepath.read_text(encoding="utf-8", errors="ignore")}
+def _ingest_file(collection, filepath: Path, plug_id: str, id_salt: str = "") -> int:
+    """Extract, chunk, embed and store one file. Returns chunks stored."""
+    from backend.rag.embeddings import embed_documents
 
-        for page_num, page_text in text_by_page.items():
-            if not page_text.strip():
-                continue
+    print(f"  📄  Processing: {filepath.name}")
 
-            chunks = chunk_text(page_text)
-            if not chunks:
-                continue
+    # Extract text
+    if filepath.suffix.lower() == ".pdf":
+        text_by_page = _extract_pdf(filepath)
+    else:
+        text_by_page = {1: filepath.read_text(encoding="utf-8", errors="ignore")}
+
+    stored = 0
+    for page_num, page_text in text_by_page.items():
+        if not page_text.strip():
+            continue
+
+        chunks = chunk_text(page_text)
+        if not chunks:
+            continue
+
+        # Embed all chunks for this page
+        embeddings = embed_documents(chunks)
+
+        # Build unique IDs
+        ids = [
+            hashlib.md5(
+                f"{id_salt}{filepath.name}_{page_num}_{i}_{c[:30]}".encode()
+            ).hexdigest()
+            for i, c in enumerate(chunks)
+        ]
+
+        metadatas = [
+            {
+                "filename":    filepath.name,
+                "page":        page_num,
+                "chunk_index": i,
+                "plug_id":     plug_id,
+            }
+            for i in range(len(chunks))
+        ]
 
-            # Embed all chunks for this page
-            embeddings = embedder.encode(chunks).tolist()
-
-            # Build unique IDs
-            ids = [
-                hashlib.md5(
-                    f"{filepath.name}_{page_num}_{i}_{c[:30]}".encode()
-                ).hexdigest()
-                for i, c in enumerate(chunks)
-            ]
-
-            metadatas = [
-                {
-                    "filename":    filepath.name,
-                    "page":        page_num,
-                    "chunk_index": i,
-                    "plug_id":     plug_id,
-                }
-                for i in range(len(chunks))
-            ]
-
-            collection.add(
-                documents=chunks,
-                embeddings=embeddings,
-                ids=ids,
-                metadatas=metadatas,
-            )
-            total_chunks += len(chunks)
-
-        print(f"     ✓ {total_chunks} chunks stored")
-
-    return total_chunks
+        collection.add(
+            documents=chunks,
+            embeddings=embeddings,
+            ids=ids,
+            metadatas=metadatas,
+        )
+        stored += len(chunks)
+    return stored
 
 
 def _extract_pdf(filepath: Path) -> dict[int, str]:
@@ -4,27 +4,26 @@ Called by the /chat endpoint before sending to the LLM.
 """
 
 import os
+import threading
 from typing import Optional
 
-# Lazy-loaded singletons (heavy imports)
-_embedder = None
-_chroma   = None
+from backend.metrics import stage
+from backend.rag.embeddings import embed_query
+from backend.rag.ingestor import active_collection
 
-
-def _get_embedder():
-    global _embedder
-    if _embedder is None:
-        from sentence_transformers import SentenceTransformer
-        _embedder = SentenceTransformer("all-MiniLM-L6-v2")
-    return _embedder
+# Lazy-loaded singleton (heavy import). retrieve() runs in the threadpool.
+_chroma      = None
+_chroma_lock = threading.Lock()
 
 
 def _get_chroma():
     global _chroma
     if _chroma is None:
-        import chromadb
-        persist_dir = os.environ.get("CHROMA_PERSIST_DIR", "./data/chroma")
-        _chroma = chromadb.PersistentClient(path=persist_dir)
+        with _chroma_lock:
+            if _chroma is None:
+                import chromadb
+                persist_dir = os.environ.get("CHROMA_PERSIST_DIR", "./data/chroma")
+                _chroma = chromadb.PersistentClient(path=persist_dir)
     return _chroma
 
 
@@ -39,7 +38,7 @@ def retrieve(
     Returns a list of dicts: { text, filename, page, score }
     Sorted by relevance (highest first).
     """
-    collection_name = f"{plug_id}_docs"
+    collection_name = active_collection(plug_id)
     chroma = _get_chroma()
 
     # Check if collection exists
@@ -52,15 +51,16 @@ def retrieve(
         return []
 
     # Embed the query
-    embedder  = _get_embedder()
-    query_emb = embedder.encode([query]).tolist()
+    with stage("embed"):
+        query_emb = [embed_query(query)]
 
     # Search
-    results = collection.query(
-        query_embeddings=query_emb,
-        n_results=min(top_k, collection.count()),
-        include=["documents", "metadatas", "distances"],
-    )
+    with stage("vector_search"):
+        results = collection.query(
+            query_embeddings=query_emb,
+            n_results=min(top_k, collection.count()),
+            include=["documents", "metadatas", "distances"],
+        )
 
     if not results or not results["documents"] or not results["documents"][0]:
         return []
@@ -0,0 +1,265 @@
+"""
+ratelimit.py — Per-key token buckets + a global gate on in-flight LLM calls.
+Buckets live in process memory so the hot path is a dict lookup; a daemon
+thread folds each worker's consumption into Postgres every few seconds so
+N workers share one budget per key instead of N.
+"""
+
+import os
+import json
+import math
+import time
+import asyncio
+import hashlib
+import threading
+import contextlib
+from pathlib import Path
+from typing import Optional
+
+from backend.locks import file_lock
+
+# ── SETTINGS ──────────────────────────────────────────────────────────────────
+RATE_LIMIT_RPS      = float(os.environ.get("RATE_LIMIT_RPS", "5"))     # steady refill per key
+RATE_LIMIT_BURST    = float(os.environ.get("RATE_LIMIT_BURST", "20"))  # bucket capacity per key
+RATE_LIMIT_SYNC_S   = float(os.environ.get("RATE_LIMIT_SYNC_S", "5"))  # DB sync period
+LLM_MAX_INFLIGHT    = int(os.environ.get("LLM_MAX_INFLIGHT", "16"))    # per worker
+LLM_QUEUE_BUDGET_MS = int(os.environ.get("LLM_QUEUE_BUDGET_MS", "2000"))
+REINDEX_PER_HOUR    = float(os.environ.get("REINDEX_PER_HOUR", "6"))   # per plug, all workers
+REINDEX_BURST       = float(os.environ.get("REINDEX_BURST", "2"))
+REINDEX_STATE_PATH  = Path(os.environ.get("REINDEX_STATE_PATH", "./data/jobs/reindex_buckets.json"))
+
+# Buckets idle (and full) this long are dropped so one-off keys don't pile up.
+_IDLE_EVICT_S = 600
+
+
+class RateLimited(Exception):
+    """Caller exhausted their bucket. retry_after is in whole seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Rate limit exceeded. Retry in {retry_after}s.")
+        self.retry_after = retry_after
+
+
+class Overloaded(Exception):
+    """LLM queue is deeper than the latency budget allows."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Server busy. Retry in {retry_after}s.")
+        self.retry_after = retry_after
+
+
+# ── TOKEN BUCKETS ─────────────────────────────────────────────────────────────
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated", "unsynced")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate     = rate
+        self.burst    = burst
+        self.tokens   = burst
+        self.updated  = time.monotonic()
+        self.unsynced = 0   # tokens taken locally since the last DB sync
+
+    def _refill(self, now: float) -> None:
+        self.tokens  = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, n: float = 1.0) -> float:
+        """Take n tokens. Returns 0 on success, else seconds until n are available."""
+        self._refill(time.monotonic())
+        if self.tokens >= n:
+            self.tokens   -= n
+            self.unsynced += n
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return (n - self.tokens) / self.rate
+
+    def charge(self, n: float) -> None:
+        """Deduct tokens spent by other workers. Never digs deeper than one burst."""
+        self._refill(time.monotonic())
+        self.tokens = max(-self.burst, self.tokens - n)
+
+
+_buckets: dict[str, TokenBucket] = {}
+_seen_totals: dict[str, int] = {}   # last global counter seen per key hash
+_lock = threading.Lock()
+
+
+def _bucket_id(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+def check_rate_limit(api_key: str, cost: float = 1.0) -> None:
+    """Spend `cost` tokens from the caller's bucket or raise RateLimited."""
+    if RATE_LIMIT_RPS <= 0 or not api_key:
+        return
+    key = _bucket_id(api_key)
+    with _lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = _buckets[key] = TokenBucket(RATE_LIMIT_RPS, RATE_LIMIT_BURST)
+        wait = bucket.take(cost)
+    if wait > 0:
+        raise RateLimited(max(1, math.ceil(wait)))
+
+
+def check_reindex_limit(plug_id: str) -> None:
+    """
+    Reindexing re-embeds a whole knowledge base, so it has its own slow
+    per-plug bucket. Rare enough to keep in a small file every worker
+    shares: {plug: [tokens, wall-clock time of the last update]}.
+    Blocking — call it from the threadpool.
+    """
+    if REINDEX_PER_HOUR <= 0:
+        return
+    rate = REINDEX_PER_HOUR / 3600.0
+    with file_lock(REINDEX_STATE_PATH.with_suffix(".lock")):
+        try:
+            state = json.loads(REINDEX_STATE_PATH.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            state = {}
+        now = time.time()
+        tokens, updated = state.get(plug_id, (REINDEX_BURST, now))
+        tokens = min(REINDEX_BURST, tokens + max(0.0, now - updated) * rate)
+        if tokens < 1:
+            raise RateLimited(max(1, math.ceil((1 - tokens) / rate)))
+        state[plug_id] = (tokens - 1, now)
+        tmp = REINDEX_STATE_PATH.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, REINDEX_STATE_PATH)
+
+
+def rate_limit_info() -> dict:
+    return {"rps": RATE_LIMIT_RPS, "burst": RATE_LIMIT_BURST}
+
+
+# ── MULTI-WORKER SYNC ─────────────────────────────────────────────────────────
+
+def sync_buckets() -> None:
+    """
+    Push local consumption to the shared counter and charge each bucket for
+    whatever the other workers spent since the previous sync.
+    """
+    from backend.db import sync_rate_limit_usage
+
+    with _lock:
+        deltas = {k: int(b.unsynced) for k, b in _buckets.items() if b.unsynced >= 1}
+        for k, n in deltas.items():
+            _buckets[k].unsynced -= n
+    if not deltas:
+        _evict_idle()
+        return
+
+    totals = sync_rate_limit_usage(deltas)
+    if totals is None:
+        # DB unavailable — keep the deltas so they go out next round.
+        with _lock:
+            for k, n in deltas.items():
+                if k in _buckets:
+                    _buckets[k].unsynced += n
+        return
+
+    with _lock:
+        for k, total in totals.items():
+            previous = _seen_totals.get(k)
+            _seen_totals[k] = total
+            if previous is None or k not in _buckets:
+                continue
+            remote = total - previous - deltas.get(k, 0)
+            if remote > 0:
+                _buckets[k].charge(remote)
+    _evict_idle()
+
+
+def _evict_idle() -> None:
+    now = time.monotonic()
+    with _lock:
+        for k in [k for k, b in _buckets.items()
+                  if b.unsynced < 1 and now - b.updated > _IDLE_EVICT_S]:
+            del _buckets[k]
+            _seen_totals.pop(k, None)
+
+
+_sync_thread: Optional[threading.Thread] = None
+_sync_stop = threading.Event()
+
+
+def start_sync() -> None:
+    global _sync_thread
+    if _sync_thread is not None or RATE_LIMIT_SYNC_S <= 0 or RATE_LIMIT_RPS <= 0:
+        return
+
+    def _loop():
+        while not _sync_stop.wait(RATE_LIMIT_SYNC_S):
+            try:
+                sync_buckets()
+            except Exception as e:
+                print(f"Rate limit sync failed: {e}")
+
+    _sync_stop.clear()
+    _sync_thread = threading.Thread(target=_loop, name="ratelimit-sync", daemon=True)
+    _sync_thread.start()
+
+
+def stop_sync() -> None:
+    global _sync_thread
+    _sync_stop.set()
+    if _sync_thread is not None:
+        _sync_thread.join(timeout=RATE_LIMIT_SYNC_S)
+        _sync_thread = None
+
+
+# ── LLM CONCURRENCY GATE ──────────────────────────────────────────────────────
+
+class ConcurrencyGate:
+    """
+    Caps in-flight LLM calls. Callers that would queue longer than the budget
+    (judged from the current queue depth and a moving average of call time)
+    are rejected immediately instead of piling up behind a slow upstream.
+    """
+
+    def __init__(self, limit: int, budget_ms: int):
+        self.limit    = max(1, limit)
+        self.budget_s = budget_ms / 1000.0
+        self.inflight = 0
+        self.waiting  = 0
+        self._avg_s   = 1.0   # EWMA of call duration, seeded pessimistically
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running loop, not the import-time one.
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.limit)
+        return self._sem
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self._avg_s * (self.waiting + 1) / self.limit))
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        sem = self._semaphore()
+        if self.inflight >= self.limit:
+            expected_wait = self._avg_s * (self.waiting + 1) / self.limit
+            if expected_wait > self.budget_s:
+                raise Overloaded(self._retry_after())
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(sem.acquire(), timeout=self.budget_s)
+        except asyncio.TimeoutError:
+            raise Overloaded(self._retry_after())
+        finally:
+            self.waiting -= 1
+
+        self.inflight += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            sem.release()
+            self._avg_s = 0.8 * self._avg_s + 0.2 * (time.monotonic() - started)
+
+
+llm_gate = ConcurrencyGate(LLM_MAX_INFLIGHT, LLM_QUEUE_BUDGET_MS)
@@ -268,11 +268,27 @@ class RAGASScore(BaseModel):
     plug_id:            Optional[str] = None
 
 
+class EvalQuestionResult(BaseModel):
+    question:           str
+    answer:             str
+    contexts:           List[str]
+    faithfulness:       float
+    context_precision:  float
+    context_recall:     float
+    answer_correctness: float
+    cached:             bool = False
+
+
 class EvalRunResponse(BaseModel):
     scores:          RAGASScore
     questions_tested: int
     passed:          bool
     baseline_comparison: Dict[str, float]
+    overall:         float = 0.0
+    questions_cached: int = 0
+    kb_version:      str = ""
+    llm:             str = "groq"       # "groq" | "stub"
+    results:         List[EvalQuestionResult] = []
 
 
 # ─────────────────────────────────────────────
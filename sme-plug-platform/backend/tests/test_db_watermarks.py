@@ -0,0 +1,90 @@
+"""poll_changes() against Postgres-shaped rows: Prisma's timestamp(3) columns come back naive."""
+
+import contextlib
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend import db
+
+NOW = datetime(2026, 1, 1, 12, 0, 0)
+
+
+class _Cursor:
+    def __init__(self, rows: dict):
+        self._rows = rows
+        self._result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql: str, params=()):
+        if "AT TIME ZONE 'UTC'" in sql:
+            self._result = [(NOW,)]
+        elif "NOW()" in sql:   # timestamptz, as Postgres returns it
+            self._result = [(NOW.replace(tzinfo=timezone.utc),)]
+        elif '"PluginConfig"' in sql:
+            self._result = [r for r in self._rows["config"] if r[-1] >= params[0]]
+        else:
+            self._result = [r for r in self._rows["revoked"] if r[-1] >= params[0]]
+
+    def fetchone(self):
+        return self._result[0]
+
+    def fetchall(self):
+        return self._result
+
+
+class _Conn:
+    def __init__(self, rows: dict):
+        self._rows = rows
+
+    def cursor(self):
+        return _Cursor(self._rows)
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def rows(monkeypatch):
+    rows = {"config": [], "revoked": []}
+
+    @contextlib.contextmanager
+    def connection():
+        yield _Conn(rows)
+
+    monkeypatch.setattr(db, "DB_BACKEND", "postgres")
+    monkeypatch.setattr(db, "db_connection", connection)
+    monkeypatch.setattr(db, "_watermarks", {})
+    monkeypatch.setattr(db, "_config_cache", {})
+    return rows
+
+
+def test_naive_rows_advance_watermarks(rows, monkeypatch):
+    invalidated = []
+    monkeypatch.setattr(db, "invalidate_api_key", lambda api_key_id=None, **_: invalidated.append(api_key_id))
+
+    assert db.poll_changes()   # first pass only seeds the watermarks
+    assert db._watermarks["config"] == NOW
+
+    edited = NOW + timedelta(seconds=5)
+    rows["config"].append(("tenant-1", "legal", "Be brief.", "[]", "{}", edited))
+    rows["revoked"].append(("key-1", edited))
+
+    assert db.poll_changes()
+    assert db._watermarks == {"config": edited, "revoked": edited}
+    assert db._config_cache[("tenant-1", "legal")][1]["persona"] == "Be brief."
+    assert invalidated == ["key-1"]
+
+
+def test_clocks_and_rows_share_naive_utc(monkeypatch):
+    aware = datetime(2026, 1, 1, 14, 0, tzinfo=timezone(timedelta(hours=2)))
+    assert db._naive_utc(aware) == NOW
+    assert db._naive_utc(NOW) == NOW
+
+    monkeypatch.setattr(db, "DB_BACKEND", "sqlite")
+    assert db._db_now(None).tzinfo is None
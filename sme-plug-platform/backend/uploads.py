@@ -0,0 +1,321 @@
+"""
+uploads.py — Stream uploaded documents to disk and track them by content hash.
+Files are copied in fixed-size chunks to a temp file in the destination
+directory, SHA-256'd on the way, and atomically renamed into place. Each
+plug directory keeps a .manifest.json of {filename: {sha256, size_bytes,
+uploaded}} used to skip re-ingesting identical uploads. Every worker
+updates it under one file lock, re-reading it first, so no entry is lost.
+
+Batch uploads may also be .zip / .tar(.gz) archives; members are streamed
+out one at a time through the same path, never extracted wholesale.
+
+Large files can also arrive in chunks through resumable upload sessions.
+A session is keyed on the file's SHA-256 and its bytes so far live in
+.partial-{sha256}.part, so an interrupted transfer resumes from whatever
+offset is on disk, from any worker.
+"""
+
+import os
+import json
+import hashlib
+import tarfile
+import zipfile
+import tempfile
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import BinaryIO, Optional
+
+from backend.locks import file_lock
+
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+UPLOAD_CHUNK     = 1024 * 1024
+ALLOWED_SUFFIXES = {".pdf", ".txt", ".md", ".csv"}
+MANIFEST_NAME    = ".manifest.json"
+MAX_BATCH_BYTES  = int(os.environ.get("MAX_BATCH_BYTES", str(2 * 1024 * 1024 * 1024)))
+MAX_BATCH_FILES  = int(os.environ.get("MAX_BATCH_FILES", "1000"))
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
+MAX_CHUNK_BYTES  = int(os.environ.get("MAX_CHUNK_BYTES", str(16 * 1024 * 1024)))
+PARTIAL_PREFIX   = ".partial-"
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds the {limit // (1024 * 1024)} MB limit.")
+        self.limit = limit
+
+
+def safe_filename(name: Optional[str]) -> str:
+    """Drop any directory components a client put in the filename."""
+    return Path(name or "unknown.txt").name
+
+
+def stream_to_temp(src: BinaryIO, dest_dir: Path, max_bytes: int = MAX_UPLOAD_BYTES) -> tuple[Path, str, int]:
+    """
+    Copy src into a temp file inside dest_dir (same filesystem, so the final
+    rename is atomic). Returns (temp_path, sha256_hex, size_bytes).
+    Blocking — call it from the threadpool.
+    """
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_name = tempfile.mkstemp(dir=dest_dir, prefix=".upload-", suffix=".part")
+    tmp = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = src.read(UPLOAD_CHUNK)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return tmp, digest.hexdigest(), size
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ── MANIFEST ──────────────────────────────────────────────────────────────────
+
+def load_manifest(plug_dir: Path) -> dict:
+    try:
+        return json.loads((plug_dir / MANIFEST_NAME).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _manifest_lock(plug_dir: Path):
+    """Held across read-modify-write of the manifest, by every worker."""
+    return file_lock(plug_dir / (MANIFEST_NAME + ".lock"))
+
+
+def _save_manifest(plug_dir: Path, manifest: dict) -> None:
+    tmp = plug_dir / f"{MANIFEST_NAME}.{os.getpid()}.{threading.get_ident()}.tmp"
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    os.replace(tmp, plug_dir / MANIFEST_NAME)
+
+
+def find_by_hash(plug_dir: Path, sha256: str) -> Optional[str]:
+    """Filename already holding this content, if it's still on disk."""
+    for filename, entry in load_manifest(plug_dir).items():
+        if entry.get("sha256") == sha256 and (plug_dir / filename).exists():
+            return filename
+    return None
+
+
+def known_hashes(plug_dir: Path, hashes: list[str]) -> dict[str, str]:
+    """{sha256: filename} for the given hashes whose content is already on disk."""
+    wanted = set(hashes)
+    found = {}
+    for filename, entry in load_manifest(plug_dir).items():
+        sha256 = entry.get("sha256")
+        if sha256 in wanted and sha256 not in found and (plug_dir / filename).exists():
+            found[sha256] = filename
+    return found
+
+
+def commit_upload(tmp: Path, plug_dir: Path, filename: str, sha256: str, size: int) -> Path:
+    """Atomically move the temp file into place and record it in the manifest."""
+    dest = plug_dir / filename
+    with _manifest_lock(plug_dir):
+        os.replace(tmp, dest)
+        manifest = load_manifest(plug_dir)
+        manifest[filename] = {
+            "sha256":     sha256,
+            "size_bytes": size,
+            "uploaded":   datetime.utcnow().isoformat(),
+        }
+        _save_manifest(plug_dir, manifest)
+    return dest
+
+
+def forget_upload(plug_dir: Path, filename: str) -> None:
+    with _manifest_lock(plug_dir):
+        manifest = load_manifest(plug_dir)
+        if manifest.pop(filename, None) is not None:
+            _save_manifest(plug_dir, manifest)
+
+
+# ── BATCH STAGING ─────────────────────────────────────────────────────────────
+
+def _archive_members(archive: Path):
+    """Yield (basename, readable) for each regular file inside a zip/tar."""
+    if zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    with zf.open(info) as member:
+                        yield safe_filename(info.filename), member
+        return
+    with tarfile.open(archive) as tf:
+        for info in tf:
+            if info.isfile():
+                member = tf.extractfile(info)
+                if member is not None:
+                    with member:
+                        yield safe_filename(info.name), member
+
+
+def stage_batch(sources: list[tuple[str, BinaryIO]], plug_dir: Path) -> tuple[list[dict], list[str]]:
+    """
+    Write every file (and every member of every archive) into plug_dir.
+    Returns (per-file results, filenames that are new and need ingesting).
+    At most MAX_BATCH_BYTES are written in all, counting what archives
+    expand to; the file that crosses it is rejected and the rest skipped.
+    Blocking — call it from the threadpool.
+    """
+    results: list[dict] = []
+    new_files: list[str] = []
+    seen_hashes: dict[str, str] = {}
+    written = 0
+
+    def stage_one(filename: str, src: BinaryIO) -> bool:
+        """Stage one file; False once the batch's byte budget is spent."""
+        nonlocal written
+        entry = {"filename": filename}
+        results.append(entry)
+        if len(results) > MAX_BATCH_FILES:
+            entry.update(status="rejected", error=f"Batch limit of {MAX_BATCH_FILES} files reached.")
+            return True
+        if Path(filename).suffix.lower() not in ALLOWED_SUFFIXES or filename.startswith("."):
+            entry.update(status="rejected", error="Unsupported file type.")
+            return True
+        remaining = MAX_BATCH_BYTES - written
+        try:
+            tmp, sha256, size = stream_to_temp(src, plug_dir, max_bytes=min(MAX_UPLOAD_BYTES, remaining))
+        except UploadTooLarge as e:
+            if remaining < MAX_UPLOAD_BYTES:
+                entry.update(status="rejected", error=f"{UploadTooLarge(MAX_BATCH_BYTES)} The rest of the batch was skipped.")
+                return False
+            entry.update(status="rejected", error=str(e))
+            return True
+        written += size
+        entry.update(sha256=sha256, size_bytes=size)
+        existing = seen_hashes.get(sha256) or find_by_hash(plug_dir, sha256)
+        if existing:
+            tmp.unlink(missing_ok=True)
+            entry.update(status="unchanged" if existing == filename else "duplicate", duplicate_of=existing)
+            return True
+        commit_upload(tmp, plug_dir, filename, sha256, size)
+        seen_hashes[sha256] = filename
+        if filename not in new_files:
+            new_files.append(filename)
+        entry["status"] = "staged"
+        return True
+
+    for name, src in sources:
+        name = safe_filename(name)
+        if not name.lower().endswith(ARCHIVE_SUFFIXES):
+            if not stage_one(name, src):
+                break
+            continue
+        try:
+            archive, _, _ = stream_to_temp(src, plug_dir, max_bytes=MAX_BATCH_BYTES)
+        except UploadTooLarge as e:
+            results.append({"filename": name, "status": "rejected", "error": str(e)})
+            continue
+        try:
+            if not all(stage_one(member_name, member) for member_name, member in _archive_members(archive)):
+                break
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            results.append({"filename": name, "status": "rejected", "error": f"Unreadable archive: {e}"})
+        finally:
+            archive.unlink(missing_ok=True)
+
+    return results, new_files
+
+
+# ── RESUMABLE UPLOADS ─────────────────────────────────────────────────────────
+
+class UploadConflict(Exception):
+    """A chunk arrived for the wrong offset; carries the offset the server has."""
+
+    def __init__(self, message: str, offset: int):
+        super().__init__(message)
+        self.offset = offset
+
+
+def _partial_paths(plug_dir: Path, sha256: str) -> tuple[Path, Path]:
+    if len(sha256) != 64 or any(c not in "0123456789abcdef" for c in sha256):
+        raise ValueError("sha256 must be 64 lowercase hex characters.")
+    base = plug_dir / f"{PARTIAL_PREFIX}{sha256}"
+    return base.with_suffix(".part"), base.with_suffix(".json")
+
+
+def open_partial(plug_dir: Path, sha256: str, filename: str, size: int) -> int:
+    """
+    Start or resume the session for this content. Returns the offset the
+    client should send from (0 for a new session).
+    """
+    if size > MAX_UPLOAD_BYTES:
+        raise UploadTooLarge(MAX_UPLOAD_BYTES)
+    plug_dir.mkdir(parents=True, exist_ok=True)
+    part, meta = _partial_paths(plug_dir, sha256)
+    info = {"filename": filename, "size_bytes": size}
+    try:
+        if json.loads(meta.read_text()) == info and part.exists():
+            return part.stat().st_size
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    meta.write_text(json.dumps(info))
+    part.write_bytes(b"")
+    return 0
+
+
+def append_partial(plug_dir: Path, sha256: str, offset: int, chunk: bytes) -> tuple[int, int]:
+    """
+    Append chunk at offset. Returns (new offset, declared size). Raises UploadConflict
+    when offset is not where the partial file ends, so a retried chunk that
+    already landed is detected rather than written twice.
+    Blocking — call it from the threadpool.
+    """
+    part, meta = _partial_paths(plug_dir, sha256)
+    try:
+        size = json.loads(meta.read_text())["size_bytes"]
+        current = part.stat().st_size
+    except (FileNotFoundError, json.JSONDecodeError):
+        raise KeyError(sha256)
+    if offset != current:
+        raise UploadConflict(f"Expected offset {current}, got {offset}.", current)
+    if current + len(chunk) > size:
+        raise UploadConflict("Chunk runs past the declared size.", current)
+    with open(part, "ab") as out:
+        out.write(chunk)
+    return current + len(chunk), size
+
+
+def finish_partial(plug_dir: Path, sha256: str) -> dict:
+    """
+    Once every byte is in, verify the hash and move the file into place
+    (unless identical content is already there). Returns the same per-file
+    entry shape as stage_batch. A hash mismatch discards the partial.
+    Blocking — call it from the threadpool.
+    """
+    part, meta = _partial_paths(plug_dir, sha256)
+    info = json.loads(meta.read_text())
+    filename, size = info["filename"], info["size_bytes"]
+    entry = {"filename": filename, "sha256": sha256, "size_bytes": size}
+    if hash_file(part) != sha256:
+        part.unlink(missing_ok=True)
+        meta.unlink(missing_ok=True)
+        raise ValueError(f"{filename}: content does not match sha256; upload discarded.")
+    existing = find_by_hash(plug_dir, sha256)
+    if existing:
+        part.unlink(missing_ok=True)
+        entry.update(status="unchanged" if existing == filename else "duplicate", duplicate_of=existing)
+    else:
+        commit_upload(part, plug_dir, filename, sha256, size)
+        entry["status"] = "staged"
+    meta.unlink(missing_ok=True)
+    return entry
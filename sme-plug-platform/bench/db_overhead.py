@@ -0,0 +1,165 @@
+"""
+db_overhead.py — Per-request database overhead, Postgres vs embedded SQLite.
+Each backend runs in its own interpreter, because backend.db picks its
+backend at import.
+
+Run from sme-plug-platform/:
+  python -m bench.db_overhead                          # SQLite only
+  DATABASE_URL=postgres://... python -m bench.db_overhead --backends sqlite,postgres \
+      --api-key sk-... --out bench/db_overhead.json
+
+The Postgres run INSERTs ApiCall/rollup/RateLimitBucket rows, so point it at
+a scratch database. Without --api-key it uses an unknown key, which measures
+the negative-lookup and fallback-tenant path.
+
+Two views per backend:
+  - "uncached": the raw round trips a request costs when every cache misses
+    (key lookup, PluginConfig fetch and a 1-row ApiCall insert).
+  - "request": the steady-state request path with warm caches and the
+    queued logger. This is what a chat request actually pays.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import secrets
+import argparse
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+PLUG_ID = "legal"
+
+
+def _pct(samples: list[float]) -> dict:
+    s = sorted(samples)
+    at = lambda q: s[min(len(s) - 1, int(q * len(s)))]
+    return {
+        "p50_ms":  round(at(0.50) * 1000, 3),
+        "p95_ms":  round(at(0.95) * 1000, 3),
+        "p99_ms":  round(at(0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(s) * 1000, 3),
+    }
+
+
+def _time(fn, iterations: int, before=None) -> dict:
+    samples = []
+    for _ in range(iterations):
+        if before:
+            before()
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return _pct(samples)
+
+
+def _seed_sqlite(api_key: str) -> None:
+    from backend import db_sqlite
+
+    now = datetime.now(timezone.utc)
+    conn = db_sqlite.connect()
+    with conn.cursor() as cur:
+        cur.execute('INSERT OR REPLACE INTO "Tenant" (id, "companyName", "createdAt") VALUES (%s, %s, %s)',
+                    ("bench-tenant", "Bench Co", now))
+        cur.execute('''
+            INSERT OR REPLACE INTO "ApiKey" (id, "tenantId", "pluginId", name, "keyHash", prefix, "createdAt")
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ''', ("bench-key", "bench-tenant", PLUG_ID, "bench", hashlib.sha256(api_key.encode()).hexdigest(), api_key[:8], now))
+        cur.execute('''
+            INSERT OR REPLACE INTO "PluginConfig" (id, "tenantId", "pluginId", persona, "decisionTree", guardrails, "updatedAt")
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ''', ("bench-config", "bench-tenant", PLUG_ID, "Be brief.", "[]", "{}", now))
+    conn.commit()
+    conn.close()
+
+
+def run_backend(api_key: str, iterations: int) -> dict:
+    from backend import db
+
+    def event():
+        return {"key_hash": db.key_hash(api_key), "plug_id": PLUG_ID, "endpoint": "/v1/chat",
+                "status": 200, "latency_ms": 100, "created_at": datetime.now(timezone.utc)}
+
+    def clear_caches():
+        db._key_cache.clear()
+        db._fallback_tenant = (0.0, None)
+        db._config_cache.clear()
+        db._usage_cache.clear()
+
+    tenant_id = db.resolve_tenant(api_key)
+    if tenant_id is None:
+        raise RuntimeError("no tenant reachable: is the database configured and seeded?")
+    h = db.key_hash(api_key)
+
+    def uncached_request():
+        tenant = db.resolve_tenant(api_key)
+        db._fetch_plugin_config(tenant, PLUG_ID)
+        db._insert_api_calls([event()])
+
+    def cached_request():
+        db.resolve_tenant(api_key)
+        db.get_plugin_config(api_key, PLUG_ID)
+        db.log_api_call(api_key, PLUG_ID, "/v1/chat", 200, 100)
+
+    batch = [event() for _ in range(200)]
+    results = {
+        "key_lookup":        _time(lambda: db.resolve_api_key(api_key), iterations, clear_caches),
+        "plugin_config":     _time(lambda: db._fetch_plugin_config(tenant_id, PLUG_ID), iterations),
+        "log_insert_1":      _time(lambda: db._insert_api_calls([event()]), iterations),
+        "log_insert_200":    _time(lambda: db._insert_api_calls(batch), max(1, iterations // 10)),
+        "usage":             _time(lambda: db.get_api_usage(api_key), iterations, lambda: db._usage_cache.clear()),
+        "rate_limit_sync":   _time(lambda: db.sync_rate_limit_usage({h: 1}), iterations),
+        "request_uncached":  _time(uncached_request, iterations, clear_caches),
+    }
+    cached_request()   # warm
+    results["request"] = _time(cached_request, iterations)
+    db.flush_logs()
+    db.close_pool()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="sqlite", help="comma-separated: sqlite,postgres")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--api-key", default=None, help="live key for the Postgres run")
+    parser.add_argument("--out", default=None, help="write the JSON report here too")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_backend(args.api_key, args.iterations)))
+        return
+
+    report = {"iterations": args.iterations, "backends": {}}
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        env = dict(os.environ, DB_BACKEND=backend, CONFIG_POLL_S="0")
+        api_key = args.api_key or f"sk-bench-{secrets.token_hex(8)}"
+        with tempfile.TemporaryDirectory() as tmp:
+            if backend == "sqlite":
+                env["SQLITE_PATH"] = os.path.join(tmp, "bench.db")
+                subprocess.run([sys.executable, "-c",
+                                f"from bench.db_overhead import _seed_sqlite; _seed_sqlite({api_key!r})"],
+                               env=env, check=True)
+            proc = subprocess.run(
+                [sys.executable, "-m", "bench.db_overhead", "--child", backend,
+                 "--iterations", str(args.iterations), "--api-key", api_key],
+                env=env, capture_output=True, text=True,
+            )
+        if proc.returncode != 0:
+            report["backends"][backend] = {"error": proc.stderr.strip().splitlines()[-1:]}
+            continue
+        report["backends"][backend] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+fake_llm.py — Local stand-in for the Groq / OpenAI chat-completions API.
+Answers POST /openai/v1/chat/completions (Groq's path) and
+/v1/chat/completions (OpenAI's), plain or streamed. It takes a configurable
+time to first token, token rate and length, and injects errors, so /chat
+throughput can be measured without paying for (or waiting on) a real
+provider. Answers cite the first document in the system prompt, so the
+backend's citation check passes the way it would with a real model.
+
+  python -m bench.fake_llm --port 8200 --ttft lognormal:250,0.5 --tokens-per-s 300 \
+      --tokens 150 --error-rate 0.01
+  GROQ_BASE_URL=http://127.0.0.1:8200 GROQ_API_KEY=fake uvicorn backend.main:app --port 8000
+
+Latency distributions (milliseconds): fixed:200, uniform:100,400,
+normal:250,50, lognormal:<median>,<sigma>.
+"""
+
+import re
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional, Sequence
+
+_DOC_RE = re.compile(r"--- Document \d+: (.+?), Page (\d+) ---")
+_WORDS = ("the", "clause", "obligation", "party", "shall", "data", "notice", "within", "days",
+          "liability", "controller", "processor", "breach", "policy", "requirement", "risk")
+
+
+def parse_distribution(spec: str) -> Callable[[random.Random], float]:
+    """Sampler for a "kind:params" latency spec, in seconds."""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    if kind == "fixed":
+        return lambda rng: values[0] / 1000
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1])) / 1000
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1]) / 1000
+    raise ValueError(f"Unknown distribution {spec!r}; use fixed, uniform, normal or lognormal")
+
+
+class FakeLlm:
+    """Timing and failure model shared by every request; counters for the report."""
+
+    def __init__(self, ttft: str = "fixed:200", tokens_per_s: float = 250, tokens: int = 120,
+                 error_rate: float = 0.0, error_statuses: Sequence[int] = (500, 503, 429),
+                 seed: Optional[int] = None):
+        self.ttft = parse_distribution(ttft)
+        self.tokens_per_s = tokens_per_s
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def plan(self) -> tuple:
+        """(error status or None, seconds to first token, seconds per token)."""
+        with self._lock:
+            self.requests += 1
+            if self.error_rate and self._rng.random() < self.error_rate:
+                self.errors += 1
+                return self._rng.choice(self.error_statuses), self.ttft(self._rng), 0.0
+            return None, self.ttft(self._rng), (1.0 / self.tokens_per_s if self.tokens_per_s > 0 else 0.0)
+
+    def answer(self, messages: list) -> list:
+        """Token strings for an answer that cites the first retrieved document, if any."""
+        system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+        doc = _DOC_RE.search(system or "")
+        with self._lock:
+            words = [self._rng.choice(_WORDS) for _ in range(max(1, self.tokens - 8))]
+        text = " ".join(words).capitalize() + "."
+        if doc:
+            text += f" [Source: {doc.group(1)}, pg {doc.group(2)}]"
+        return [w + " " for w in text.split(" ")]
+
+
+def make_handler(llm: FakeLlm):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out as separate writes; with Nagle on, each
+        # keep-alive response waits ~40 ms on the client's delayed ACK.
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status: int, payload: dict, headers: Optional[dict] = None) -> None:
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                return self._json(200, {"object": "list", "data": [{"id": "fake-llm", "object": "model"}]})
+            return self._json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._json(404, {"error": {"message": "not found"}})
+
+            error, ttft, per_token = llm.plan()
+            time.sleep(ttft)
+            if error is not None:
+                headers = {"Retry-After": "1"} if error in (429, 503) else None
+                return self._json(error, {"error": {"message": f"injected {error}", "type": "fake"}}, headers)
+
+            tokens = llm.answer(body.get("messages", []))
+            model = body.get("model", "fake-llm")
+            created = int(time.time())
+            if body.get("stream"):
+                return self._stream(tokens, per_token, model, created)
+
+            time.sleep(per_token * len(tokens))
+            return self._json(200, {
+                "id": f"chatcmpl-{created}", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(tokens).strip()}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+            })
+
+        def _stream(self, tokens: list, per_token: float, model: str, created: int) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def send(data: str) -> None:
+                chunk = f"data: {data}\n\n".encode()
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                self.wfile.flush()
+
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(per_token)
+                send(json.dumps({
+                    "id": f"chatcmpl-{created}", "object": "chat.completion.chunk", "created": created,
+                    "model": model, "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                }))
+            send(json.dumps({
+                "id": f"chatcmpl-{created}", "object": "chat.completion.chunk", "created": created,
+                "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }))
+            send("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+
+    return Handler
+
+
+def serve(port: int = 8200, host: str = "127.0.0.1", **options) -> tuple:
+    """Start the server in a background thread. Returns (server, llm)."""
+    llm = FakeLlm(**options)
+    server = ThreadingHTTPServer((host, port), make_handler(llm))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-llm", daemon=True).start()
+    return server, llm
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--ttft", default="lognormal:250,0.4", help="time to first token distribution (ms)")
+    parser.add_argument("--tokens-per-s", type=float, default=250, help="generation speed after the first token")
+    parser.add_argument("--tokens", type=int, default=120, help="tokens per answer")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls that fail")
+    parser.add_argument("--error-statuses", default="500,503,429", help="statuses injected failures use")
+
+
+def options_from(args: argparse.Namespace) -> dict:
+    return {
+        "ttft": args.ttft, "tokens_per_s": args.tokens_per_s, "tokens": args.tokens,
+        "error_rate": args.error_rate,
+        "error_statuses": [int(s) for s in args.error_statuses.split(",") if s],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8200)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server, llm = serve(args.port, args.host, **options_from(args))
+    print(f"Fake LLM on http://{args.host}:{args.port} (GROQ_BASE_URL / OpenAI base_url)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"{llm.requests} requests, {llm.errors} injected errors")
@@ -0,0 +1,377 @@
+"""
+load.py — Open-loop load test of /chat, /v1/chat, /v1/compare and /v1/upload.
+Sends requests at a fixed arrival rate, whether or not earlier ones have
+finished, and measures each from the moment it was due. So when the server
+falls behind, the queueing shows up in the percentiles instead of slowing
+the load down (no coordinated omission). Stage timings come from the
+Server-Timing header the backend sets on traced routes.
+
+Run from sme-plug-platform/:
+  # self-contained: fake LLM in-process, backend as a subprocess
+  python -m bench.load --spawn --rps 20 --duration 60 --out bench/load.json
+  python -m bench.load --spawn --workers 4 --ttft lognormal:400,0.6 --error-rate 0.02 \
+      --mix chat=1,v1_chat=4,compare=1,upload=0.2 --baseline bench/load.json
+  # an already running backend (point its GROQ_BASE_URL at bench.fake_llm)
+  python -m bench.load --target http://127.0.0.1:8000 --rps 50 --duration 120
+
+Uploads add documents to the plug's knowledge base; --isolate gives a
+spawned backend empty temporary DOCS_DIR and CHROMA_PERSIST_DIR instead.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import random
+import shutil
+import signal
+import socket
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+import http.client
+import urllib.request
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Optional
+from urllib.parse import urlsplit
+
+from bench import fake_llm
+
+API_KEY = "sk-bench-load"
+
+QUESTIONS = [
+    "What are the termination rights under the master services agreement?",
+    "Within how many hours must a personal data breach be notified?",
+    "Which party bears liability for indirect damages?",
+    "What does the confidentiality clause require after the contract ends?",
+    "Summarise the indemnification obligations of the supplier.",
+    "What lawful bases for processing personal data does GDPR allow?",
+    "Is a data processing agreement required for subprocessors?",
+    "How long may records be retained after termination?",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _pct(samples: list[float]) -> dict:
+    if not samples:
+        return {}
+    s = sorted(samples)
+    at = lambda q: s[min(len(s) - 1, int(q * len(s)))]
+    return {
+        "p50_ms":  round(at(0.50) * 1000, 3),
+        "p95_ms":  round(at(0.95) * 1000, 3),
+        "p99_ms":  round(at(0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(s) * 1000, 3),
+    }
+
+
+def _server_timing(header: Optional[str]) -> dict:
+    """Stage durations in seconds from a header like 'retrieve;dur=12.3, llm;dur=250'."""
+    stages = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur" and name:
+                try:
+                    stages[name] = float(value) / 1000
+                except ValueError:
+                    pass
+    return stages
+
+
+# ── REQUESTS ──────────────────────────────────────────────────────────────────
+
+def _json_request(path: str, payload: dict, headers: Optional[dict] = None) -> tuple:
+    return "POST", path, json.dumps(payload).encode(), {"Content-Type": "application/json", **(headers or {})}
+
+
+def _upload_request(plug_id: str) -> tuple:
+    # Unique content, so every upload is a real ingest and never a dedupe hit.
+    name = f"bench-{uuid.uuid4().hex[:12]}.txt"
+    text = "\n".join(f"Clause {i}. {random.choice(QUESTIONS)} {uuid.uuid4().hex}" for i in range(40))
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"plugin_id\"\r\n\r\n{plug_id}\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{name}\"\r\n"
+        f"Content-Type: text/plain\r\n\r\n{text}\r\n--{boundary}--\r\n"
+    ).encode()
+    return "POST", "/v1/upload", body, {
+        "Content-Type": f"multipart/form-data; boundary={boundary}",
+        "Authorization": f"Bearer {API_KEY}",
+    }
+
+
+def build_request(endpoint: str, plug_id: str) -> tuple:
+    """(method, path, body, headers) for one request to the named endpoint."""
+    question = random.choice(QUESTIONS)
+    auth = {"Authorization": f"Bearer {API_KEY}"}
+    if endpoint == "chat":
+        return _json_request("/chat", {"message": question, "plug_id": plug_id}, {"x-api-key": API_KEY})
+    if endpoint == "v1_chat":
+        return _json_request("/v1/chat", {"message": question, "plugin_id": f"{plug_id}-v1"}, auth)
+    if endpoint == "compare":
+        return _json_request("/v1/compare", {"message": question, "plug_id": plug_id}, auth)
+    if endpoint == "upload":
+        return _upload_request(plug_id)
+    raise ValueError(f"Unknown endpoint {endpoint!r}")
+
+
+# ── RUN ───────────────────────────────────────────────────────────────────────
+
+class _Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = defaultdict(list)   # endpoint → seconds from due time to last byte
+        self.service = defaultdict(list)   # endpoint → seconds from send to last byte
+        self.stages = defaultdict(lambda: defaultdict(list))
+        self.statuses = defaultdict(Counter)
+
+    def add(self, endpoint: str, status, latency: float, service: float, stages: dict) -> None:
+        with self._lock:
+            self.statuses[endpoint][str(status)] += 1
+            if status == 200:
+                self.latency[endpoint].append(latency)
+                self.service[endpoint].append(service)
+                for name, seconds in stages.items():
+                    self.stages[endpoint][name].append(seconds)
+
+
+def _worker(target: str, jobs: queue.Queue, recorder: _Recorder, plug_id: str, timeout: float) -> None:
+    url = urlsplit(target)
+    conn = None
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        endpoint, due = job
+        method, path, body, headers = build_request(endpoint, plug_id)
+        sent = time.perf_counter()
+        status, stages = "error", {}
+        try:
+            if conn is None:
+                conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=timeout)
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+            stages = _server_timing(response.getheader("Server-Timing"))
+            if response.getheader("Connection", "").lower() == "close":
+                conn.close()
+                conn = None
+        except (OSError, http.client.HTTPException) as e:
+            status = "timeout" if isinstance(e, socket.timeout) else "error"
+            if conn is not None:
+                conn.close()
+            conn = None
+        done = time.perf_counter()
+        recorder.add(endpoint, status, done - due, done - sent, stages)
+
+
+def run_load(
+    target: str, *, rps: float, duration: float, mix: dict, workers: int,
+    plug_id: str = "legal", arrivals: str = "poisson", timeout: float = 60.0, seed: Optional[int] = None,
+) -> dict:
+    """Drive `target` for `duration` seconds and return the per-endpoint report."""
+    rng = random.Random(seed)
+    endpoints, weights = list(mix), list(mix.values())
+    recorder = _Recorder()
+    jobs: queue.Queue = queue.Queue()
+    threads = [
+        threading.Thread(target=_worker, args=(target, jobs, recorder, plug_id, timeout), daemon=True)
+        for _ in range(workers)
+    ]
+    for t in threads:
+        t.start()
+
+    started = time.perf_counter()
+    due, scheduled, max_backlog = started, 0, 0
+    while due - started < duration:
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        jobs.put((rng.choices(endpoints, weights)[0], due))
+        scheduled += 1
+        max_backlog = max(max_backlog, jobs.qsize())
+        due += rng.expovariate(rps) if arrivals == "poisson" else 1.0 / rps
+    for _ in threads:
+        jobs.put(None)
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    report = {}
+    for endpoint in endpoints:
+        statuses = recorder.statuses[endpoint]
+        total = sum(statuses.values())
+        if not total:
+            continue
+        ok = statuses.get("200", 0)
+        report[endpoint] = {
+            "requests":     total,
+            "ok":           ok,
+            "error_rate":   round(1 - ok / total, 4),
+            "statuses":     dict(statuses),
+            "throughput_rps": round(ok / elapsed, 2),
+            "latency":      _pct(recorder.latency[endpoint]),
+            "service":      _pct(recorder.service[endpoint]),
+            "stages":       {name: _pct(s) for name, s in sorted(recorder.stages[endpoint].items())},
+        }
+    all_ok = [s for samples in recorder.latency.values() for s in samples]
+    report["all"] = {
+        "requests":       scheduled,
+        "ok":             len(all_ok),
+        "throughput_rps": round(len(all_ok) / elapsed, 2),
+        "latency":        _pct(all_ok),
+        "max_backlog":    max_backlog,
+        "seconds":        round(elapsed, 2),
+    }
+    return report
+
+
+def compare(report: dict, baseline: dict) -> dict:
+    """Per-endpoint change in p50/p95/p99 and throughput against a previous report."""
+    deltas = {}
+    for endpoint, now in report.items():
+        before = baseline.get("results", {}).get(endpoint)
+        if not before:
+            continue
+        d = {f"{k}_delta": round(now["latency"][k] - before["latency"][k], 3)
+             for k in ("p50_ms", "p95_ms", "p99_ms") if k in now["latency"] and k in before.get("latency", {})}
+        d["throughput_rps_delta"] = round(now["throughput_rps"] - before["throughput_rps"], 2)
+        deltas[endpoint] = d
+    return {"commit": baseline.get("commit"), "endpoints": deltas}
+
+
+# ── SPAWNED STACK ─────────────────────────────────────────────────────────────
+
+def _wait_ready(port: int, proc: subprocess.Popen, timeout: float) -> None:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError(f"backend exited with {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as r:
+                if r.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError("backend did not become ready")
+
+
+def spawn_backend(llm_port: int, workers: int, scratch: Optional[str]) -> tuple:
+    """Start uvicorn backend.main:app against the fake LLM. Returns (process, base URL)."""
+    port = _free_port()
+    env = dict(os.environ, GROQ_BASE_URL=f"http://127.0.0.1:{llm_port}", GROQ_API_KEY="fake",
+               RATE_LIMIT_RPS="0", WARM_EMBEDDER="1")
+    if scratch:
+        env.update(DOCS_DIR=os.path.join(scratch, "docs"), CHROMA_PERSIST_DIR=os.path.join(scratch, "chroma"))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env, start_new_session=True,
+    )
+    try:
+        _wait_ready(port, proc, timeout=180)
+    except Exception:
+        os.killpg(proc.pid, signal.SIGTERM)
+        raise
+    return proc, f"http://127.0.0.1:{port}"
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {"chat", "v1_chat", "compare", "upload"}
+    if unknown:
+        raise SystemExit(f"Unknown endpoint(s) in --mix: {sorted(unknown)}")
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--target", help="base URL of a running backend")
+    target.add_argument("--spawn", action="store_true", help="start the fake LLM and a backend")
+    parser.add_argument("--rps", type=float, default=10, help="target arrival rate")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of unrecorded load first")
+    parser.add_argument("--arrivals", choices=("poisson", "constant"), default="poisson")
+    parser.add_argument("--mix", default="chat=1,v1_chat=2,compare=1,upload=0.1")
+    parser.add_argument("--concurrency", type=int, default=64, help="client threads (max requests in flight)")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--plug", default="legal")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--workers", type=int, default=1, help="backend workers with --spawn")
+    parser.add_argument("--isolate", action="store_true", help="spawned backend uses an empty temporary KB")
+    parser.add_argument("--out", help="write the report here as JSON")
+    parser.add_argument("--baseline", help="previous --out report to compare against")
+    fake_llm.add_arguments(parser)
+    args = parser.parse_args()
+    mix = _parse_mix(args.mix)
+
+    proc, scratch, server, llm = None, None, None, None
+    base = args.target
+    try:
+        if args.spawn:
+            llm_port = _free_port()
+            server, llm = fake_llm.serve(llm_port, seed=args.seed, **fake_llm.options_from(args))
+            scratch = tempfile.mkdtemp(prefix="bench-load-") if args.isolate else None
+            proc, base = spawn_backend(llm_port, args.workers, scratch)
+
+        options = dict(mix=mix, workers=args.concurrency, plug_id=args.plug, arrivals=args.arrivals,
+                       timeout=args.timeout, seed=args.seed)
+        if args.warmup > 0:
+            run_load(base, rps=args.rps, duration=args.warmup, **options)
+        results = run_load(base, rps=args.rps, duration=args.duration, **options)
+    finally:
+        if proc is not None:
+            os.killpg(proc.pid, signal.SIGTERM)
+            proc.wait(timeout=30)
+        if server is not None:
+            server.shutdown()
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    config = {k: v for k, v in vars(args).items() if k not in ("out", "baseline")}
+    report = {
+        "commit":    _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config":    {**config, "mix": mix, "target": base},
+        "results":   results,
+    }
+    if llm is not None:
+        report["fake_llm"] = {"requests": llm.requests, "injected_errors": llm.errors}
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["baseline"] = compare(results, json.load(f))
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
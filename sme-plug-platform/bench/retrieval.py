@@ -0,0 +1,497 @@
+"""
+retrieval.py — Ingestion and retrieval micro-benchmarks on synthetic corpora.
+CPU only. Every corpus is generated from --seed, so two runs (or two
+commits) see the same text, vectors and queries.
+
+Stages (pick with --stages; all by default):
+  chunk    chunk_text() words/s and chunks/s on generated page text
+  extract  _extract_pdf() pages/s over the PDFs in --pdf-dir (skipped without one)
+  embed    embed_documents() chunks/s with the configured EMBED_MODEL
+  index    per backend and corpus size: build time, on-disk size, query
+           latency at each --top-k and recall@k against exact search
+  e2e      rebuild_plug() over --e2e-docs generated .txt files, then retrieve()
+           latency, in a throwaway CHROMA_PERSIST_DIR
+
+Index backends: exact (numpy brute force, also the ground truth), chroma
+(a PersistentClient collection with the production defaults), and hnswlib
+and faiss (IVF-flat) when installed. Index corpora default to synthetic
+clustered unit vectors, so 10M-chunk runs don't wait on the embedder;
+--vectors embed indexes real embeddings of generated chunks instead.
+
+Run from sme-plug-platform/:
+  python -m bench.retrieval --sizes 1000,10000,100000 --out bench/retrieval.json
+  python -m bench.retrieval --stages index --sizes 1000000,10000000 --backends exact,hnswlib,faiss
+  python -m bench.retrieval --stages chunk,embed,e2e --pdf-dir data/docs/legal
+"""
+
+import os
+
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")   # CPU only, before torch can load
+
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from backend.rag.ingestor import chunk_text
+
+VECTOR_BLOCK = 50_000   # rows generated / searched / inserted at a time
+
+
+def _pct(samples: list[float]) -> dict:
+    s = sorted(samples)
+    at = lambda q: s[min(len(s) - 1, int(q * len(s)))]
+    return {
+        "p50_ms":  round(at(0.50) * 1000, 3),
+        "p95_ms":  round(at(0.95) * 1000, 3),
+        "p99_ms":  round(at(0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(s) * 1000, 3),
+    }
+
+
+def _disk_bytes(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+# ── SYNTHETIC CORPORA ─────────────────────────────────────────────────────────
+
+class TextCorpus:
+    """
+    Zipf-distributed words over a fixed vocabulary. Each document leans on
+    a topic, a small set of words it repeats, so chunks from one document
+    resemble each other the way clauses of one contract do.
+    """
+
+    _STEMS = ("agree", "clause", "party", "liab", "term", "notice", "data", "process", "consent",
+              "breach", "remedy", "warrant", "indemn", "govern", "assign", "confid", "record",
+              "retain", "audit", "comply", "supply", "deliver", "pay", "invoice", "risk")
+
+    def __init__(self, seed: int, vocab_size: int = 20_000, topics: int = 64):
+        rng = random.Random(seed)
+        self._rng = rng
+        self.vocab = [f"{rng.choice(self._STEMS)}{i:x}" for i in range(vocab_size)]
+        weights = [1 / (rank + 1) ** 1.1 for rank in range(vocab_size)]
+        total, acc, self._cum = sum(weights), 0.0, []
+        for w in weights:
+            acc += w / total
+            self._cum.append(acc)
+        self.topics = [rng.sample(self.vocab[200:], 40) for _ in range(topics)]
+
+    def page(self, words: int, topic: Optional[int] = None) -> str:
+        rng = self._rng
+        topic_words = self.topics[rng.randrange(len(self.topics)) if topic is None else topic]
+        out = rng.choices(self.vocab, cum_weights=self._cum, k=words)
+        for i in range(0, words, 6):
+            out[i] = rng.choice(topic_words)
+        return " ".join(out)
+
+    def chunks(self, n: int, words: int = 512) -> list[str]:
+        return [self.page(words) for _ in range(n)]
+
+    def question(self) -> str:
+        topic = self._rng.choice(self.topics)
+        return "What does the agreement say about " + " ".join(self._rng.sample(topic, 4)) + "?"
+
+
+def synthetic_vectors(path: Path, n: int, dim: int, seed: int) -> np.memmap:
+    """n clustered unit vectors in a float32 memmap, written block by block."""
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((max(16, int(math.sqrt(n))), dim)).astype(np.float32)
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n, dim))
+    for start in range(0, n, VECTOR_BLOCK):
+        rows = min(VECTOR_BLOCK, n - start)
+        block = centroids[rng.integers(0, len(centroids), rows)]
+        block += 0.5 * rng.standard_normal((rows, dim)).astype(np.float32)
+        out[start:start + rows] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    out.flush()
+    return out
+
+
+def synthetic_queries(vectors: np.ndarray, count: int, seed: int) -> np.ndarray:
+    """Queries near (not at) corpus points, like a question near its answer."""
+    rng = np.random.default_rng(seed + 1)
+    base = vectors[np.sort(rng.choice(len(vectors), size=count, replace=len(vectors) < count))]
+    q = base + 0.3 * rng.standard_normal(base.shape).astype(np.float32) / math.sqrt(base.shape[1])
+    return (q / np.linalg.norm(q, axis=1, keepdims=True)).astype(np.float32)
+
+
+def embedded_vectors(path: Path, corpus: TextCorpus, n: int) -> np.memmap:
+    """Real embeddings of n generated chunks, in a float32 memmap."""
+    from backend.rag.embeddings import embed_documents
+
+    first = np.asarray(embed_documents(corpus.chunks(1)), dtype=np.float32)
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n, first.shape[1]))
+    for start in range(0, n, 1024):
+        rows = min(1024, n - start)
+        out[start:start + rows] = embed_documents(corpus.chunks(rows))
+    out.flush()
+    return out
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Ground-truth ids by L2 distance (= by inner product on unit vectors), scanning in blocks."""
+    best_ids = np.empty((len(queries), 0), dtype=np.int64)
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    for start in range(0, len(vectors), VECTOR_BLOCK):
+        block = np.asarray(vectors[start:start + VECTOR_BLOCK])
+        scores = queries @ block.T
+        top = np.argpartition(-scores, min(k, scores.shape[1]) - 1, axis=1)[:, :k]
+        best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+        best_ids = np.concatenate([best_ids, top + start], axis=1)
+        keep = np.argsort(-best_scores, axis=1)[:, :k]
+        best_scores = np.take_along_axis(best_scores, keep, axis=1)
+        best_ids = np.take_along_axis(best_ids, keep, axis=1)
+    return best_ids
+
+
+# ── INDEX BACKENDS ────────────────────────────────────────────────────────────
+#
+# build(vectors) adds every row with its row number as id; query(q, k) returns
+# those ids, nearest first; path is what gets measured for on-disk size.
+
+class ExactIndex:
+    name = "exact"
+
+    def __init__(self, workdir: Path, **_):
+        self.path = workdir / "exact.npy"
+
+    def build(self, vectors: np.ndarray) -> None:
+        np.save(self.path, vectors)
+        self._vectors = np.load(self.path, mmap_mode="r")
+
+    def query(self, q: np.ndarray, k: int) -> list[int]:
+        return exact_top_k(self._vectors, q[None, :], k)[0].tolist()
+
+
+class ChromaIndex:
+    name = "chroma"
+
+    def __init__(self, workdir: Path, **_):
+        import chromadb
+
+        self.path = workdir / "chroma"
+        self._client = chromadb.PersistentClient(path=str(self.path))
+        self._collection = self._client.create_collection("bench_docs")
+
+    def build(self, vectors: np.ndarray) -> None:
+        get_max = getattr(self._client, "get_max_batch_size", None)
+        batch = min(VECTOR_BLOCK, get_max() if get_max else getattr(self._client, "max_batch_size", 5000))
+        for start in range(0, len(vectors), batch):
+            block = np.asarray(vectors[start:start + batch])
+            self._collection.add(
+                ids=[str(i) for i in range(start, start + len(block))],
+                embeddings=block.tolist(),
+            )
+
+    def query(self, q: np.ndarray, k: int) -> list[int]:
+        result = self._collection.query(query_embeddings=[q.tolist()], n_results=k, include=["distances"])
+        return [int(i) for i in result["ids"][0]]
+
+
+class HnswlibIndex:
+    name = "hnswlib"
+
+    def __init__(self, workdir: Path, ef_search: int = 64, **_):
+        import hnswlib
+
+        self._hnswlib = hnswlib
+        self.path = workdir / "hnswlib.bin"
+        self._ef_search = ef_search
+
+    def build(self, vectors: np.ndarray) -> None:
+        index = self._hnswlib.Index(space="l2", dim=vectors.shape[1])
+        index.init_index(max_elements=len(vectors), ef_construction=100, M=16)
+        for start in range(0, len(vectors), VECTOR_BLOCK):
+            block = np.asarray(vectors[start:start + VECTOR_BLOCK])
+            index.add_items(block, np.arange(start, start + len(block)))
+        index.save_index(str(self.path))
+        self._index = index
+
+    def query(self, q: np.ndarray, k: int) -> list[int]:
+        self._index.set_ef(max(self._ef_search, k))
+        labels, _ = self._index.knn_query(q, k=k)
+        return labels[0].tolist()
+
+
+class FaissIndex:
+    name = "faiss"
+
+    def __init__(self, workdir: Path, nprobe: int = 16, **_):
+        import faiss
+
+        self._faiss = faiss
+        self.path = workdir / "faiss.index"
+        self._nprobe = nprobe
+
+    def build(self, vectors: np.ndarray) -> None:
+        faiss = self._faiss
+        dim = vectors.shape[1]
+        nlist = max(1, min(len(vectors) // 39, int(4 * math.sqrt(len(vectors)))))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist)
+        sample = np.asarray(vectors[np.linspace(0, len(vectors) - 1, min(len(vectors), 64 * nlist)).astype(int)])
+        index.train(sample)
+        for start in range(0, len(vectors), VECTOR_BLOCK):
+            index.add(np.asarray(vectors[start:start + VECTOR_BLOCK]))
+        index.nprobe = self._nprobe
+        faiss.write_index(index, str(self.path))
+        self._index = index
+
+    def query(self, q: np.ndarray, k: int) -> list[int]:
+        _, ids = self._index.search(q[None, :], k)
+        return ids[0].tolist()
+
+
+BACKENDS = {b.name: b for b in (ExactIndex, ChromaIndex, HnswlibIndex, FaissIndex)}
+
+
+# ── STAGES ────────────────────────────────────────────────────────────────────
+
+def bench_chunk(corpus: TextCorpus, pages: int, words_per_page: int) -> dict:
+    texts = [corpus.page(words_per_page) for _ in range(pages)]
+    started = time.perf_counter()
+    chunks = sum(len(chunk_text(t)) for t in texts)
+    seconds = time.perf_counter() - started
+    return {
+        "pages": pages, "words": pages * words_per_page, "chunks": chunks,
+        "seconds": round(seconds, 4),
+        "words_per_s": round(pages * words_per_page / seconds),
+        "chunks_per_s": round(chunks / seconds, 1),
+    }
+
+
+def bench_extract(pdf_dir: Optional[str]) -> dict:
+    from backend.rag.ingestor import _extract_pdf
+
+    pdfs = sorted(Path(pdf_dir).glob("*.pdf")) if pdf_dir else []
+    if not pdfs:
+        return {"skipped": "no --pdf-dir with PDFs"}
+    started = time.perf_counter()
+    pages = [_extract_pdf(p) for p in pdfs]
+    seconds = time.perf_counter() - started
+    n_pages = sum(len(p) for p in pages)
+    return {
+        "files": len(pdfs), "pages": n_pages,
+        "mb": round(sum(p.stat().st_size for p in pdfs) / 1e6, 2),
+        "seconds": round(seconds, 3),
+        "pages_per_s": round(n_pages / seconds, 1) if seconds else None,
+    }
+
+
+def bench_embed(corpus: TextCorpus, count: int) -> dict:
+    from backend.rag.embeddings import EMBED_MODEL, embed_documents
+
+    embed_documents(corpus.chunks(8))   # load the model outside the timing
+    texts = corpus.chunks(count)
+    started = time.perf_counter()
+    vectors = embed_documents(texts)
+    seconds = time.perf_counter() - started
+    return {
+        "model": EMBED_MODEL, "chunks": count, "dim": len(vectors[0]),
+        "seconds": round(seconds, 3),
+        "chunks_per_s": round(count / seconds, 1),
+    }
+
+
+def bench_index(
+    backend: str, vectors: np.ndarray, queries: np.ndarray, truth: np.ndarray,
+    top_ks: list[int], workdir: Path, **options,
+) -> dict:
+    try:
+        index = BACKENDS[backend](workdir, **options)
+    except ImportError as e:
+        return {"skipped": f"not installed ({e.name})"}
+
+    started = time.perf_counter()
+    index.build(vectors)
+    build_s = time.perf_counter() - started
+    result = {
+        "build_s": round(build_s, 3),
+        "vectors_per_s": round(len(vectors) / build_s, 1),
+        "disk_mb": round(_disk_bytes(index.path) / 1e6, 2),
+        "top_k": {},
+    }
+    index.query(queries[0], max(top_ks))   # warm caches and lazy loads
+    for k in top_ks:
+        latencies, hits = [], 0
+        for q, want in zip(queries, truth):
+            t = time.perf_counter()
+            got = index.query(q, k)
+            latencies.append(time.perf_counter() - t)
+            hits += len(set(got[:k]) & set(want[:k].tolist()))
+        result["top_k"][str(k)] = {
+            **_pct(latencies),
+            "qps": round(len(latencies) / sum(latencies), 1),
+            "recall": round(hits / (k * len(queries)), 4),
+        }
+    return result
+
+
+def bench_e2e(corpus: TextCorpus, docs: int, pages_per_doc: int, top_ks: list[int],
+              queries: int, workdir: Path) -> dict:
+    """The real pipeline: text files → rebuild_plug → retrieve()."""
+    os.environ["CHROMA_PERSIST_DIR"] = str(workdir / "chroma")
+    from backend.rag.ingestor import rebuild_plug
+    from backend.rag.retriever import retrieve
+
+    plug_dir = workdir / "docs" / "bench"
+    plug_dir.mkdir(parents=True)
+    for d in range(docs):
+        topic = d % len(corpus.topics)
+        (plug_dir / f"doc{d:05d}.txt").write_text(
+            "\n".join(corpus.page(600, topic) for _ in range(pages_per_doc))
+        )
+    started = time.perf_counter()
+    built = rebuild_plug("bench", str(workdir / "docs"))
+    build_s = time.perf_counter() - started
+
+    questions = [corpus.question() for _ in range(queries)]
+    retrieve(questions[0], "bench")   # load the model outside the timing
+    result = {
+        "docs": docs, "chunks": built["chunks"],
+        "ingest_s": round(build_s, 3),
+        "chunks_per_s": round(built["chunks"] / build_s, 1) if build_s else None,
+        "disk_mb": round(_disk_bytes(workdir / "chroma") / 1e6, 2),
+        "retrieve": {},
+    }
+    for k in top_ks:
+        latencies = []
+        for question in questions:
+            t = time.perf_counter()
+            retrieve(question, "bench", top_k=k, min_score=0.0)
+            latencies.append(time.perf_counter() - t)
+        result["retrieve"][str(k)] = _pct(latencies)
+    return result
+
+
+# ── REPORT ────────────────────────────────────────────────────────────────────
+
+def _environment() -> dict:
+    versions = {}
+    for module in ("numpy", "chromadb", "hnswlib", "faiss", "sentence_transformers", "torch"):
+        try:
+            versions[module] = getattr(__import__(module), "__version__", "?")
+        except ImportError:
+            pass
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit, "python": platform.python_version(), "machine": platform.machine(),
+        "processor": platform.processor(), "cpus": os.cpu_count(), "versions": versions,
+    }
+
+
+def _ints(spec: str) -> list[int]:
+    return [int(float(v)) for v in spec.split(",") if v]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", default="chunk,extract,embed,index,e2e")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="index corpus sizes, in chunks")
+    parser.add_argument("--backends", default="exact,chroma,hnswlib,faiss")
+    parser.add_argument("--top-k", default="1,5,10,50")
+    parser.add_argument("--queries", type=int, default=200, help="queries per index and top_k")
+    parser.add_argument("--vectors", choices=("synthetic", "embed"), default="synthetic")
+    parser.add_argument("--dim", type=int, default=384, help="synthetic vector size (all-MiniLM-L6-v2: 384)")
+    parser.add_argument("--ef-search", type=int, default=64, help="hnswlib query beam width")
+    parser.add_argument("--nprobe", type=int, default=16, help="faiss IVF lists probed per query")
+    parser.add_argument("--chunk-pages", type=int, default=2000)
+    parser.add_argument("--embed-chunks", type=int, default=1000)
+    parser.add_argument("--pdf-dir")
+    parser.add_argument("--e2e-docs", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--workdir", help="keep indexes here instead of a temporary directory")
+    parser.add_argument("--out", help="write the report here as JSON")
+    args = parser.parse_args()
+
+    stages = set(args.stages.split(","))
+    top_ks = _ints(args.top_k)
+    backends = [b for b in args.backends.split(",") if b]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        raise SystemExit(f"Unknown backend(s): {sorted(unknown)}; choose from {sorted(BACKENDS)}")
+
+    root = Path(args.workdir or tempfile.mkdtemp(prefix="bench-retrieval-"))
+    root.mkdir(parents=True, exist_ok=True)
+    results = {}
+    try:
+        if "chunk" in stages:
+            results["chunk"] = bench_chunk(TextCorpus(args.seed), args.chunk_pages, 600)
+            print(f"chunk: {results['chunk']}", file=sys.stderr)
+        if "extract" in stages:
+            results["extract"] = bench_extract(args.pdf_dir)
+        if "embed" in stages:
+            results["embed"] = bench_embed(TextCorpus(args.seed), args.embed_chunks)
+            print(f"embed: {results['embed']}", file=sys.stderr)
+
+        if "index" in stages:
+            results["index"] = {}
+            for size in _ints(args.sizes):
+                workdir = root / f"n{size}"
+                workdir.mkdir(exist_ok=True)
+                started = time.perf_counter()
+                if args.vectors == "embed":
+                    corpus = TextCorpus(args.seed)
+                    vectors = embedded_vectors(workdir / "vectors.npy", corpus, size)
+                    from backend.rag.embeddings import embed_documents
+                    queries = np.asarray(embed_documents([corpus.question() for _ in range(args.queries)]),
+                                         dtype=np.float32)
+                else:
+                    vectors = synthetic_vectors(workdir / "vectors.npy", size, args.dim, args.seed)
+                    queries = synthetic_queries(vectors, args.queries, args.seed)
+                generated_s = time.perf_counter() - started
+                truth = exact_top_k(vectors, queries, max(top_ks))
+
+                entry = {"vectors": args.vectors, "dim": int(vectors.shape[1]),
+                         "generate_s": round(generated_s, 3), "backends": {}}
+                for backend in backends:
+                    (workdir / backend).mkdir(exist_ok=True)
+                    entry["backends"][backend] = bench_index(
+                        backend, vectors, queries, truth, top_ks, workdir / backend,
+                        ef_search=args.ef_search, nprobe=args.nprobe,
+                    )
+                    print(f"index n={size} {backend}: {entry['backends'][backend]}", file=sys.stderr)
+                results["index"][str(size)] = entry
+                if not args.workdir:
+                    shutil.rmtree(workdir, ignore_errors=True)
+
+        if "e2e" in stages:
+            workdir = root / "e2e"
+            workdir.mkdir(exist_ok=True)
+            results["e2e"] = bench_e2e(TextCorpus(args.seed), args.e2e_docs, 4, top_ks,
+                                       min(args.queries, 100), workdir)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "environment": _environment(),
+        "config": {k: v for k, v in vars(args).items() if k != "out"},
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+sap_sync.py — SAP delta-sync throughput against the local mock ERP.
+Starts backend.integrations.mock_erp_server in-process, then times a full
+initial sync of every tenant and a series of delta syncs while the server
+churns records. Sync time includes the SAP context-index rebuild that the
+app runs whenever a tenant's data version moves.
+
+Run from sme-plug-platform/:
+  python -m bench.sap_sync --tenants 2 --materials 50000 --pos 20000 --latency-ms 20
+  python -m bench.sap_sync --page-size 2000 --out bench/sap_sync.json
+"""
+
+import json
+import time
+import socket
+import argparse
+
+from backend.integrations import sap_connector
+from backend.integrations.mock_erp_server import serve
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _run_sync(client: sap_connector.ErpClient, tenants: list, page_size: int) -> dict:
+    requests_before = client.requests
+    started = time.perf_counter()
+    runs = [sap_connector.sync_tenant(client, t, page_size) for t in tenants]
+    seconds = time.perf_counter() - started
+    fetched = sum(r["fetched"] for r in runs)
+    return {
+        "seconds":         round(seconds, 3),
+        "requests":        client.requests - requests_before,
+        "records_fetched": fetched,
+        "records_changed": sum(r["changed"] for r in runs),
+        "records_per_s":   round(fetched / seconds, 1) if seconds else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenants", type=int, default=2, help="generated tenants")
+    parser.add_argument("--materials", type=int, default=20000)
+    parser.add_argument("--pos", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=10)
+    parser.add_argument("--page-size", type=int, default=sap_connector.SAP_SYNC_PAGE_SIZE)
+    parser.add_argument("--churn", type=int, default=200, help="records modified before each delta sync")
+    parser.add_argument("--deltas", type=int, default=5)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    port = _free_port()
+    server, erp = serve(port, args.tenants, args.materials, args.pos, latency_ms=args.latency_ms)
+    client = sap_connector.ErpClient(f"http://127.0.0.1:{port}")
+    tenants = client.get("/tenants")["tenants"]
+
+    report = {"config": vars(args), "full": _run_sync(client, tenants, args.page_size), "delta": []}
+    for _ in range(args.deltas):
+        erp.churn(args.churn)
+        report["delta"].append(_run_sync(client, tenants, args.page_size))
+
+    client.close()
+    server.shutdown()
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
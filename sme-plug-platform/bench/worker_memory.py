@@ -0,0 +1,128 @@
+"""
+worker_memory.py — Measure per-worker memory and cold start for a launch mode.
+Linux only (reads /proc/<pid>/smaps_rollup).
+
+Run from sme-plug-platform/:
+  python -m bench.worker_memory --mode uvicorn  --workers 4
+  python -m bench.worker_memory --mode gunicorn --workers 4
+
+RSS counts shared pages in every process; PSS splits them between the
+processes sharing them, so PSS is the number that shows copy-on-write wins.
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import subprocess
+import urllib.request
+from pathlib import Path
+
+
+def _smaps(pid: int) -> dict:
+    out = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()[1:]:
+        key, value = line.split(":", 1)
+        if key in ("Rss", "Pss", "Private_Clean", "Private_Dirty", "Shared_Clean", "Shared_Dirty"):
+            out[key] = int(value.split()[0]) // 1024   # kB → MB
+    return out
+
+
+def _children(pid: int) -> list[int]:
+    """Worker pids: the server's children, minus multiprocessing's resource tracker."""
+    path = Path(f"/proc/{pid}/task/{pid}/children")
+    pids = [int(p) for p in path.read_text().split()] if path.exists() else []
+    return [p for p in pids if b"resource_tracker" not in Path(f"/proc/{p}/cmdline").read_bytes()]
+
+
+def _cpu_ticks(pids: list[int]) -> int:
+    total = 0
+    for pid in pids:
+        fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+        total += int(fields[11]) + int(fields[12])   # utime + stime
+    return total
+
+
+def _wait_idle(proc: subprocess.Popen, workers: int, timeout: float) -> None:
+    """Until every worker is up and none used CPU for a second: all warm-ups done."""
+    started, last, quiet = time.perf_counter(), -1, 0
+    while time.perf_counter() - started < timeout:
+        pids = _children(proc.pid)
+        ticks = _cpu_ticks(pids) if len(pids) >= workers else -1
+        quiet = quiet + 1 if ticks == last and ticks >= 0 else 0
+        if quiet >= 4:
+            return
+        last = ticks
+        time.sleep(0.25)
+    raise TimeoutError("workers did not settle")
+
+
+def _wait_ready(port: int, proc: subprocess.Popen, timeout: float) -> float:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as r:
+                if r.status == 200:
+                    return time.perf_counter() - started
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError("server did not become ready")
+
+
+def measure(mode: str, workers: int, port: int, settle_s: float) -> dict:
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port))
+    if mode == "gunicorn":
+        cmd = ["gunicorn", "-c", "backend/gunicorn_conf.py", "backend.main:app"]
+    else:
+        # Same warm-up the gunicorn post_fork hook does, but inside every worker.
+        env["WARM_EMBEDDER"] = "1"
+        cmd = ["uvicorn", "backend.main:app", "--port", str(port), "--workers", str(workers)]
+
+    launched = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        ready_s = _wait_ready(port, proc, timeout=600)
+        _wait_idle(proc, workers, timeout=600)
+        warm_s = time.perf_counter() - launched - 1.0   # less the idle second itself
+        time.sleep(settle_s)
+        worker_pids = _children(proc.pid)
+        per_worker = [_smaps(pid) for pid in worker_pids]
+        master = _smaps(proc.pid)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+    def avg(key):
+        return round(sum(w[key] for w in per_worker) / max(1, len(per_worker)), 1)
+
+    return {
+        "mode":             mode,
+        "workers":          len(worker_pids),
+        "cold_start_s":     round(ready_s, 2),      # first worker serving
+        "all_warm_s":       round(warm_s, 2),       # every worker done warming up
+        "master_mb":        master,
+        "worker_rss_mb":    avg("Rss"),
+        "worker_pss_mb":    avg("Pss"),
+        "worker_private_mb": round(avg("Private_Clean") + avg("Private_Dirty"), 1),
+        "total_pss_mb":     master["Pss"] + sum(w["Pss"] for w in per_worker),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["uvicorn", "gunicorn"], required=True)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--settle", type=float, default=5.0, help="seconds to wait after ready")
+    args = parser.parse_args()
+    json.dump(measure(args.mode, args.workers, args.port, args.settle), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -10,17 +10,34 @@ Usage:
     response = plug.chat("What does clause 4.2 mean?")
     print(response.text)
     print(response.citations)
+
+Async:
+    from tether import AsyncTether
+
+    async with AsyncTether(api_key="tether_live_xxx", plugin_id="legal-v1") as plug:
+        answers = await plug.chat_many(questions, concurrency=16)
 """
 
 from .client import Tether
-from .models import ChatResponse, Citation, UploadResponse, EvalResponse, TetherError
+from .async_client import AsyncTether
+from .models import ChatResponse, Citation, UploadResponse, EvalResponse, SyncResult, TetherError
+from .retry import RetryPolicy, NO_RETRY
+from .streaming import ChatStream, AsyncChatStream
+from .cache import ResponseCache
 
 __version__ = "0.1.0"
 __all__ = [
     "Tether",
+    "AsyncTether",
     "ChatResponse",
     "Citation",
     "UploadResponse",
     "EvalResponse",
+    "SyncResult",
     "TetherError",
+    "RetryPolicy",
+    "NO_RETRY",
+    "ChatStream",
+    "AsyncChatStream",
+    "ResponseCache",
 ]
@@ -0,0 +1,366 @@
+"""Tether asyncio client."""
+
+from __future__ import annotations
+
+import time
+import asyncio
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Union
+
+import httpx
+
+from .client import _TetherBase
+from .cache import ResponseCache
+from .models import ChatResponse, EvalResponse, SyncResult, TetherError, UploadResponse
+from .retry import RetryPolicy
+from .streaming import AsyncChatStream
+from .sync import DEFAULT_CHUNK_SIZE, DEFAULT_SUFFIXES, HASH_LOOKUP_BATCH, plan, read_chunk, scan, sha256_file
+
+
+class AsyncTether(_TetherBase):
+    """
+    Asyncio client for Tether, with the same surface as `Tether`.
+
+    Args:
+        api_key: Your Tether API key (tether_live_xxx or tether_test_xxx).
+        plugin_id: Plugin to use (e.g. 'legal-v1', 'healthcare-v1').
+        base_url: API base URL (default: https://api.tether.dev).
+        timeout: Request timeout in seconds (default: 30).
+        retry: RetryPolicy for 429/503 and transient failures (default: RetryPolicy()).
+        cache: Optional ResponseCache shared with chat_many (see `Tether`).
+        http2: Multiplex requests over HTTP/2 (needs `pip install 'tether[http2]'`).
+        max_connections: Size of the shared connection pool (default: 20).
+        max_keepalive_connections: Idle connections kept open for reuse (default: 20).
+        keepalive_expiry: Seconds an idle connection is kept (default: 30).
+
+    Example:
+        >>> from tether import AsyncTether
+        >>> async with AsyncTether(api_key="tether_live_xxx", plugin_id="legal-v1") as plug:
+        ...     answers = await plug.chat_many(questions, concurrency=16)
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        plugin_id: str,
+        base_url: str = "https://api.tether.dev",
+        timeout: float = 30.0,
+        max_connections: int = 20,
+        *,
+        retry: Optional[RetryPolicy] = None,
+        cache: Optional[ResponseCache] = None,
+        http2: bool = False,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+    ):
+        super().__init__(api_key, plugin_id, base_url, retry, cache)
+        self._client = httpx.AsyncClient(**self._client_options(
+            timeout, http2, max_connections, max_keepalive_connections, keepalive_expiry,
+        ))
+
+    async def chat(self, message: str, *, session_id: Optional[str] = None) -> ChatResponse:
+        """
+        Send a chat message to your SME plugin.
+
+        Args:
+            message: The question or prompt.
+            session_id: Optional session ID for follow-up messages.
+
+        Returns:
+            ChatResponse with text, citations, verified flag, and RAGAS score.
+
+        Raises:
+            TetherError: If the API returns an error.
+        """
+        result = await self._chat(message, session_id or self._session_id)
+        self._session_id = result.session_id
+        return result
+
+    async def chat_stream(self, message: str, *, session_id: Optional[str] = None) -> AsyncChatStream:
+        """
+        Send a chat message and read the answer as it is generated.
+
+        Example:
+            >>> async with await plug.chat_stream("Summarise clause 4.2") as stream:
+            ...     async for delta in stream:
+            ...         print(delta, end="", flush=True)
+            >>> print(stream.response.citations)
+        """
+        sid = session_id or self._session_id
+        response = await self._send(
+            "POST", "/v1/chat", stream=True,
+            json=self._stream_payload(message, sid), headers={"Accept": "text/event-stream"},
+        )
+        self._check_response(response)
+        return AsyncChatStream(response, self._remember_session)
+
+    async def chat_many(
+        self,
+        messages: Iterable[str],
+        *,
+        concurrency: int = 8,
+        return_exceptions: bool = False,
+    ) -> list[Union[ChatResponse, BaseException]]:
+        """
+        Ask many independent questions concurrently over the shared pool.
+
+        Each message starts its own session, and the client's current session
+        is left untouched. Results come back in the same order as `messages`.
+
+        Args:
+            messages: The questions to ask.
+            concurrency: Maximum requests in flight at once (default: 8).
+            return_exceptions: Put a failed question's exception in its slot
+                instead of raising the first error (default: False).
+
+        Example:
+            >>> answers = await plug.chat_many(questions, concurrency=16)
+            >>> for q, a in zip(questions, answers):
+            ...     print(q, a.verified)
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+        gate = asyncio.Semaphore(concurrency)
+
+        async def one(message: str) -> ChatResponse:
+            async with gate:
+                return await self._chat(message, None)
+
+        return await asyncio.gather(
+            *(one(m) for m in messages), return_exceptions=return_exceptions,
+        )
+
+    async def upload(self, file_path: str | Path) -> UploadResponse:
+        """
+        Upload a document to the plugin's knowledge base.
+
+        Args:
+            file_path: Path to the file to upload (PDF, DOCX, TXT, etc.).
+
+        Returns:
+            UploadResponse with document_id and processing status.
+        """
+        path = self._upload_path(file_path)
+
+        with open(path, "rb") as f:
+            response = await self._send(
+                "POST",
+                "/v1/upload",
+                rewind=lambda: f.seek(0),
+                files={"file": (path.name, f)},
+                data={"plugin_id": self._plugin_id},
+            )
+
+        self._check_response(response)
+        return UploadResponse.model_validate(response.json())
+
+    async def sync_directory(
+        self,
+        path: str | Path,
+        *,
+        concurrency: int = 4,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        suffixes: Iterable[str] = DEFAULT_SUFFIXES,
+        ingest: bool = True,
+    ) -> SyncResult:
+        """
+        Make the plugin's knowledge base hold every document under a directory.
+        Same behaviour and arguments as `Tether.sync_directory`. Disk reads
+        and hashing run in worker threads, so the event loop stays free.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+        root = Path(path)
+        files = await asyncio.to_thread(scan, root, suffixes)
+        result = SyncResult(scanned=len(files))
+        gate = asyncio.Semaphore(concurrency)
+
+        async def hash_one(file: Path) -> str:
+            async with gate:
+                return await asyncio.to_thread(sha256_file, file)
+
+        async def upload_one(rel: str, file: Path, sha256: str):
+            async with gate:
+                try:
+                    return rel, await self._upload_resumable(file, sha256, chunk_size)
+                except (TetherError, httpx.HTTPError, OSError) as e:
+                    return rel, e
+
+        hashes = await asyncio.gather(*(hash_one(f) for f in files))
+        chosen, result.failed = plan(root, files, list(hashes))
+        have = await self._lookup_hashes([sha256 for _, sha256 in chosen.values()])
+        todo = []
+        for rel, (file, sha256) in chosen.items():
+            if sha256 in have:
+                result.skipped.append(rel)
+            else:
+                todo.append(upload_one(rel, file, sha256))
+
+        staged = []
+        for rel, outcome in await asyncio.gather(*todo):
+            if isinstance(outcome, Exception):
+                result.failed[rel] = str(outcome)
+                continue
+            entry, resumed, sent = outcome
+            result.uploaded.append(rel)
+            result.bytes_sent += sent
+            if resumed:
+                result.resumed.append(rel)
+            if entry.get("status") == "staged":
+                staged.append(entry["filename"])
+
+        if ingest and staged:
+            job = await self._request("POST", "/v1/documents/ingest", json={
+                "plugin_id": self._plugin_id, "filenames": staged,
+            })
+            result.job_id = job["job_id"]
+        return result
+
+    async def _lookup_hashes(self, hashes: list[str]) -> set[str]:
+        have: set[str] = set()
+        for i in range(0, len(hashes), HASH_LOOKUP_BATCH):
+            data = await self._request("POST", "/v1/documents/hashes", idempotent=True, json={
+                "plugin_id": self._plugin_id, "hashes": hashes[i:i + HASH_LOOKUP_BATCH],
+            })
+            have.update(data["have"])
+        return have
+
+    async def _upload_resumable(self, path: Path, sha256: str, chunk_size: int) -> tuple[dict, bool, int]:
+        """Send one file from wherever the server's session left off. Returns (file entry, resumed, bytes sent)."""
+        session = await self._request("POST", "/v1/upload/sessions", idempotent=True,
+                                      json=self._session_payload(path, sha256))
+        offset, size = session["offset"], session["size_bytes"]
+        chunk_size = min(chunk_size, session.get("chunk_limit") or chunk_size)
+        resumed, sent = offset > 0, 0
+        while True:
+            chunk = await asyncio.to_thread(read_chunk, path, offset, min(chunk_size, size - offset))
+            response = await self._send("PUT", f"/v1/upload/sessions/{sha256}", idempotent=True,
+                                        **self._chunk_request(offset, chunk))
+            if response.status_code == 409:
+                offset = response.json()["offset"]
+                continue
+            self._check_response(response)
+            sent += len(chunk)
+            body = response.json()
+            if body["complete"]:
+                return body["file"], resumed, sent
+            offset = body["offset"]
+
+    async def reindex(self, *, full: bool = False) -> dict:
+        """
+        Trigger a re-index of the plugin's knowledge base (and drop its cached answers).
+
+        Args:
+            full: Rebuild every document instead of only changed ones.
+
+        Returns:
+            The background job; poll GET /v1/jobs/{job_id}.
+        """
+        result = await self._request("POST", f"/v1/reindex/{self._plugin_id}",
+                                     json={"mode": "full" if full else "incremental"})
+        if self._cache is not None:
+            self._cache.invalidate(self._plugin_id)
+        return result
+
+    async def evaluate(self, *, stub_llm: bool = False, force: bool = False, timeout: float = 600.0) -> EvalResponse:
+        """
+        Run the plugin's golden QA set on the server and score it.
+
+        Args:
+            stub_llm: Answer from the retrieved chunks without calling the LLM
+                (offline, for CI).
+            force: Re-evaluate every question, ignoring the per-question cache.
+            timeout: Seconds to wait for the run (default: 600). A run calls the
+                LLM once per uncached question, so it outlasts the client timeout;
+                it is not retried after a timeout, which would start a second run.
+
+        Returns:
+            EvalResponse with faithfulness, context_precision, context_recall,
+            answer_correctness, overall and passed.
+        """
+        params = {"force": str(force).lower()}
+        if stub_llm:
+            params["llm"] = "stub"
+        data = await self._request("GET", f"/v1/eval/{self._plugin_id}", params=params, timeout=timeout)
+        return EvalResponse.model_validate(data)
+
+    async def _chat(self, message: str, session_id: Optional[str]) -> ChatResponse:
+        # Answers inside a session may depend on it, so only sessionless chats are cached.
+        version = await self._cache_version() if self._cache is not None and not session_id else None
+        if version is not None:
+            hit = self._cache.get(self._plugin_id, version, message)
+            if hit is not None:
+                return hit
+        response = await self._request("POST", "/v1/chat", json=self._chat_payload(message, session_id))
+        result = ChatResponse.model_validate(response)
+        if version is not None:
+            self._cache_store(message, version, result)
+        return result
+
+    async def _cache_version(self) -> Optional[str]:
+        version = self._cache.known_version(self._plugin_id)
+        if version is None:
+            try:
+                data = await self._request("GET", f"/v1/kb/{self._plugin_id}", idempotent=True)
+            except TetherError as e:
+                if e.status == 404:
+                    return None
+                raise
+            version = data["kb_version"]
+            self._cache.set_version(self._plugin_id, version)
+        return version
+
+    async def _request(self, method: str, path: str, *, idempotent: bool = False, **kwargs) -> dict:
+        """Make an HTTP request (retrying per the policy) and return JSON response."""
+        response = await self._send(method, path, idempotent=idempotent, **kwargs)
+        self._check_response(response)
+        return response.json()
+
+    async def _send(
+        self,
+        method: str,
+        path: str,
+        *,
+        idempotent: bool = False,
+        rewind: Optional[Callable[[], object]] = None,
+        stream: bool = False,
+        **kwargs,
+    ) -> httpx.Response:
+        """
+        Send with retries; returns the final response (which may still be an error).
+        With stream=True a successful response's body is left unread for the caller.
+        """
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            if rewind is not None:
+                rewind()
+            try:
+                request = self._client.build_request(method, path, **kwargs)
+                response = await self._client.send(request, stream=stream)
+            except httpx.TransportError as e:
+                delay = self._retry.next_delay(attempt, time.monotonic() - started, idempotent, error=e)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            if response.is_success:
+                return response
+            delay = self._retry.next_delay(attempt, time.monotonic() - started, idempotent, response=response)
+            if delay is None:
+                if stream:
+                    await response.aread()
+                return response
+            await response.aclose()
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        """Close the underlying HTTP client."""
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
@@ -0,0 +1,146 @@
+"""Opt-in client-side cache of chat answers."""
+
+from __future__ import annotations
+
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from .models import ChatResponse
+
+
+class ResponseCache:
+    """
+    Remembers chat answers by (plugin, knowledge-base version, message).
+
+    Every answer from /v1/chat carries the plug's knowledge-base version,
+    which changes whenever documents are (re)ingested. Before answering
+    from the cache, the client checks that version with a cheap
+    GET /v1/kb/{plugin_id} at most every `version_ttl` seconds. When the
+    version moves, that plugin's entries are dropped, so re-indexing
+    invalidates the cache by itself. Calling reindex() from this client
+    drops them at once.
+
+    Args:
+        max_entries: Answers kept in memory, least recently used evicted (default: 1024).
+        path: Optional SQLite file that also keeps answers on disk, so they
+            survive between notebook sessions and CI runs.
+        version_ttl: Seconds to trust a known knowledge-base version before
+            re-checking it (default: 30). 0 checks before every lookup.
+
+    Example:
+        >>> cache = ResponseCache(path=".tether-cache.sqlite")
+        >>> plug = Tether(api_key, "legal-v1", cache=cache)
+    """
+
+    def __init__(self, max_entries: int = 1024, path: Optional[str | Path] = None, version_ttl: float = 30.0):
+        if max_entries < 1:
+            raise ValueError("max_entries must be >= 1")
+        self.max_entries = max_entries
+        self.version_ttl = version_ttl
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, dict] = OrderedDict()
+        self._versions: dict[str, tuple[str, float]] = {}   # plugin → (version, checked at)
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path is not None:
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " key TEXT PRIMARY KEY, plugin TEXT NOT NULL, kb_version TEXT NOT NULL,"
+                " body TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def _key(plugin_id: str, kb_version: str, message: str) -> str:
+        return hashlib.sha256(f"{plugin_id}\0{kb_version}\0{message}".encode()).hexdigest()
+
+    def known_version(self, plugin_id: str) -> Optional[str]:
+        """The plugin's knowledge-base version if it was confirmed within version_ttl, else None."""
+        entry = self._versions.get(plugin_id)
+        if entry is None or time.monotonic() - entry[1] > self.version_ttl:
+            return None
+        return entry[0]
+
+    def set_version(self, plugin_id: str, kb_version: str) -> None:
+        """Record the plugin's current version; entries for any other version are dropped."""
+        with self._lock:
+            previous = self._versions.get(plugin_id)
+            self._versions[plugin_id] = (kb_version, time.monotonic())
+            if previous is not None and previous[0] == kb_version:
+                return
+            stale = [k for k, v in self._memory.items() if v["plugin"] == plugin_id and v["kb_version"] != kb_version]
+            for k in stale:
+                del self._memory[k]
+            if self._db is not None:
+                self._db.execute(
+                    "DELETE FROM answers WHERE plugin = ? AND kb_version != ?", (plugin_id, kb_version),
+                )
+                self._db.commit()
+
+    def get(self, plugin_id: str, kb_version: str, message: str) -> Optional[ChatResponse]:
+        key = self._key(plugin_id, kb_version, message)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            elif self._db is not None:
+                row = self._db.execute("SELECT body FROM answers WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = {"plugin": plugin_id, "kb_version": kb_version, "body": json.loads(row[0])}
+                    self._remember(key, entry)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return ChatResponse.model_validate(entry["body"])
+
+    def put(self, plugin_id: str, kb_version: str, message: str, response: ChatResponse) -> None:
+        key = self._key(plugin_id, kb_version, message)
+        body = response.model_dump(by_alias=True)
+        with self._lock:
+            self._remember(key, {"plugin": plugin_id, "kb_version": kb_version, "body": body})
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answers (key, plugin, kb_version, body, stored_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, plugin_id, kb_version, json.dumps(body), time.time()),
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, entry: dict) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def invalidate(self, plugin_id: Optional[str] = None) -> None:
+        """Drop one plugin's entries (or everything) and forget its known version."""
+        with self._lock:
+            if plugin_id is None:
+                self._memory.clear()
+                self._versions.clear()
+            else:
+                for k in [k for k, v in self._memory.items() if v["plugin"] == plugin_id]:
+                    del self._memory[k]
+                self._versions.pop(plugin_id, None)
+            if self._db is not None:
+                if plugin_id is None:
+                    self._db.execute("DELETE FROM answers")
+                else:
+                    self._db.execute("DELETE FROM answers WHERE plugin = ?", (plugin_id,))
+                self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
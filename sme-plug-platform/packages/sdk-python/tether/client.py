@@ -2,15 +2,166 @@
 
 from __future__ import annotations
 
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterable, Optional
 
 import httpx
 
-from .models import ChatResponse, Citation, EvalResponse, TetherError, UploadResponse
+from .cache import ResponseCache
+from .models import ChatResponse, Citation, EvalResponse, SyncResult, TetherError, UploadResponse
+from .retry import RetryPolicy, parse_retry_after
+from .streaming import ChatStream
+from .sync import DEFAULT_CHUNK_SIZE, DEFAULT_SUFFIXES, HASH_LOOKUP_BATCH, plan, read_chunk, scan, sha256_file
 
 
-class Tether:
+class _TetherBase:
+    """Argument checks, payloads and error mapping shared by Tether and AsyncTether."""
+
+    def __init__(
+        self,
+        api_key: str,
+        plugin_id: str,
+        base_url: str,
+        retry: Optional[RetryPolicy],
+        cache: Optional[ResponseCache] = None,
+    ):
+        if not api_key:
+            raise ValueError("api_key is required")
+        if not plugin_id:
+            raise ValueError("plugin_id is required")
+
+        self._api_key = api_key
+        self._plugin_id = plugin_id
+        self._base_url = base_url.rstrip("/")
+        self._session_id: Optional[str] = None
+        self._retry = retry or RetryPolicy()
+        self._cache = cache
+
+    def _headers(self) -> dict:
+        # No client-wide Content-Type: httpx sets it per request, and a fixed
+        # application/json would mislabel multipart and chunk uploads.
+        return {"Authorization": f"Bearer {self._api_key}"}
+
+    def _client_options(
+        self,
+        timeout: float,
+        http2: bool,
+        max_connections: int,
+        max_keepalive_connections: int,
+        keepalive_expiry: float,
+    ) -> dict:
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                raise ImportError("http2=True needs the h2 package: pip install 'tether[http2]'") from None
+        return {
+            "base_url": self._base_url,
+            "headers": self._headers(),
+            "timeout": timeout,
+            "http2": http2,
+            "limits": httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        }
+
+    def _chat_payload(self, message: str, session_id: Optional[str]) -> dict:
+        return {
+            "message": message,
+            "plugin_id": self._plugin_id,
+            "session_id": session_id,
+        }
+
+    def _stream_payload(self, message: str, session_id: Optional[str]) -> dict:
+        return dict(self._chat_payload(message, session_id), stream=True)
+
+    def _session_payload(self, path: Path, sha256: str) -> dict:
+        return {
+            "plugin_id": self._plugin_id,
+            "filename": path.name,
+            "sha256": sha256,
+            "size_bytes": path.stat().st_size,
+        }
+
+    def _chunk_request(self, offset: int, chunk: bytes) -> dict:
+        return {
+            "params": {"plugin_id": self._plugin_id, "offset": offset},
+            "content": chunk,
+            "headers": {"Content-Type": "application/octet-stream"},
+        }
+
+    def _cache_store(self, message: str, version: str, result: ChatResponse) -> None:
+        if result.kb_version and result.kb_version != version:
+            version = result.kb_version
+            self._cache.set_version(self._plugin_id, version)
+        self._cache.put(self._plugin_id, version, message, result)
+
+    def _remember_session(self, result: ChatResponse) -> None:
+        self._session_id = result.session_id
+
+    @staticmethod
+    def _upload_path(file_path: str | Path) -> Path:
+        path = Path(file_path)
+        if not path.exists():
+            raise FileNotFoundError(f"File not found: {path}")
+        return path
+
+    def clear_session(self) -> None:
+        """Clear the current session (starts a new conversation)."""
+        self._session_id = None
+
+    @property
+    def session_id(self) -> Optional[str]:
+        """Current session ID."""
+        return self._session_id
+
+    @property
+    def cache(self) -> Optional[ResponseCache]:
+        """The response cache, if one was passed."""
+        return self._cache
+
+    @property
+    def plugin_id(self) -> str:
+        """Active plugin ID."""
+        return self._plugin_id
+
+    @staticmethod
+    def _check_response(response: httpx.Response) -> None:
+        """Check response status and raise appropriate errors."""
+        if response.is_success:
+            return
+
+        if response.status_code == 401:
+            raise TetherError(
+                "Invalid API key. Check your key at tether.dev/api-keys",
+                code="INVALID_KEY",
+                status=401,
+            )
+        if response.status_code == 429:
+            raise TetherError(
+                "Rate limit exceeded. Upgrade your plan at tether.dev/billing",
+                code="RATE_LIMITED",
+                status=429,
+                retry_after=parse_retry_after(response.headers.get("Retry-After")),
+            )
+
+        body = response.text
+        raise TetherError(
+            f"API error {response.status_code}: {body}",
+            code="API_ERROR",
+            status=response.status_code,
+            retry_after=parse_retry_after(response.headers.get("Retry-After")),
+        )
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(plugin_id={self._plugin_id!r})"
+
+
+class Tether(_TetherBase):
     """
     Official Python client for Tether.
 
@@ -19,6 +170,14 @@ class Tether:
         plugin_id: Plugin to use (e.g. 'legal-v1', 'healthcare-v1').
         base_url: API base URL (default: https://api.tether.dev).
         timeout: Request timeout in seconds (default: 30).
+        retry: RetryPolicy for 429/503 and transient failures (default: RetryPolicy()).
+            Pass tether.NO_RETRY to fail on the first error.
+        cache: Optional ResponseCache; repeated questions are answered locally
+            until the plugin's knowledge base changes.
+        http2: Multiplex requests over HTTP/2 (needs `pip install 'tether[http2]'`).
+        max_connections: Connection pool size (default: 10).
+        max_keepalive_connections: Idle connections kept open for reuse (default: 10).
+        keepalive_expiry: Seconds an idle connection is kept (default: 30).
 
     Example:
         >>> from tether import Tether
@@ -34,24 +193,18 @@ class Tether:
         plugin_id: str,
         base_url: str = "https://api.tether.dev",
         timeout: float = 30.0,
+        *,
+        retry: Optional[RetryPolicy] = None,
+        cache: Optional[ResponseCache] = None,
+        http2: bool = False,
+        max_connections: int = 10,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
     ):
-        if not api_key:
-            raise ValueError("api_key is required")
-        if not plugin_id:
-            raise ValueError("plugin_id is required")
-
-        self._api_key = api_key
-        self._plugin_id = plugin_id
-        self._base_url = base_url.rstrip("/")
-        self._session_id: Optional[str] = None
-        self._client = httpx.Client(
-            base_url=self._base_url,
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            },
-            timeout=timeout,
-        )
+        super().__init__(api_key, plugin_id, base_url, retry, cache)
+        self._client = httpx.Client(**self._client_options(
+            timeout, http2, max_connections, max_keepalive_connections, keepalive_expiry,
+        ))
 
     def chat(self, message: str, *, session_id: Optional[str] = None) -> ChatResponse:
         """
@@ -75,21 +228,60 @@ class Tether:
             >>> print(res.ragas_score) # 0.93
         """
         sid = session_id or self._session_id
+        # Answers inside a session may depend on it, so only sessionless chats are cached.
+        version = self._cache_version() if self._cache is not None and not sid else None
+        if version is not None:
+            hit = self._cache.get(self._plugin_id, version, message)
+            if hit is not None:
+                return hit
 
-        response = self._request(
-            "POST",
-            "/v1/chat",
-            json={
-                "message": message,
-                "plugin_id": self._plugin_id,
-                "session_id": sid,
-            },
-        )
+        response = self._request("POST", "/v1/chat", json=self._chat_payload(message, sid))
 
         result = ChatResponse.model_validate(response)
         self._session_id = result.session_id
+        if version is not None:
+            self._cache_store(message, version, result)
         return result
 
+    def _cache_version(self) -> Optional[str]:
+        """Current knowledge-base version for cache lookups; None if the server does not report one."""
+        version = self._cache.known_version(self._plugin_id)
+        if version is None:
+            try:
+                data = self._request("GET", f"/v1/kb/{self._plugin_id}", idempotent=True)
+            except TetherError as e:
+                if e.status == 404:
+                    return None
+                raise
+            version = data["kb_version"]
+            self._cache.set_version(self._plugin_id, version)
+        return version
+
+    def chat_stream(self, message: str, *, session_id: Optional[str] = None) -> ChatStream:
+        """
+        Send a chat message and read the answer as it is generated.
+
+        Iterating the returned ChatStream yields text deltas; once it is
+        exhausted, `stream.response` is the final ChatResponse with citations.
+        Retries (per the policy) only happen before the stream starts.
+
+        Raises:
+            TetherError: If the API returns an error, before or during the stream.
+
+        Example:
+            >>> with plug.chat_stream("Summarise clause 4.2") as stream:
+            ...     for delta in stream:
+            ...         print(delta, end="", flush=True)
+            >>> print(stream.response.citations)
+        """
+        sid = session_id or self._session_id
+        response = self._send(
+            "POST", "/v1/chat", stream=True,
+            json=self._stream_payload(message, sid), headers={"Accept": "text/event-stream"},
+        )
+        self._check_response(response)
+        return ChatStream(response, self._remember_session)
+
     def upload(self, file_path: str | Path) -> UploadResponse:
         """
         Upload a document to the plugin's knowledge base.
@@ -100,13 +292,13 @@ class Tether:
         Returns:
             UploadResponse with document_id and processing status.
         """
-        path = Path(file_path)
-        if not path.exists():
-            raise FileNotFoundError(f"File not found: {path}")
+        path = self._upload_path(file_path)
 
         with open(path, "rb") as f:
-            response = self._client.post(
+            response = self._send(
+                "POST",
                 "/v1/upload",
+                rewind=lambda: f.seek(0),
                 files={"file": (path.name, f)},
                 data={"plugin_id": self._plugin_id},
             )
@@ -114,65 +306,192 @@ class Tether:
         self._check_response(response)
         return UploadResponse.model_validate(response.json())
 
-    def reindex(self) -> dict:
-        """Trigger a re-index of the plugin's knowledge base."""
-        return self._request("POST", f"/v1/reindex/{self._plugin_id}")
+    def sync_directory(
+        self,
+        path: str | Path,
+        *,
+        concurrency: int = 4,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        suffixes: Iterable[str] = DEFAULT_SUFFIXES,
+        ingest: bool = True,
+    ) -> SyncResult:
+        """
+        Make the plugin's knowledge base hold every document under a directory.
+
+        Files are hashed locally, and the server is asked which hashes it
+        already has. Only missing content is sent, with up to `concurrency`
+        files in flight. Each file goes in `chunk_size` pieces read straight
+        from disk. An interrupted transfer resumes from the server's offset
+        the next time you sync. One ingest job then indexes everything that
+        was uploaded.
 
-    def evaluate(self) -> EvalResponse:
+        Args:
+            path: Directory to sync (searched recursively; hidden files are skipped).
+            concurrency: Files hashed / uploaded in parallel (default: 4).
+            chunk_size: Bytes per upload request (default: 8 MB; the server may cap it).
+            suffixes: File types to include (default: .pdf, .txt, .md, .csv).
+            ingest: Start an ingest job for the uploaded files (default: True).
+
+        Returns:
+            SyncResult listing skipped, uploaded, resumed and failed files, plus
+            the ingest job id (poll GET /v1/jobs/{job_id}).
+
+        Example:
+            >>> result = plug.sync_directory("contracts/", concurrency=8)
+            >>> print(len(result.uploaded), "uploaded,", len(result.skipped), "already there")
         """
-        Get RAGAS evaluation scores for this plugin.
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+        root = Path(path)
+        files = scan(root, suffixes)
+        result = SyncResult(scanned=len(files))
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            chosen, result.failed = plan(root, files, list(pool.map(sha256_file, files)))
+            have = self._lookup_hashes([sha256 for _, sha256 in chosen.values()])
+            todo = {}
+            for rel, (file, sha256) in chosen.items():
+                if sha256 in have:
+                    result.skipped.append(rel)
+                else:
+                    todo[pool.submit(self._upload_resumable, file, sha256, chunk_size)] = rel
+            staged = []
+            for future in as_completed(todo):
+                rel = todo[future]
+                try:
+                    entry, resumed, sent = future.result()
+                except (TetherError, httpx.HTTPError, OSError) as e:
+                    result.failed[rel] = str(e)
+                    continue
+                result.uploaded.append(rel)
+                result.bytes_sent += sent
+                if resumed:
+                    result.resumed.append(rel)
+                if entry.get("status") == "staged":
+                    staged.append(entry["filename"])
+
+        result.uploaded.sort()
+        result.resumed.sort()
+        if ingest and staged:
+            job = self._request("POST", "/v1/documents/ingest", json={
+                "plugin_id": self._plugin_id, "filenames": staged,
+            })
+            result.job_id = job["job_id"]
+        return result
+
+    def _lookup_hashes(self, hashes: list[str]) -> set[str]:
+        have: set[str] = set()
+        for i in range(0, len(hashes), HASH_LOOKUP_BATCH):
+            data = self._request("POST", "/v1/documents/hashes", idempotent=True, json={
+                "plugin_id": self._plugin_id, "hashes": hashes[i:i + HASH_LOOKUP_BATCH],
+            })
+            have.update(data["have"])
+        return have
+
+    def _upload_resumable(self, path: Path, sha256: str, chunk_size: int) -> tuple[dict, bool, int]:
+        """Send one file from wherever the server's session left off. Returns (file entry, resumed, bytes sent)."""
+        session = self._request("POST", "/v1/upload/sessions", idempotent=True,
+                                json=self._session_payload(path, sha256))
+        offset, size = session["offset"], session["size_bytes"]
+        chunk_size = min(chunk_size, session.get("chunk_limit") or chunk_size)
+        resumed, sent = offset > 0, 0
+        while True:
+            chunk = read_chunk(path, offset, min(chunk_size, size - offset))
+            # A retried chunk that already landed comes back as 409 with the real offset.
+            response = self._send("PUT", f"/v1/upload/sessions/{sha256}", idempotent=True,
+                                  **self._chunk_request(offset, chunk))
+            if response.status_code == 409:
+                offset = response.json()["offset"]
+                continue
+            self._check_response(response)
+            sent += len(chunk)
+            body = response.json()
+            if body["complete"]:
+                return body["file"], resumed, sent
+            offset = body["offset"]
+
+    def reindex(self, *, full: bool = False) -> dict:
+        """
+        Trigger a re-index of the plugin's knowledge base (and drop its cached answers).
+
+        Args:
+            full: Rebuild every document instead of only changed ones.
 
         Returns:
-            EvalResponse with faithfulness, answer_relevancy, context_precision, overall.
+            The background job; poll GET /v1/jobs/{job_id}.
         """
-        data = self._request("GET", f"/v1/eval/{self._plugin_id}")
-        return EvalResponse.model_validate(data)
+        result = self._request("POST", f"/v1/reindex/{self._plugin_id}",
+                              json={"mode": "full" if full else "incremental"})
+        if self._cache is not None:
+            self._cache.invalidate(self._plugin_id)
+        return result
 
-    def clear_session(self) -> None:
-        """Clear the current session (starts a new conversation)."""
-        self._session_id = None
+    def evaluate(self, *, stub_llm: bool = False, force: bool = False, timeout: float = 600.0) -> EvalResponse:
+        """
+        Run the plugin's golden QA set on the server and score it.
 
-    @property
-    def session_id(self) -> Optional[str]:
-        """Current session ID."""
-        return self._session_id
+        Args:
+            stub_llm: Answer from the retrieved chunks without calling the LLM
+                (offline, for CI).
+            force: Re-evaluate every question, ignoring the per-question cache.
+            timeout: Seconds to wait for the run (default: 600). A run calls the
+                LLM once per uncached question, so it outlasts the client timeout;
+                it is not retried after a timeout, which would start a second run.
 
-    @property
-    def plugin_id(self) -> str:
-        """Active plugin ID."""
-        return self._plugin_id
+        Returns:
+            EvalResponse with faithfulness, context_precision, context_recall,
+            answer_correctness, overall and passed.
+        """
+        params = {"force": str(force).lower()}
+        if stub_llm:
+            params["llm"] = "stub"
+        data = self._request("GET", f"/v1/eval/{self._plugin_id}", params=params, timeout=timeout)
+        return EvalResponse.model_validate(data)
 
-    def _request(self, method: str, path: str, **kwargs) -> dict:
-        """Make an HTTP request and return JSON response."""
-        response = self._client.request(method, path, **kwargs)
+    def _request(self, method: str, path: str, *, idempotent: bool = False, **kwargs) -> dict:
+        """Make an HTTP request (retrying per the policy) and return JSON response."""
+        response = self._send(method, path, idempotent=idempotent, **kwargs)
         self._check_response(response)
         return response.json()
 
-    @staticmethod
-    def _check_response(response: httpx.Response) -> None:
-        """Check response status and raise appropriate errors."""
-        if response.is_success:
-            return
-
-        if response.status_code == 401:
-            raise TetherError(
-                "Invalid API key. Check your key at tether.dev/api-keys",
-                code="INVALID_KEY",
-                status=401,
-            )
-        if response.status_code == 429:
-            raise TetherError(
-                "Rate limit exceeded. Upgrade your plan at tether.dev/billing",
-                code="RATE_LIMITED",
-                status=429,
-            )
-
-        body = response.text
-        raise TetherError(
-            f"API error {response.status_code}: {body}",
-            code="API_ERROR",
-            status=response.status_code,
-        )
+    def _send(
+        self,
+        method: str,
+        path: str,
+        *,
+        idempotent: bool = False,
+        rewind: Optional[Callable[[], object]] = None,
+        stream: bool = False,
+        **kwargs,
+    ) -> httpx.Response:
+        """
+        Send with retries; returns the final response (which may still be an error).
+        With stream=True a successful response's body is left unread for the caller.
+        """
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            if rewind is not None:
+                rewind()
+            try:
+                request = self._client.build_request(method, path, **kwargs)
+                response = self._client.send(request, stream=stream)
+            except httpx.TransportError as e:
+                delay = self._retry.next_delay(attempt, time.monotonic() - started, idempotent, error=e)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            if response.is_success:
+                return response
+            delay = self._retry.next_delay(attempt, time.monotonic() - started, idempotent, response=response)
+            if delay is None:
+                if stream:
+                    response.read()
+                return response
+            response.close()
+            time.sleep(delay)
 
     def close(self) -> None:
         """Close the underlying HTTP client."""
@@ -183,6 +502,3 @@ class Tether:
 
     def __exit__(self, *args):
         self.close()
-
-    def __repr__(self) -> str:
-        return f"Tether(plugin_id={self._plugin_id!r})"
@@ -2,7 +2,9 @@
 
 from __future__ import annotations
 
-from pydantic import BaseModel, Field
+from typing import Optional
+
+from pydantic import BaseModel, Field, model_validator
 
 
 class Citation(BaseModel):
@@ -21,6 +23,7 @@ class ChatResponse(BaseModel):
     verified: bool = False
     ragas_score: float = Field(0.0, alias="ragas_score")
     session_id: str = ""
+    kb_version: str = ""  # knowledge-base version the answer was drawn from
 
     model_config = {"populate_by_name": True}
 
@@ -33,21 +36,46 @@ class UploadResponse(BaseModel):
 
 
 class EvalResponse(BaseModel):
-    """RAGAS evaluation scores."""
+    """RAGAS-style scores from running the plugin's golden QA set."""
 
     faithfulness: float
-    answer_relevancy: float
     context_precision: float
+    context_recall: float
+    answer_correctness: float
     overall: float
+    questions_tested: int = 0
+    questions_cached: int = 0  # answered from the server's per-question cache
+    passed: bool = False
+    baseline_comparison: dict[str, float] = Field(default_factory=dict)  # change since the previous run
+
+    @model_validator(mode="before")
+    @classmethod
+    def _flatten_scores(cls, data):
+        if isinstance(data, dict) and isinstance(data.get("scores"), dict):
+            data = {**data["scores"], **{k: v for k, v in data.items() if k != "scores"}}
+        return data
+
+
+class SyncResult(BaseModel):
+    """Outcome of sync_directory. File entries are paths relative to the synced directory."""
+
+    scanned: int = 0
+    skipped: list[str] = Field(default_factory=list)   # content already on the server
+    uploaded: list[str] = Field(default_factory=list)
+    resumed: list[str] = Field(default_factory=list)   # uploads continued from a partial transfer
+    failed: dict[str, str] = Field(default_factory=dict)
+    bytes_sent: int = 0
+    job_id: Optional[str] = None                       # ingest job for the uploaded files
 
 
 class TetherError(Exception):
     """Custom error for Tether API failures."""
 
-    def __init__(self, message: str, code: str, status: int):
+    def __init__(self, message: str, code: str, status: int, retry_after: Optional[float] = None):
         super().__init__(message)
         self.code = code
         self.status = status
+        self.retry_after = retry_after  # seconds the server asked us to wait, if it said
 
     def __repr__(self) -> str:
         return f"TetherError(code={self.code!r}, status={self.status}, message={str(self)!r})"
@@ -0,0 +1,103 @@
+"""Retry policy for Tether clients."""
+
+from __future__ import annotations
+
+import random
+import email.utils
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+import httpx
+
+# Failures where the server did not act on the request, so any request can be retried.
+_REJECTED_STATUSES = frozenset({429, 503})
+# Failures that may have happened after the server acted: only safe for idempotent calls.
+_TRANSIENT_STATUSES = frozenset({502, 504})
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+_MAYBE_SENT_ERRORS = (httpx.ReadTimeout, httpx.WriteTimeout, httpx.RemoteProtocolError, httpx.ReadError)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    When and how long to wait before retrying a failed request.
+
+    Args:
+        max_attempts: Total tries, including the first (default: 4). 1 disables retries.
+        backoff_base: First backoff in seconds; doubles every attempt (default: 0.5).
+        backoff_max: Cap for a single backoff in seconds (default: 8).
+        deadline: Give up once this many seconds have passed since the first
+            attempt, including waits (default: 60). None means no deadline.
+        respect_retry_after: Wait at least the server's Retry-After (default: True).
+
+    Requests the server rejected without acting on them are always retried:
+    429, 503 and connection failures. Gateway errors (502/504), read
+    timeouts and dropped connections are retried only for idempotent
+    operations (sync lookups), because chat, upload or an evaluation run
+    may already have run.
+
+    Example:
+        >>> plug = Tether(api_key, "legal-v1", retry=RetryPolicy(max_attempts=6, deadline=120))
+    """
+
+    max_attempts: int = 4
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    deadline: Optional[float] = 60.0
+    respect_retry_after: bool = True
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given (1-based) failed attempt."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1))))
+
+    def next_delay(
+        self,
+        attempt: int,
+        elapsed: float,
+        idempotent: bool,
+        response: Optional[httpx.Response] = None,
+        error: Optional[Exception] = None,
+    ) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None to stop and surface the failure."""
+        if attempt >= self.max_attempts:
+            return None
+        if response is not None:
+            status = response.status_code
+            if status not in _REJECTED_STATUSES and not (idempotent and status in _TRANSIENT_STATUSES):
+                return None
+        elif error is not None:
+            if not isinstance(error, _NOT_SENT_ERRORS) and not (idempotent and isinstance(error, _MAYBE_SENT_ERRORS)):
+                return None
+        else:
+            return None
+
+        delay = self.backoff(attempt)
+        if response is not None and self.respect_retry_after:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+        if self.deadline is not None and elapsed + delay > self.deadline:
+            return None
+        return delay
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds (delta-seconds or an HTTP date), None if absent or unparseable."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
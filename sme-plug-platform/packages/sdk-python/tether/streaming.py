@@ -0,0 +1,168 @@
+"""Server-Sent Events streams for Tether chat."""
+
+from __future__ import annotations
+
+import json
+from typing import AsyncIterator, Callable, Iterator, Optional, Tuple
+
+import httpx
+
+from .models import ChatResponse, TetherError
+
+
+class _EventParser:
+    """Feed SSE lines in; get (event, data) back at the blank line that ends each event."""
+
+    def __init__(self):
+        self._event, self._data = "message", []
+
+    def feed(self, line: str) -> Optional[Tuple[str, dict]]:
+        if line.startswith("event:"):
+            self._event = line[6:].strip()
+        elif line.startswith("data:"):
+            self._data.append(line[5:].lstrip(" "))
+        elif not line:
+            event, data = self._event, self._data
+            self._event, self._data = "message", []
+            if data:
+                return event, json.loads("\n".join(data))
+        return None
+
+
+def _stream_error(data: dict, status: int) -> TetherError:
+    return TetherError(data.get("detail", "Stream failed"), code=data.get("code", "API_ERROR"), status=status)
+
+
+def _incomplete(status: int) -> TetherError:
+    return TetherError("Stream ended before the final response", code="STREAM_INCOMPLETE", status=status)
+
+
+def _is_json(response: httpx.Response) -> bool:
+    # A server without streaming support answers /v1/chat with plain JSON.
+    return response.headers.get("Content-Type", "").startswith("application/json")
+
+
+class ChatStream:
+    """
+    Text deltas of a streamed answer, as they arrive. Iterate it for the
+    deltas; afterwards `response` holds the final ChatResponse with citations.
+
+    The final response is authoritative: when the answer could not be
+    verified against a source, its `text` is the server's refusal notice
+    rather than the streamed text.
+
+    The pooled connection is released when the stream is exhausted or closed;
+    use it as a context manager when you may stop reading early.
+    """
+
+    def __init__(self, response: httpx.Response, on_done: Callable[[ChatResponse], None]):
+        self._response = response
+        self._on_done = on_done
+        self._deltas = self._read()
+        self.response: Optional[ChatResponse] = None
+
+    def __iter__(self) -> Iterator[str]:
+        return self._deltas
+
+    def _read(self) -> Iterator[str]:
+        try:
+            if _is_json(self._response):
+                self._response.read()
+                self._done(self._response.json())
+                yield self.response.text
+                return
+            parser = _EventParser()
+            for line in self._response.iter_lines():
+                parsed = parser.feed(line)
+                if parsed is None:
+                    continue
+                event, data = parsed
+                if event == "delta":
+                    yield data.get("text", "")
+                elif event == "done":
+                    self._done(data)
+                elif event == "error":
+                    raise _stream_error(data, self._response.status_code)
+            if self.response is None:
+                raise _incomplete(self._response.status_code)
+        finally:
+            self._response.close()
+
+    def _done(self, data: dict) -> None:
+        self.response = ChatResponse.model_validate(data)
+        self._on_done(self.response)
+
+    def until_done(self) -> ChatResponse:
+        """Read the rest of the stream and return the final response."""
+        for _ in self._deltas:
+            pass
+        return self.response
+
+    def close(self) -> None:
+        """Stop reading and release the connection."""
+        self._deltas.close()
+        self._response.close()
+
+    def __enter__(self) -> ChatStream:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class AsyncChatStream:
+    """Asyncio counterpart of ChatStream: `async for delta in stream`."""
+
+    def __init__(self, response: httpx.Response, on_done: Callable[[ChatResponse], None]):
+        self._response = response
+        self._on_done = on_done
+        self._deltas = self._read()
+        self.response: Optional[ChatResponse] = None
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._deltas
+
+    async def _read(self) -> AsyncIterator[str]:
+        try:
+            if _is_json(self._response):
+                await self._response.aread()
+                self._done(self._response.json())
+                yield self.response.text
+                return
+            parser = _EventParser()
+            async for line in self._response.aiter_lines():
+                parsed = parser.feed(line)
+                if parsed is None:
+                    continue
+                event, data = parsed
+                if event == "delta":
+                    yield data.get("text", "")
+                elif event == "done":
+                    self._done(data)
+                elif event == "error":
+                    raise _stream_error(data, self._response.status_code)
+            if self.response is None:
+                raise _incomplete(self._response.status_code)
+        finally:
+            await self._response.aclose()
+
+    def _done(self, data: dict) -> None:
+        self.response = ChatResponse.model_validate(data)
+        self._on_done(self.response)
+
+    async def until_done(self) -> ChatResponse:
+        """Read the rest of the stream and return the final response."""
+        async for _ in self._deltas:
+            pass
+        return self.response
+
+    async def aclose(self) -> None:
+        """Stop reading and release the connection."""
+        await self._deltas.aclose()
+        await self._response.aclose()
+
+    async def __aenter__(self) -> AsyncChatStream:
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
@@ -0,0 +1,62 @@
+"""Local side of directory sync: find the files, hash them, plan what to send."""
+
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import Iterable
+
+# Mirrors the server's accepted document types.
+DEFAULT_SUFFIXES = (".pdf", ".txt", ".md", ".csv")
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+HASH_LOOKUP_BATCH = 500
+_READ_SIZE = 1024 * 1024
+
+
+def scan(root: str | Path, suffixes: Iterable[str] = DEFAULT_SUFFIXES) -> list[Path]:
+    """Every regular, non-hidden file under root with one of the suffixes, in path order."""
+    root = Path(root)
+    if not root.is_dir():
+        raise NotADirectoryError(f"Not a directory: {root}")
+    wanted = {s.lower() for s in suffixes}
+    return sorted(
+        p for p in root.rglob("*")
+        if p.is_file() and p.suffix.lower() in wanted
+        and not any(part.startswith(".") for part in p.relative_to(root).parts)
+    )
+
+
+def sha256_file(path: Path) -> str:
+    """SHA-256 of a file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_chunk(path: Path, offset: int, size: int) -> bytes:
+    """At most size bytes of the file starting at offset (one chunk in memory at a time)."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+def plan(root: Path, files: list[Path], hashes: list[str]) -> tuple[dict[str, tuple[Path, str]], dict[str, str]]:
+    """
+    Pick one local file per server filename. The server stores documents by
+    base name, so a second file with the same name elsewhere in the tree
+    would overwrite the first: it is reported as a failure instead.
+    Returns ({relative path: (path, sha256)}, {relative path: error}).
+    """
+    chosen: dict[str, tuple[Path, str]] = {}
+    failed: dict[str, str] = {}
+    by_name: dict[str, str] = {}
+    for path, sha256 in zip(files, hashes):
+        rel = path.relative_to(root).as_posix()
+        first = by_name.setdefault(path.name, rel)
+        if first != rel:
+            failed[rel] = f"Same file name as {first}; the server stores documents by name."
+            continue
+        chosen[rel] = (path, sha256)
+    return chosen, failed
@@ -66,4 +66,10 @@ echo ""
 echo "Starting FastAPI backend on http://localhost:8000 ..."
 echo "════════════════════════════════════════"
 echo ""
-uvicorn backend.main:app --reload --port 8000 --host 0.0.0.0
+# WEB_CONCURRENCY>1 → gunicorn with the embedder preloaded before fork
+# (workers share the model weights copy-on-write; see DEPLOYMENT.md).
+if [ "${WEB_CONCURRENCY:-1}" -gt 1 ]; then
+  gunicorn -c backend/gunicorn_conf.py backend.main:app
+else
+  uvicorn backend.main:app --reload --port 8000 --host 0.0.0.0
+fi